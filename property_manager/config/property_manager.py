@@ -39,6 +39,12 @@ def get_data():
                     "name": "Rent Schedule",
                     "label": _("Rent Schedule"),
                     "description": _("Track rent payment schedules")
+                },
+                {
+                    "type": "doctype",
+                    "name": "Bank Statement Import",
+                    "label": _("Bank Statement Import"),
+                    "description": _("Import bank statements and reconcile rent payments")
                 }
             ]
         },
@@ -36,7 +36,9 @@ doctype_js = {
     "Rental Payment Schedule": "public/js/rental_payment_schedule.js",
     "Property Dashboard": "public/js/property_dashboard.js"
 }
-# doctype_list_js = {"doctype" : "public/js/doctype_list.js"}
+doctype_list_js = {
+    "Payment Entry": "public/js/payment_entry_list.js"
+}
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
 # doctype_calendar_js = {"doctype" : "public/js/doctype_calendar.js"}
 
@@ -61,12 +63,12 @@ doctype_js = {
 # ------------
 
 # before_install = "property_manager.install.before_install"
-after_install = "property_manager.install.after_install"
+after_install = "property_manager.property_manager.install.after_install"
 
 # Uninstallation
 # ------------
 
-before_uninstall = "property_manager.install.before_uninstall"
+before_uninstall = "property_manager.property_manager.install.before_uninstall"
 # after_uninstall = "property_manager.uninstall.after_uninstall"
 
 # Desk Notifications
@@ -103,9 +105,39 @@ doc_events = {
     "Rent Schedule": {
         "on_update": "property_manager.property_manager.doctype.rent_schedule.rent_schedule.create_sales_invoice_on_payment"
     },
+    "Rental Contract": {
+        "on_submit": [
+            "property_manager.property_manager.utils.availability.invalidate_availability_cache",
+            "property_manager.property_manager.utils.reporting.invalidate_property_performance"
+        ],
+        "on_cancel": [
+            "property_manager.property_manager.utils.availability.invalidate_availability_cache",
+            "property_manager.property_manager.utils.reporting.invalidate_property_performance"
+        ],
+        "on_update_after_submit": [
+            "property_manager.property_manager.utils.availability.invalidate_availability_cache",
+            "property_manager.property_manager.utils.reporting.invalidate_property_performance"
+        ]
+    },
+    "Rental Unit": {
+        "on_update": [
+            "property_manager.property_manager.utils.availability.invalidate_availability_cache",
+            "property_manager.property_manager.utils.reporting.invalidate_property_performance"
+        ],
+        "on_trash": [
+            "property_manager.property_manager.utils.availability.invalidate_availability_cache",
+            "property_manager.property_manager.utils.reporting.invalidate_property_performance"
+        ]
+    },
+    "Rental Payment Schedule": {
+        "on_submit": "property_manager.property_manager.utils.rent_ledger.update_rent_ledger",
+        "on_update_after_submit": "property_manager.property_manager.utils.rent_ledger.update_rent_ledger",
+        "on_cancel": "property_manager.property_manager.utils.rent_ledger.update_rent_ledger"
+    },
     "Payment Entry": {
-        "on_submit": "property_manager.utils.payment_entry.link_to_payment_schedule",
-        "on_cancel": "property_manager.utils.payment_entry.unlink_from_payment_schedule"
+        "validate": "property_manager.property_manager.utils.duplicate_detection.set_duplicate_fingerprint",
+        "on_submit": "property_manager.property_manager.utils.payment_entry.link_to_payment_schedule",
+        "on_cancel": "property_manager.property_manager.utils.payment_entry.unlink_from_payment_schedule"
     }
 }
 
@@ -114,7 +146,11 @@ doc_events = {
 
 scheduler_events = {
     "daily": [
-        "property_manager.property_manager.doctype.rent_schedule.rent_schedule.mark_overdue_rents"
+        "property_manager.property_manager.doctype.rent_schedule.rent_schedule.mark_overdue_rents",
+        "property_manager.property_manager.utils.payment_relink.scheduled_payment_relink_sweep",
+        "property_manager.property_manager.utils.payment_entry.scheduled_rental_payment_schedule_verification",
+        "property_manager.property_manager.doctype.property.property.refresh_all_property_metrics",
+        "property_manager.property_manager.utils.rent_ledger.reconcile_rent_ledger"
     ],
     "monthly": [
         "property_manager.property_manager.doctype.rent_schedule.rent_schedule.generate_monthly_schedules"
@@ -0,0 +1,20 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from property_manager.property_manager.custom_fields import create_payment_schedule_custom_fields
+from property_manager.property_manager.utils.duplicate_detection import (
+    backfill_payment_fingerprints,
+    add_duplicate_detection_index
+)
+
+def execute():
+    """
+    Index existing Payment Entries for duplicate detection on sites installed before fingerprints existed
+    """
+    # The fingerprint and amount bucket fields are custom fields, so make sure they exist first
+    create_payment_schedule_custom_fields()
+
+    backfill_payment_fingerprints()
+    add_duplicate_detection_index()
+    frappe.db.commit()
@@ -16,6 +16,7 @@ def create_payment_schedule_custom_fields():
                 "label": "Payment Entry",
                 "read_only": 1,
                 "insert_after": "paid_amount",
+                "search_index": 1,
                 "description": "Linked Payment Entry for this scheduled payment",
                 "in_list_view": 0,
                 "print_hide": 1,
@@ -108,6 +109,57 @@ def create_payment_schedule_custom_fields():
                 "in_list_view": 0,
                 "print_hide": 0
             }
+        ],
+        "Payment Entry": [
+            {
+                "fieldname": "rental_link_status",
+                "fieldtype": "Select",
+                "options": "\nQueued\nLinked\nNot Matched\nFailed\nUnlink Queued\nUnlinked",
+                "label": "Rental Link Status",
+                "read_only": 1,
+                "allow_on_submit": 1,
+                "no_copy": 1,
+                "insert_after": "reference_date",
+                "search_index": 1,
+                "description": "Status of linking this payment to rental Payment Schedule rows",
+                "print_hide": 1
+            },
+            {
+                "fieldname": "rental_link_error",
+                "fieldtype": "Small Text",
+                "label": "Rental Link Error",
+                "read_only": 1,
+                "allow_on_submit": 1,
+                "no_copy": 1,
+                "insert_after": "rental_link_status",
+                "depends_on": "eval:doc.rental_link_status=='Failed'",
+                "print_hide": 1
+            },
+            {
+                "fieldname": "rental_payment_fingerprint",
+                "fieldtype": "Data",
+                "label": "Rental Payment Fingerprint",
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "insert_after": "rental_link_error",
+                "search_index": 1,
+                "description": "Hash of party and reference number used for duplicate detection",
+                "print_hide": 1,
+                "report_hide": 1
+            },
+            {
+                "fieldname": "rental_amount_bucket",
+                "fieldtype": "Int",
+                "label": "Rental Amount Bucket",
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "insert_after": "rental_payment_fingerprint",
+                "description": "Whole-unit paid amount used for near-duplicate detection",
+                "print_hide": 1,
+                "report_hide": 1
+            }
         ]
     }
     
@@ -127,7 +179,11 @@ def remove_payment_schedule_custom_fields():
         "Payment Schedule-column_break_payment_info",
         "Payment Schedule-rental_contract_ref",
         "Payment Schedule-tenant_ref",
-        "Payment Schedule-property_unit_ref"
+        "Payment Schedule-property_unit_ref",
+        "Payment Entry-rental_link_status",
+        "Payment Entry-rental_link_error",
+        "Payment Entry-rental_payment_fingerprint",
+        "Payment Entry-rental_amount_bucket"
     ]
     
     for field_name in custom_field_names:
@@ -0,0 +1,37 @@
+// Copyright (c) 2025, Farah and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Bank Statement Import', {
+	refresh: function(frm) {
+		if (!frm.is_new() && ['Draft', 'Failed'].includes(frm.doc.import_status)) {
+			frm.add_custom_button(__('Start Reconciliation'), function() {
+				frappe.call({
+					method: 'property_manager.property_manager.utils.bank_reconciliation.start_bank_statement_import',
+					args: { import_name: frm.doc.name },
+					callback: function(r) {
+						if (r.message && r.message.success) {
+							frappe.show_alert({ message: r.message.message, indicator: 'blue' });
+							frm.reload_doc();
+						}
+					}
+				});
+			});
+		}
+		
+		if (frm.doc.review_transactions) {
+			frm.add_custom_button(__('Review Queue'), function() {
+				frappe.set_route('List', 'Bank Statement Review Item', {
+					bank_statement_import: frm.doc.name,
+					status: 'Open'
+				});
+			});
+		}
+		
+		frappe.realtime.off('bank_statement_import_progress');
+		frappe.realtime.on('bank_statement_import_progress', function(data) {
+			if (data.bank_statement_import === frm.doc.name) {
+				frm.reload_doc();
+			}
+		});
+	}
+});
@@ -0,0 +1,28 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class BankStatementImport(Document):
+	def validate(self):
+		self.validate_date_window()
+		
+	def validate_date_window(self):
+		"""Validate the due date matching window"""
+		if self.date_window_days is not None and self.date_window_days < 0:
+			frappe.throw("Due date window cannot be negative")
+			
+	def on_trash(self):
+		"""Remove review queue items of this import"""
+		frappe.db.delete("Bank Statement Review Item", {"bank_statement_import": self.name})
+		
+	def get_review_summary(self):
+		"""Get open review items grouped by match type"""
+		return frappe.db.sql("""
+			SELECT match_type, COUNT(*) as count, SUM(amount) as amount
+			FROM `tabBank Statement Review Item`
+			WHERE bank_statement_import = %s
+			AND status = 'Open'
+			GROUP BY match_type
+		""", (self.name,), as_dict=True)
@@ -0,0 +1,94 @@
+# Copyright (c) 2025, Farah and Contributors
+# See license.txt
+
+import os
+import tempfile
+import unittest
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, getdate, nowdate
+
+from property_manager.property_manager.utils.bank_reconciliation import (
+	OpenScheduleIndex,
+	iter_statement_transactions,
+	load_open_schedule_rows,
+	normalize_reference
+)
+
+
+class TestBankStatementImport(FrappeTestCase):
+	def write_statement(self, suffix, content):
+		handle, path = tempfile.mkstemp(suffix=suffix)
+		with os.fdopen(handle, "w") as statement:
+			statement.write(content)
+		self.addCleanup(os.remove, path)
+		return path
+
+	def test_csv_statement_yields_credits_only(self):
+		path = self.write_statement(".csv", (
+			"Date,Amount,Reference,Name,Description\n"
+			"2025-08-01,1200.00,RC-2025-00001,John Doe,Rent August\n"
+			"2025-08-02,-15.00,FEE,Bank,Account fee\n"
+		))
+		transactions = list(iter_statement_transactions(path))
+		self.assertEqual(len(transactions), 1)
+		self.assertEqual(transactions[0]["amount"], 1200.0)
+		self.assertEqual(transactions[0]["date"], getdate("2025-08-01"))
+
+	def test_ofx_statement(self):
+		path = self.write_statement(".ofx", (
+			"<OFX><BANKTRANLIST>\n<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20250801\n"
+			"<TRNAMT>1200.00\n<FITID>F1\n<NAME>John Doe\n<MEMO>RENT RC-2025-00001\n</STMTTRN>\n"
+			"</BANKTRANLIST></OFX>\n"
+		))
+		transactions = list(iter_statement_transactions(path))
+		self.assertEqual(transactions[0]["transaction_id"], "F1")
+		self.assertEqual(transactions[0]["date"], getdate("2025-08-01"))
+
+	def test_index_matches_on_amount_and_reference(self):
+		row = frappe._dict(
+			name="ROW-1", due_date="2025-08-01", outstanding=1200, rental_payment_schedule="RPS-2025-00001",
+			rental_contract="RC-2025-00001", tenant="TNT-2025-00001", customer="TENANT-TNT-2025-00001"
+		)
+		index = OpenScheduleIndex([row])
+		transaction = {"date": getdate("2025-08-03"), "amount": 1200, "reference": "rc 2025 00001", "description": ""}
+
+		self.assertEqual(normalize_reference("rc 2025-00001"), "RC202500001")
+		reference_matches, amount_matches = index.lookup(transaction)
+		self.assertEqual([match.name for match in reference_matches], ["ROW-1"])
+
+		index.reserved.add("ROW-1")
+		reference_matches, amount_matches = index.lookup(transaction)
+		self.assertEqual(reference_matches, [])
+
+	def test_company_tenant_rows_resolve_to_company_customer(self):
+		if not frappe.db.table_exists("Payment Schedule"):
+			raise unittest.SkipTest("Payment Schedule requires ERPNext")
+
+		suffix = frappe.generate_hash(length=8)
+		tenant = f"TNT-TEST-{suffix}"
+		customer = f"Test Company {suffix}"
+		schedule = f"RPS-TEST-{suffix}"
+
+		# get_or_create_customer names a corporate tenant's Customer after the company
+		frappe.db.sql("""
+			INSERT INTO `tabTenant` (name, tenant_type, company_name, email, phone)
+			VALUES (%s, 'Corporate', %s, %s, %s)
+		""", (tenant, customer, f"{suffix}@example.com", suffix))
+		frappe.db.sql("INSERT INTO `tabCustomer` (name, customer_name) VALUES (%s, %s)", (customer, customer))
+		frappe.db.sql("""
+			INSERT INTO `tabRental Payment Schedule`
+				(name, tenant, total_rent_amount, paid_amount, outstanding_amount, schedule_status, docstatus)
+			VALUES (%s, %s, 1000, 0, 1000, 'Active', 1)
+		""", (schedule, tenant))
+		frappe.db.sql("""
+			INSERT INTO `tabPayment Schedule`
+				(name, parent, parenttype, parentfield, idx, due_date, payment_amount, paid_amount, outstanding)
+			VALUES (%s, %s, 'Rental Payment Schedule', 'payment_schedules', 1, %s, 1000, 0, 1000)
+		""", (f"{schedule}-1", schedule, nowdate()))
+		self.addCleanup(frappe.db.rollback)
+
+		rows = [row for row in load_open_schedule_rows(add_days(nowdate(), -1), add_days(nowdate(), 1))
+				if row.rental_payment_schedule == schedule]
+		self.assertEqual([row.customer for row in rows], [customer])
@@ -0,0 +1,46 @@
+// Copyright (c) 2025, Farah and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Bank Statement Review Item', {
+	refresh: function(frm) {
+		if (frm.doc.status !== 'Open') {
+			return;
+		}
+		
+		frm.add_custom_button(__('Link to Payment Schedule'), function() {
+			frappe.prompt([
+				{
+					fieldname: 'payment_schedule_row',
+					fieldtype: 'Data',
+					label: __('Payment Schedule Row'),
+					reqd: 1,
+					description: __('Candidates: {0}', [JSON.parse(frm.doc.candidate_rows || '[]').join(', ') || __('None')])
+				}
+			], function(values) {
+				frappe.call({
+					method: 'property_manager.property_manager.utils.bank_reconciliation.resolve_review_item',
+					args: {
+						review_item: frm.doc.name,
+						payment_schedule_row: values.payment_schedule_row
+					},
+					callback: function(r) {
+						if (r.message && r.message.success) {
+							frappe.show_alert({ message: __('Created Payment Entry {0}', [r.message.payment_entry]), indicator: 'green' });
+							frm.reload_doc();
+						}
+					}
+				});
+			}, __('Link Transaction'));
+		});
+		
+		frm.add_custom_button(__('Ignore'), function() {
+			frappe.call({
+				method: 'property_manager.property_manager.utils.bank_reconciliation.ignore_review_item',
+				args: { review_item: frm.doc.name },
+				callback: function() {
+					frm.reload_doc();
+				}
+			});
+		});
+	}
+});
@@ -0,0 +1,27 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+import json
+
+class BankStatementReviewItem(Document):
+	def get_candidate_rows(self):
+		"""Get the candidate Payment Schedule rows with their schedule details"""
+		candidate_names = json.loads(self.candidate_rows or "[]")
+		if not candidate_names:
+			return []
+			
+		return frappe.db.sql("""
+			SELECT 
+				ps.name,
+				ps.due_date,
+				ps.outstanding,
+				rps.name as rental_payment_schedule,
+				rps.tenant,
+				rps.rental_unit
+			FROM `tabPayment Schedule` ps
+			INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
+			WHERE ps.name IN %s
+			ORDER BY ps.due_date
+		""", (candidate_names,), as_dict=True)
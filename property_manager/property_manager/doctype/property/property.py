@@ -3,6 +3,11 @@
 
 import frappe
 from frappe.model.document import Document
+from frappe.utils import cint, flt
+import time
+
+# Property metrics are written with one UPDATE per batch of this many properties
+METRICS_UPDATE_BATCH_SIZE = 500
 
 class Property(Document):
 	def validate(self):
@@ -27,86 +32,27 @@ class Property(Document):
 		"""Update calculated fields when property is updated"""
 		# Only run calculations if document is saved (has a name)
 		if self.name and not self.name.startswith("new-"):
-			self.update_unit_counts()
-			self.calculate_financial_metrics()
+			self.update_property_metrics()
 		
 	def update_unit_counts(self):
 		"""Update total units, available units, occupied units, and occupancy rate"""
-		# Skip if document doesn't have a proper name yet
-		if not self.name or self.name.startswith("new-"):
-			return
-			
-		# Get total units count
-		total_units = frappe.db.count("Rental Unit", {"property": self.name})
-		
-		# Get available units count
-		available_units = frappe.db.count("Rental Unit", {
-			"property": self.name, 
-			"unit_status": "Available"
-		})
-		
-		# Get occupied units count
-		occupied_units = frappe.db.count("Rental Unit", {
-			"property": self.name, 
-			"unit_status": "Occupied"
-		})
-		
-		# Calculate occupancy rate and vacancy rate
-		occupancy_rate = 0
-		vacancy_rate = 0
-		if total_units > 0:
-			occupancy_rate = (occupied_units / total_units) * 100
-			vacancy_rate = (available_units / total_units) * 100
-			
-		# Update the fields
-		frappe.db.set_value("Property", self.name, {
-			"total_units": total_units,
-			"available_units": available_units,
-			"occupied_units": occupied_units,
-			"occupancy_rate": occupancy_rate,
-			"vacancy_rate": vacancy_rate
-		})
+		self.update_property_metrics()
 		
 	def calculate_financial_metrics(self):
 		"""Calculate financial performance metrics"""
+		self.update_property_metrics()
+		
+	def update_property_metrics(self):
+		"""Update unit counts, occupancy and financial metrics from one aggregate query and one write"""
 		# Skip if document doesn't have a proper name yet
 		if not self.name or self.name.startswith("new-"):
 			return
 			
-		# Get rental income data
-		monthly_income = self.get_monthly_rental_income()
-		potential_income = self.get_potential_monthly_income()
-		annual_income = monthly_income * 12
-		
-		# Calculate average rent
-		average_rent = 0
-		total_units = self.total_units or 0
-		if total_units > 0:
-			total_rent = sum(frappe.db.get_value("Rental Unit", unit.name, "monthly_rent") or 0 
-							for unit in frappe.get_all("Rental Unit", {"property": self.name}))
-			average_rent = total_rent / total_units if total_units > 0 else 0
-		
-		# Calculate yield and cap rate
-		property_value = self.current_market_value or self.purchase_price or 0
-		yield_percentage = 0
-		cap_rate = 0
-		
-		if property_value > 0:
-			yield_percentage = (annual_income / property_value) * 100
-			# Cap rate calculation (simplified - would need operating expenses for accurate calculation)
-			cap_rate = yield_percentage  # Using yield as approximation
-		
-		# Update financial fields
-		frappe.db.set_value("Property", self.name, {
-			"monthly_rental_income": monthly_income,
-			"potential_monthly_income": potential_income,
-			"annual_rental_income": annual_income,
-			"average_rent_per_unit": average_rent,
-			"total_property_value": property_value,
-			"yield_percentage": yield_percentage,
-			"cap_rate": cap_rate
-		})
-		
+		for metrics in get_property_metrics([self.name]):
+			values = calculate_property_metrics(metrics)
+			frappe.db.set_value("Property", self.name, values)
+			self.update(values)
+			
 	def get_available_units(self):
 		"""Get list of available rental units for this property"""
 		return frappe.get_all("Rental Unit", 
@@ -159,3 +105,149 @@ class Property(Document):
 			"annual_income": self.get_annual_rental_income(),
 			"active_contracts": len(self.get_active_contracts())
 		}
+
+def get_property_metrics(properties=None):
+	"""Aggregate unit counts and rents per property in one GROUP BY over Rental Unit"""
+	conditions = ""
+	params = {}
+	if properties is not None:
+		if not properties:
+			return []
+		conditions = "WHERE p.name IN %(properties)s"
+		params["properties"] = properties
+		
+	return frappe.db.sql(f"""
+		SELECT
+			p.name,
+			p.current_market_value,
+			p.purchase_price,
+			COUNT(ru.name) AS total_units,
+			IFNULL(SUM(ru.unit_status = 'Available'), 0) AS available_units,
+			IFNULL(SUM(ru.unit_status = 'Occupied'), 0) AS occupied_units,
+			IFNULL(SUM(CASE WHEN ru.unit_status = 'Occupied' THEN ru.monthly_rent ELSE 0 END), 0) AS monthly_rental_income,
+			IFNULL(SUM(ru.monthly_rent), 0) AS potential_monthly_income
+		FROM `tabProperty` p
+		LEFT JOIN `tabRental Unit` ru ON ru.property = p.name
+		{conditions}
+		GROUP BY p.name
+	""", params, as_dict=True)
+
+def calculate_property_metrics(metrics):
+	"""Derive the Property metric fields from aggregated unit data"""
+	total_units = cint(metrics.total_units)
+	monthly_income = flt(metrics.monthly_rental_income)
+	annual_income = monthly_income * 12
+	
+	# Calculate occupancy rate and vacancy rate
+	occupancy_rate = 0
+	vacancy_rate = 0
+	average_rent = 0
+	if total_units > 0:
+		occupancy_rate = (cint(metrics.occupied_units) / total_units) * 100
+		vacancy_rate = (cint(metrics.available_units) / total_units) * 100
+		average_rent = flt(metrics.potential_monthly_income) / total_units
+		
+	# Calculate yield and cap rate
+	property_value = flt(metrics.current_market_value) or flt(metrics.purchase_price)
+	yield_percentage = 0
+	if property_value > 0:
+		yield_percentage = (annual_income / property_value) * 100
+		
+	return {
+		"total_units": total_units,
+		"available_units": cint(metrics.available_units),
+		"occupied_units": cint(metrics.occupied_units),
+		"occupancy_rate": occupancy_rate,
+		"vacancy_rate": vacancy_rate,
+		"monthly_rental_income": monthly_income,
+		"potential_monthly_income": flt(metrics.potential_monthly_income),
+		"annual_rental_income": annual_income,
+		"average_rent_per_unit": average_rent,
+		"total_property_value": property_value,
+		"yield_percentage": yield_percentage,
+		# Cap rate calculation (simplified - would need operating expenses for accurate calculation)
+		"cap_rate": yield_percentage
+	}
+
+def mark_property_dirty(property):
+	"""Queue a property for one metrics recompute when the current transaction commits"""
+	if not property:
+		return
+		
+	if not hasattr(frappe.db, "before_commit"):
+		# Frappe versions without commit callbacks recompute right away
+		update_properties_metrics([property])
+		return
+		
+	dirty_properties = getattr(frappe.local, "dirty_properties", None)
+	if dirty_properties is None:
+		dirty_properties = frappe.local.dirty_properties = set()
+		frappe.db.before_commit.add(flush_dirty_properties)
+		frappe.db.after_rollback.add(clear_dirty_properties)
+		
+	dirty_properties.add(property)
+
+def clear_dirty_properties():
+	"""Forget queued recomputes, e.g. after a rollback"""
+	frappe.local.dirty_properties = None
+
+def flush_dirty_properties():
+	"""Recompute metrics once for every property marked dirty since the last commit"""
+	properties = getattr(frappe.local, "dirty_properties", None)
+	clear_dirty_properties()
+	
+	if properties:
+		update_properties_metrics(sorted(properties))
+
+def update_properties_metrics(properties=None):
+	"""Recompute and store metrics for several (or all) properties from one aggregate query"""
+	values_by_property = {
+		metrics.name: calculate_property_metrics(metrics)
+		for metrics in get_property_metrics(properties)
+	}
+	
+	names = sorted(values_by_property)
+	for start in range(0, len(names), METRICS_UPDATE_BATCH_SIZE):
+		bulk_update_property_metrics({
+			name: values_by_property[name] for name in names[start:start + METRICS_UPDATE_BATCH_SIZE]
+		})
+		
+	return len(names)
+
+def bulk_update_property_metrics(values_by_property):
+	"""Write metrics for many properties with a single UPDATE ... CASE statement"""
+	if not values_by_property:
+		return
+		
+	fieldnames = list(next(iter(values_by_property.values())))
+	assignments = []
+	params = []
+	for fieldname in fieldnames:
+		assignments.append(
+			f"`{fieldname}` = CASE name {' '.join(['WHEN %s THEN %s'] * len(values_by_property))} END"
+		)
+		for name, values in values_by_property.items():
+			params.extend([name, values[fieldname]])
+			
+	frappe.db.sql(f"""
+		UPDATE `tabProperty`
+		SET {", ".join(assignments)}
+		WHERE name IN %s
+	""", tuple(params) + (list(values_by_property),))
+
+def refresh_all_property_metrics():
+	"""Scheduled task: recompute metrics for every property in one pass and report the duration"""
+	started = time.monotonic()
+	try:
+		property_count = update_properties_metrics()
+		frappe.db.commit()
+		
+		duration = time.monotonic() - started
+		frappe.logger("property_manager").info(
+			f"Refreshed metrics for {property_count} properties in {duration:.2f}s"
+		)
+		return {"properties": property_count, "duration_seconds": duration}
+		
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(f"Error refreshing property metrics: {str(e)}", "Property Metrics Refresh")
@@ -0,0 +1,14 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class RentLedgerEntry(Document):
+	pass
+
+def on_doctype_update():
+	"""Dashboards filter the ledger by a date range and one property, tenant or unit"""
+	frappe.db.add_index("Rent Ledger Entry", ["property", "posting_date"])
+	frappe.db.add_index("Rent Ledger Entry", ["tenant", "posting_date"])
+	frappe.db.add_index("Rent Ledger Entry", ["rental_unit", "posting_date"])
@@ -0,0 +1,99 @@
+# Copyright (c) 2025, Farah and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, getdate, nowdate
+
+from property_manager.property_manager.utils.rent_ledger import (
+	LEDGER_AMOUNT_FIELDS,
+	build_rent_ledger_entries,
+	insert_rent_ledger_entries
+)
+from property_manager.property_manager.utils.reporting import get_ledger_overdue_analysis
+
+
+class TestRentLedgerEntry(FrappeTestCase):
+	def get_row(self, due_date, paid_amount, payment_date=None):
+		outstanding = 1000 - paid_amount
+		return frappe._dict(
+			rental_payment_schedule="RPS-TEST",
+			rental_contract="RC-TEST",
+			tenant="TENANT-TEST",
+			property="PROP-TEST",
+			rental_unit="UNIT-TEST",
+			due_date=due_date,
+			payment_amount=1000,
+			paid_amount=paid_amount,
+			outstanding=outstanding,
+			payment_status="Paid" if not outstanding else ("Partially Paid" if paid_amount else "Pending"),
+			payment_date=payment_date
+		)
+
+	def test_daily_entries(self):
+		rows = [
+			self.get_row("2025-01-01", 1000, "2025-01-03"),  # paid in the grace period
+			self.get_row("2025-02-01", 400, "2025-02-20"),  # partially paid, rest overdue
+			self.get_row("2025-04-01", 0)  # not yet due
+		]
+		entries = {entry.posting_date: entry for entry in build_rent_ledger_entries(rows, "2025-03-15")}
+
+		self.assertEqual(len(entries), 5)
+		self.assertEqual(entries[getdate("2025-01-01")].scheduled_amount, 1000)
+		self.assertEqual(entries[getdate("2025-01-03")].collected_amount, 1000)
+		self.assertEqual(entries[getdate("2025-01-03")].grace_period_count, 1)
+		self.assertEqual(entries[getdate("2025-02-01")].overdue_amount, 600)
+		self.assertEqual(entries[getdate("2025-02-20")].collected_amount, 400)
+		self.assertEqual(entries[getdate("2025-02-20")].late_count, 0)
+		self.assertEqual(entries[getdate("2025-04-01")].outstanding_amount, 1000)
+		self.assertEqual(entries[getdate("2025-04-01")].overdue_amount, 0)
+
+	def seed_overdue_entry(self, schedule, tenant, property, rental_unit, days_overdue, overdue_amount):
+		entry = frappe._dict(
+			posting_date=add_days(nowdate(), -days_overdue),
+			rental_payment_schedule=schedule,
+			rental_contract=None,
+			tenant=tenant,
+			property=property,
+			rental_unit=rental_unit,
+			**dict.fromkeys(LEDGER_AMOUNT_FIELDS, 0)
+		)
+		entry.update(
+			scheduled_amount=overdue_amount,
+			outstanding_amount=overdue_amount,
+			overdue_amount=overdue_amount,
+			payments_due=1,
+			payments_overdue=1 if overdue_amount else 0
+		)
+		return entry
+
+	def test_overdue_analysis_rollups(self):
+		prefix = f"RPS-TEST-{frappe.generate_hash(length=6)}"
+		schedules = [f"{prefix}-A", f"{prefix}-B", f"{prefix}-C"]
+		insert_rent_ledger_entries([
+			self.seed_overdue_entry(schedules[0], "TENANT-1", "PROP-1", "UNIT-1", 10, 100),
+			self.seed_overdue_entry(schedules[0], "TENANT-1", "PROP-1", "UNIT-1", 45, 200),
+			self.seed_overdue_entry(schedules[1], "TENANT-2", "PROP-1", "UNIT-2", 100, 300),
+			self.seed_overdue_entry(schedules[2], "TENANT-1", "PROP-2", "UNIT-3", 70, 50),
+			# Not overdue, so it is left out of every level
+			self.seed_overdue_entry(schedules[2], "TENANT-1", "PROP-2", "UNIT-3", 5, 0)
+		])
+		self.addCleanup(frappe.db.delete, "Rent Ledger Entry", {"rental_payment_schedule": ["in", schedules]})
+
+		analysis = get_ledger_overdue_analysis(["rental_payment_schedule IN %(names)s"], {"names": schedules})
+
+		self.assertEqual(analysis["aging_buckets"]["1-30_days"], {"count": 1, "amount": 100})
+		self.assertEqual(analysis["aging_buckets"]["31-60_days"], {"count": 1, "amount": 200})
+		self.assertEqual(analysis["aging_buckets"]["61-90_days"], {"count": 1, "amount": 50})
+		self.assertEqual(analysis["aging_buckets"]["90+_days"], {"count": 1, "amount": 300})
+		self.assertEqual(analysis["overdue_count"], 4)
+		self.assertEqual(analysis["total_overdue_amount"], 650)
+
+		tenants = {row["tenant"]: (row["count"], row["amount"]) for row in analysis["tenant_wise_overdue"]}
+		self.assertEqual(tenants, {"TENANT-1": (3, 350), "TENANT-2": (1, 300)})
+
+		properties = {row["property"]: (row["count"], row["amount"]) for row in analysis["property_totals_overdue"]}
+		self.assertEqual(properties, {"PROP-1": (3, 600), "PROP-2": (1, 50)})
+
+		units = {row["property_unit"]: row["amount"] for row in analysis["property_wise_overdue"]}
+		self.assertEqual(units, {"PROP-1 - UNIT-1": 300, "PROP-1 - UNIT-2": 300, "PROP-2 - UNIT-3": 50})
@@ -6,6 +6,12 @@ from frappe.model.document import Document
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from frappe.utils import getdate
+from property_manager.property_manager.doctype.unit_occupancy.unit_occupancy import (
+	get_overlapping_occupancy,
+	add_contract_occupancy,
+	remove_contract_occupancy
+)
+from property_manager.property_manager.doctype.property.property import mark_property_dirty
 
 class RentalContract(Document):
 	def validate(self):
@@ -41,20 +47,11 @@ class RentalContract(Document):
 			if self.contract_status == "Draft":
 				return
 				
-			overlapping_contracts = frappe.db.sql("""
-				SELECT name FROM `tabRental Contract`
-				WHERE rental_unit = %s
-				AND contract_status = 'Active'
-				AND name != %s
-				AND (
-					(start_date <= %s AND end_date >= %s) OR
-					(start_date <= %s AND end_date >= %s) OR
-					(start_date >= %s AND end_date <= %s)
-				)
-			""", (self.rental_unit, self.name or "", self.start_date, self.start_date, 
-				  self.end_date, self.end_date, self.start_date, self.end_date))
+			overlapping_contract = get_overlapping_occupancy(
+				self.rental_unit, self.start_date, self.end_date, self.name
+			)
 			
-			if overlapping_contracts:
+			if overlapping_contract:
 				frappe.throw(f"Unit {self.rental_unit} is not available for the selected period")
 				
 	def calculate_amounts(self):
@@ -107,6 +104,9 @@ class RentalContract(Document):
 		
 	def on_submit(self):
 		"""Actions when contract is submitted"""
+		# Reserve the unit for the contract period
+		add_contract_occupancy(self)
+		
 		# Mark unit as occupied
 		if self.rental_unit:
 			try:
@@ -126,17 +126,14 @@ class RentalContract(Document):
 		# Generate rent schedules
 		self.generate_rent_schedules()
 		
-		# Update property unit counts
-		if self.property:
-			try:
-				property_doc = frappe.get_doc("Property", self.property)
-				property_doc.update_unit_counts()
-			except:
-				# If property update fails, continue
-				pass
+		# Update property unit counts once the transaction commits
+		mark_property_dirty(self.property)
 		
 	def on_cancel(self):
 		"""Actions when contract is cancelled"""
+		# Free the contract period
+		remove_contract_occupancy(self)
+		
 		# Mark unit as available
 		if self.rental_unit:
 			try:
@@ -155,13 +152,8 @@ class RentalContract(Document):
 		except:
 			pass
 			
-		# Update property unit counts
-		if self.property:
-			try:
-				property_doc = frappe.get_doc("Property", self.property)
-				property_doc.update_unit_counts()
-			except:
-				pass
+		# Update property unit counts once the transaction commits
+		mark_property_dirty(self.property)
 			
 	def generate_rent_schedules(self):
 		"""Generate rent payment schedules based on payment frequency"""
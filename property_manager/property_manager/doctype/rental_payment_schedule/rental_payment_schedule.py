@@ -7,6 +7,16 @@ from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from frappe.utils import getdate, flt
 
+def get_schedule_status(schedule_status, paid_amount, outstanding_amount, has_overdue_payments):
+	"""Status of a schedule from its totals; has_overdue_payments is only called once something was paid"""
+	if flt(outstanding_amount) <= 0:
+		return "Completed"
+	if flt(paid_amount) > 0:
+		return "Overdue" if has_overdue_payments() else "Active"
+	if schedule_status in ("Draft", "Completed"):
+		return "Active"
+	return schedule_status
+
 class RentalPaymentSchedule(Document):
 	def validate(self):
 		self.populate_contract_details()
@@ -63,20 +73,21 @@ class RentalPaymentSchedule(Document):
 				
 	def update_schedule_status(self):
 		"""Update schedule status based on payment progress"""
-		if self.outstanding_amount <= 0:
-			self.schedule_status = "Completed"
-		elif self.paid_amount > 0:
-			# Check if any payments are overdue
-			today = datetime.now().date()
-			overdue_payments = [s for s in self.payment_schedules 
-							   if getdate(s.due_date) < today and flt(s.outstanding) > 0]
-			if overdue_payments:
-				self.schedule_status = "Overdue"
-			else:
-				self.schedule_status = "Active"
-		elif self.schedule_status == "Draft":
-			self.schedule_status = "Active"
+		self.schedule_status = get_schedule_status(
+			self.schedule_status, self.paid_amount, self.outstanding_amount, self.has_overdue_payments
+		)
 			
+	def has_overdue_payments(self):
+		"""Check for an overdue row, stopping at the first one found"""
+		today = datetime.now().date()
+		return any(getdate(s.due_date) < today and flt(s.outstanding) > 0 for s in self.payment_schedules)
+		
+	def apply_payment_delta(self, paid_delta):
+		"""Adjust totals by the paid amount change of a single row instead of recomputing all rows"""
+		self.paid_amount = flt(self.paid_amount) + flt(paid_delta)
+		self.outstanding_amount = flt(self.total_rent_amount) - self.paid_amount
+		self.update_schedule_status()
+		
 	def before_insert(self):
 		"""Set creation information"""
 		self.created_by = frappe.session.user
@@ -259,7 +270,7 @@ class RentalPaymentSchedule(Document):
 		else:
 			frappe.throw(f"No payment schedule found for due date: {due_date}")
 			
-		self.calculate_totals()
+		self.apply_payment_delta(paid_amount)
 		self.save()
 		
 		# Create sales invoice if needed
@@ -0,0 +1,137 @@
+# Copyright (c) 2025, Farah and Contributors
+# See license.txt
+
+import threading
+import unittest
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt, nowdate, add_days
+
+from property_manager.property_manager.doctype.rental_payment_schedule.rental_payment_schedule import get_schedule_status
+from property_manager.property_manager.utils.payment_entry import (
+	apply_payment_allocations,
+	run_with_lock_retry,
+	verify_rental_payment_schedule_totals
+)
+
+WORKERS = 8
+ROW_AMOUNT = 100
+
+
+class TestRentalPaymentSchedule(FrappeTestCase):
+	def setUp(self):
+		if not frappe.db.table_exists("Payment Schedule"):
+			raise unittest.SkipTest("Payment Schedule requires ERPNext")
+
+		self.parent = f"RPS-TEST-{frappe.generate_hash(length=8)}"
+		self.rows = [f"{self.parent}-{idx}" for idx in range(WORKERS)]
+
+		frappe.db.sql("""
+			INSERT INTO `tabRental Payment Schedule`
+				(name, tenant, property, rental_unit, total_rent_amount, paid_amount,
+				outstanding_amount, schedule_status, docstatus)
+			VALUES (%s, 'TEST-TENANT', 'TEST-PROPERTY', 'TEST-UNIT', %s, 0, %s, 'Active', 1)
+		""", (self.parent, WORKERS * ROW_AMOUNT, WORKERS * ROW_AMOUNT))
+
+		for idx, row in enumerate(self.rows):
+			frappe.db.sql("""
+				INSERT INTO `tabPayment Schedule`
+					(name, parent, parenttype, parentfield, idx, due_date, payment_amount, paid_amount, outstanding)
+				VALUES (%s, %s, 'Rental Payment Schedule', 'payment_schedules', %s, %s, %s, 0, %s)
+			""", (row, self.parent, idx + 1, add_days(nowdate(), 7 * idx), ROW_AMOUNT, ROW_AMOUNT))
+
+		# Workers use their own connections, so the fixture has to be visible to them
+		frappe.db.commit()
+
+	def tearDown(self):
+		frappe.db.sql("DELETE FROM `tabPayment Schedule` WHERE parent = %s", (self.parent,))
+		frappe.db.sql("DELETE FROM `tabRental Payment Schedule` WHERE name = %s", (self.parent,))
+		frappe.db.commit()
+
+	def make_allocation(self, row):
+		return {
+			"rental_payment_schedule": self.parent,
+			"payment_schedule_row": row,
+			"payment_schedule_doc": frappe._dict(name=row, payment_amount=ROW_AMOUNT, paid_amount=0, outstanding=ROW_AMOUNT),
+			"rental_contract": None,
+			"tenant": "TEST-TENANT",
+			"property": "TEST-PROPERTY",
+			"rental_unit": "TEST-UNIT",
+			"allocated_amount": ROW_AMOUNT
+		}
+
+	def run_parallel_payments(self, rows):
+		site = frappe.local.site
+		errors = []
+		start = threading.Barrier(len(rows))
+
+		def worker(idx, row):
+			frappe.init(site=site)
+			frappe.connect()
+			try:
+				payment_entry = frappe._dict(
+					name=f"{self.parent}-PE-{idx}",
+					posting_date=nowdate(),
+					reference_no=None,
+					mode_of_payment=None
+				)
+				start.wait()
+				run_with_lock_retry(apply_payment_allocations, payment_entry, [self.make_allocation(row)])
+				frappe.db.commit()
+			except Exception as e:
+				errors.append(e)
+			finally:
+				frappe.destroy()
+
+		threads = [threading.Thread(target=worker, args=(idx, row)) for idx, row in enumerate(rows)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(errors, [])
+
+	def test_parallel_payments_on_different_rows_keep_parent_totals(self):
+		self.run_parallel_payments(self.rows)
+
+		paid_amount = frappe.db.get_value("Rental Payment Schedule", self.parent, "paid_amount")
+		self.assertEqual(flt(paid_amount), WORKERS * ROW_AMOUNT)
+		self.assertEqual(frappe.db.get_value("Rental Payment Schedule", self.parent, "schedule_status"), "Completed")
+
+	def test_parallel_payments_on_same_row_allocate_once(self):
+		self.run_parallel_payments([self.rows[0]] * WORKERS)
+
+		row = frappe.db.get_value("Payment Schedule", self.rows[0], ["paid_amount", "outstanding"], as_dict=True)
+		paid_amount = frappe.db.get_value("Rental Payment Schedule", self.parent, "paid_amount")
+		self.assertEqual(flt(row.paid_amount), ROW_AMOUNT)
+		self.assertEqual(flt(row.outstanding), 0)
+		self.assertEqual(flt(paid_amount), ROW_AMOUNT)
+
+	def test_verifier_leaves_delta_totals_alone(self):
+		self.run_parallel_payments(self.rows[:2])
+
+		corrections = verify_rental_payment_schedule_totals(self.parent)
+		self.assertNotIn("paid_amount", corrections.get(self.parent, {}))
+
+	def test_verifier_corrects_drifted_totals(self):
+		frappe.db.set_value("Rental Payment Schedule", self.parent, "paid_amount", 12345)
+
+		corrections = verify_rental_payment_schedule_totals(self.parent)
+		self.assertEqual(flt(corrections[self.parent]["paid_amount"]), 0)
+		self.assertEqual(flt(frappe.db.get_value("Rental Payment Schedule", self.parent, "paid_amount")), 0)
+
+	def test_verifier_keeps_unpaid_schedule_status(self):
+		frappe.db.set_value("Payment Schedule", self.rows[0], "due_date", add_days(nowdate(), -10))
+
+		corrections = verify_rental_payment_schedule_totals(self.parent)
+		self.assertNotIn("schedule_status", corrections.get(self.parent, {}))
+		self.assertEqual(frappe.db.get_value("Rental Payment Schedule", self.parent, "schedule_status"), "Active")
+
+	def test_schedule_status_rule(self):
+		has_overdue = lambda: True
+		self.assertEqual(get_schedule_status("Active", 100, 0, has_overdue), "Completed")
+		self.assertEqual(get_schedule_status("Active", 100, 100, has_overdue), "Overdue")
+		self.assertEqual(get_schedule_status("Active", 0, 100, has_overdue), "Active")
+		self.assertEqual(get_schedule_status("Draft", 0, 100, has_overdue), "Active")
+		self.assertEqual(get_schedule_status("Completed", 0, 100, has_overdue), "Active")
@@ -3,6 +3,8 @@
 
 import frappe
 from frappe.model.document import Document
+from property_manager.property_manager.doctype.unit_occupancy.unit_occupancy import get_overlapping_occupancy
+from property_manager.property_manager.doctype.property.property import mark_property_dirty
 
 class RentalUnit(Document):
 	def validate(self):
@@ -33,9 +35,16 @@ class RentalUnit(Document):
 				
 	def on_update(self):
 		"""Update property's unit counts when unit is updated"""
-		if self.property:
-			property_doc = frappe.get_doc("Property", self.property)
-			property_doc.update_unit_counts()
+		# Recomputed once per property when the transaction commits
+		mark_property_dirty(self.property)
+		
+		previous = self.get_doc_before_save()
+		if previous and previous.property != self.property:
+			mark_property_dirty(previous.property)
+			
+	def on_trash(self):
+		"""Update property's unit counts when unit is deleted"""
+		mark_property_dirty(self.property)
 			
 	def update_lease_info(self, contract_doc=None):
 		"""Update current lease information from active contract"""
@@ -154,16 +163,7 @@ class RentalUnit(Document):
 			return False, f"Unit is currently {self.unit_status}"
 			
 		# Check for overlapping contracts
-		overlapping_contracts = frappe.db.sql("""
-			SELECT name FROM `tabRental Contract`
-			WHERE rental_unit = %s
-			AND contract_status = 'Active'
-			AND (
-				(start_date <= %s AND end_date >= %s) OR
-				(start_date <= %s AND end_date >= %s) OR
-				(start_date >= %s AND end_date <= %s)
-			)
-		""", (self.name, start_date, start_date, end_date, end_date, start_date, end_date))
+		overlapping_contracts = get_overlapping_occupancy(self.name, start_date, end_date)
 		
 		if overlapping_contracts:
 			return False, "Unit is already rented for this period"
@@ -194,4 +194,8 @@ class RentalUnit(Document):
 		daily_rate = self.monthly_rent / days_in_month
 		prorated_amount = daily_rate * days_to_charge
 		
-		return prorated_amount
\ No newline at end of file
+		return prorated_amount
+
+def on_doctype_update():
+	"""Index for availability searches filtered by property, status and unit type"""
+	frappe.db.add_index("Rental Unit", ["property", "unit_status", "unit_type"])
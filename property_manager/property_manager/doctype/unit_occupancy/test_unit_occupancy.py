@@ -0,0 +1,39 @@
+# Copyright (c) 2025, Farah and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from property_manager.property_manager.doctype.unit_occupancy.unit_occupancy import get_overlapping_occupancy
+
+UNIT = "TEST-OCCUPANCY-UNIT"
+
+
+class TestUnitOccupancy(FrappeTestCase):
+	def setUp(self):
+		# Existing occupancy: March through May
+		frappe.db.sql("""
+			INSERT INTO `tabUnit Occupancy` (name, rental_unit, rental_contract, start_date, end_date)
+			VALUES (%s, %s, %s, '2025-03-01', '2025-05-31')
+		""", (frappe.generate_hash(length=10), UNIT, "TEST-OCCUPANCY-CONTRACT"))
+
+	def tearDown(self):
+		frappe.db.delete("Unit Occupancy", {"rental_unit": UNIT})
+
+	def test_overlap_cases(self):
+		overlapping_periods = [
+			("2025-02-01", "2025-03-15"),  # ends inside
+			("2025-05-15", "2025-07-01"),  # starts inside
+			("2025-04-01", "2025-04-30"),  # contained
+			("2025-01-01", "2025-12-31"),  # encloses
+			("2025-05-31", "2025-06-30"),  # touches the last day
+		]
+		for start_date, end_date in overlapping_periods:
+			self.assertEqual(get_overlapping_occupancy(UNIT, start_date, end_date), "TEST-OCCUPANCY-CONTRACT")
+
+	def test_free_periods(self):
+		self.assertIsNone(get_overlapping_occupancy(UNIT, "2025-01-01", "2025-02-28"))
+		self.assertIsNone(get_overlapping_occupancy(UNIT, "2025-06-01", "2025-08-31"))
+
+	def test_own_contract_is_excluded(self):
+		self.assertIsNone(get_overlapping_occupancy(UNIT, "2025-04-01", "2025-04-30", "TEST-OCCUPANCY-CONTRACT"))
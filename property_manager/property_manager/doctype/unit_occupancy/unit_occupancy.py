@@ -0,0 +1,101 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import getdate
+from property_manager.property_manager.utils.occupancy_calendar import update_unit_calendar, rebuild_occupancy_calendar
+
+class UnitOccupancy(Document):
+	def validate(self):
+		if getdate(self.start_date) > getdate(self.end_date):
+			frappe.throw("Occupancy end date must be on or after the start date")
+
+def on_doctype_update():
+	"""Index serving the overlap check; recent intervals are found through end_date first"""
+	frappe.db.add_index("Unit Occupancy", ["rental_unit", "end_date", "start_date"])
+
+def get_overlapping_occupancy(rental_unit, start_date, end_date, exclude_contract=None):
+	"""Return the contract occupying a unit at any point between two dates (inclusive), if any"""
+	overlapping = frappe.db.sql("""
+		SELECT rental_contract FROM `tabUnit Occupancy`
+		WHERE rental_unit = %s
+		AND end_date >= %s
+		AND start_date <= %s
+		AND rental_contract != %s
+		LIMIT 1
+	""", (rental_unit, getdate(start_date), getdate(end_date), exclude_contract or ""))
+
+	return overlapping[0][0] if overlapping else None
+
+def add_contract_occupancy(contract):
+	"""Record the period a submitted contract occupies its unit"""
+	if not (contract.rental_unit and contract.start_date and contract.end_date):
+		return
+
+	# Serialize submissions for the same unit so two overlapping contracts can't both pass the check
+	frappe.db.get_value("Rental Unit", contract.rental_unit, "name", for_update=True)
+
+	overlapping_contract = get_overlapping_occupancy(
+		contract.rental_unit, contract.start_date, contract.end_date, contract.name
+	)
+	if overlapping_contract:
+		frappe.throw(
+			f"Unit {contract.rental_unit} is already occupied by {overlapping_contract} for the selected period"
+		)
+
+	frappe.get_doc({
+		"doctype": "Unit Occupancy",
+		"rental_unit": contract.rental_unit,
+		"property": contract.property,
+		"rental_contract": contract.name,
+		"tenant": contract.tenant,
+		"start_date": contract.start_date,
+		"end_date": contract.end_date
+	}).insert(ignore_permissions=True)
+
+	update_unit_calendar(contract.rental_unit, contract.property, contract.start_date, contract.end_date)
+
+def remove_contract_occupancy(contract):
+	"""Free the period a cancelled contract occupied"""
+	occupancies = frappe.get_all(
+		"Unit Occupancy",
+		filters={"rental_contract": contract.name},
+		fields=["rental_unit", "property", "start_date", "end_date"]
+	)
+	frappe.db.delete("Unit Occupancy", {"rental_contract": contract.name})
+
+	for occupancy in occupancies:
+		update_unit_calendar(
+			occupancy.rental_unit, occupancy.property, occupancy.start_date, occupancy.end_date, occupied=False
+		)
+
+def rebuild_unit_occupancy():
+	"""Rebuild the occupancy table from submitted active contracts"""
+	frappe.db.delete("Unit Occupancy")
+
+	contracts = frappe.get_all(
+		"Rental Contract",
+		filters={
+			"docstatus": 1,
+			"contract_status": "Active",
+			"rental_unit": ["is", "set"]
+		},
+		fields=["name", "rental_unit", "property", "tenant", "start_date", "end_date"]
+	)
+
+	for contract in contracts:
+		if not (contract.start_date and contract.end_date):
+			continue
+		frappe.get_doc({
+			"doctype": "Unit Occupancy",
+			"rental_unit": contract.rental_unit,
+			"property": contract.property,
+			"rental_contract": contract.name,
+			"tenant": contract.tenant,
+			"start_date": contract.start_date,
+			"end_date": contract.end_date
+		}).insert(ignore_permissions=True)
+
+	rebuild_occupancy_calendar()
+	return len(contracts)
@@ -0,0 +1,39 @@
+# Copyright (c) 2025, Farah and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from property_manager.property_manager.utils.occupancy_calendar import (
+	get_interval_mask,
+	encode_bitmap,
+	decode_bitmap,
+	calculate_vacancy_analytics
+)
+
+
+class TestUnitOccupancyCalendar(FrappeTestCase):
+	def test_bitmap_round_trip(self):
+		bits = get_interval_mask(2024, "2024-02-28", "2024-03-02")
+		self.assertEqual(bits.bit_count(), 4)  # leap day included
+		self.assertEqual(decode_bitmap(encode_bitmap(bits, 2024)), bits)
+
+	def test_interval_is_clipped_to_year(self):
+		bits = get_interval_mask(2025, "2024-12-01", "2025-01-10")
+		self.assertEqual(bits, (1 << 10) - 1)
+
+	def test_vacancy_analytics(self):
+		# Occupied Jan 5-10 and Jan 20-Mar 1: 9 vacant days between the two leases
+		bits = get_interval_mask(2024, "2024-01-05", "2024-01-10") | get_interval_mask(2024, "2024-01-20", "2024-03-01")
+		units = [
+			frappe._dict(name="UNIT-1", property="PROP-1", monthly_rent=3660, bits=bits),
+			frappe._dict(name="UNIT-2", property="PROP-1", monthly_rent=3660, bits=0)
+		]
+
+		analytics = calculate_vacancy_analytics(units, 2024)
+		property_analytics = analytics["properties"]["PROP-1"]
+
+		self.assertEqual(property_analytics["vacancy_days"][:3], [13 + 31, 0 + 29, 30 + 31])
+		self.assertEqual(property_analytics["vacancy_loss"][0], (13 + 31) * 120)
+		self.assertEqual(analytics["average_days_to_lease"], 9)
+		self.assertEqual(analytics["releases_count"], 1)
@@ -0,0 +1,12 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class UnitOccupancyCalendar(Document):
+	pass
+
+def on_doctype_update():
+	"""Calendars are read a whole year at a time, optionally for a set of properties"""
+	frappe.db.add_index("Unit Occupancy Calendar", ["year", "property"])
@@ -3,6 +3,9 @@
 
 import frappe
 from property_manager.property_manager.custom_fields import create_payment_schedule_custom_fields
+from property_manager.property_manager.doctype.unit_occupancy.unit_occupancy import rebuild_unit_occupancy
+from property_manager.property_manager.utils.duplicate_detection import backfill_payment_fingerprints, add_duplicate_detection_index
+from property_manager.property_manager.utils.rent_ledger import reconcile_rent_ledger
 
 def after_install():
     """
@@ -12,6 +15,16 @@ def after_install():
         # Create custom fields for Payment Schedule
         create_payment_schedule_custom_fields()
         
+        # Build unit occupancy intervals from existing contracts
+        rebuild_unit_occupancy()
+        
+        # Index existing Payment Entries for duplicate detection
+        backfill_payment_fingerprints()
+        add_duplicate_detection_index()
+        
+        # Build the rent ledger from existing payment schedules
+        reconcile_rent_ledger()
+        
         # Create default roles and permissions
         create_property_manager_roles()
         
@@ -79,7 +92,7 @@ def before_uninstall():
     """
     try:
         # Remove custom fields
-        from property_manager.custom_fields import remove_payment_schedule_custom_fields
+        from property_manager.property_manager.custom_fields import remove_payment_schedule_custom_fields
         remove_payment_schedule_custom_fields()
         
         frappe.db.commit()
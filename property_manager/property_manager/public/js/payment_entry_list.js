@@ -0,0 +1,81 @@
+// Copyright (c) 2025, Farah and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings['Payment Entry'] = frappe.listview_settings['Payment Entry'] || {};
+
+(function(settings) {
+    let original_onload = settings.onload;
+
+    settings.onload = function(listview) {
+        if (original_onload) {
+            original_onload(listview);
+        }
+
+        // Validate all selected entries in one request
+        listview.page.add_actions_menu_item(__('Validate Rental Context'), function() {
+            let names = listview.get_checked_items(true);
+            if (!names.length) {
+                frappe.msgprint(__('Select the Payment Entries to validate'));
+                return;
+            }
+            validate_rental_context_batch(names);
+        });
+    };
+})(frappe.listview_settings['Payment Entry']);
+
+function validate_rental_context_batch(names) {
+    frappe.call({
+        method: 'property_manager.property_manager.utils.validation.validate_payment_entries_rental_context',
+        args: {
+            payment_entry_names: names
+        },
+        freeze: true,
+        freeze_message: __('Validating {0} Payment Entries...', [names.length]),
+        callback: function(r) {
+            if (r.message && r.message.success) {
+                show_batch_validation_results(r.message);
+            } else if (r.message) {
+                frappe.msgprint(r.message.message);
+            }
+        }
+    });
+}
+
+function show_batch_validation_results(data) {
+    let rows = Object.keys(data.results).sort().map(function(name) {
+        let result = data.results[name];
+        let indicator = result.is_valid ? (result.warnings.length ? 'orange' : 'green') : 'red';
+        let messages = result.errors.concat(result.warnings).map(frappe.utils.escape_html).join('<br>');
+        return `
+            <tr>
+                <td><a href="/app/payment-entry/${encodeURIComponent(name)}">${frappe.utils.escape_html(name)}</a></td>
+                <td><span class="indicator ${indicator}">${result.is_valid ? __('Valid') : __('Invalid')}</span></td>
+                <td>${messages}</td>
+            </tr>
+        `;
+    }).join('');
+
+    let dialog = new frappe.ui.Dialog({
+        title: __('Rental Context Validation ({0} invalid)', [data.invalid_count]),
+        size: 'extra-large',
+        fields: [
+            {
+                fieldtype: 'HTML',
+                fieldname: 'results',
+                options: `
+                    <table class="table table-bordered">
+                        <thead>
+                            <tr>
+                                <th>${__('Payment Entry')}</th>
+                                <th>${__('Status')}</th>
+                                <th>${__('Messages')}</th>
+                            </tr>
+                        </thead>
+                        <tbody>${rows}</tbody>
+                    </table>
+                `
+            }
+        ]
+    });
+    dialog.show();
+}
@@ -90,9 +90,10 @@ function add_payment_status_indicators(frm) {
 function add_payment_dashboard_cards(frm) {
     // Add dashboard cards with key metrics
     frappe.call({
-        method: 'property_manager.utils.reporting.get_payment_schedule_dashboard',
+        method: 'property_manager.property_manager.utils.reporting.get_payment_schedule_dashboard_details',
         args: {
-            rental_payment_schedule: frm.doc.name
+            rental_payment_schedule: frm.doc.name,
+            page_length: 1
         },
         callback: function(r) {
             if (r.message && r.message.schedules && r.message.schedules.length > 0) {
@@ -229,105 +230,6 @@ function setup_realtime_updates(frm) {
     });
 }
 
-function show_payment_dashboard(frm) {
-    frappe.call({
-        method: 'property_manager.utils.reporting.get_payment_schedule_dashboard',
-        args: {
-            rental_payment_schedule: frm.doc.name
-        },
-        callback: function(r) {
-            if (r.message) {
-                let dashboard_data = r.message;
-                show_dashboard_dialog(dashboard_data);
-            }
-        }
-    });
-}
-
-function show_dashboard_dialog(dashboard_data) {
-    let dialog = new frappe.ui.Dialog({
-        title: __('Payment Dashboard'),
-        size: 'extra-large',
-        fields: [
-            {
-                fieldtype: 'HTML',
-                fieldname: 'dashboard_html'
-            }
-        ]
-    });
-    
-    let html = generate_dashboard_html(dashboard_data);
-    dialog.fields_dict.dashboard_html.$wrapper.html(html);
-    dialog.show();
-}
-
-function generate_dashboard_html(data) {
-    let schedule_data = data.schedules[0];
-    
-    let html = `
-        <div class="payment-dashboard">
-            <div class="row">
-                <div class="col-md-6">
-                    <h4>Financial Summary</h4>
-                    <table class="table table-bordered">
-                        <tr><td>Total Amount</td><td>${format_currency(schedule_data.financial_summary.total_amount)}</td></tr>
-                        <tr><td>Paid Amount</td><td>${format_currency(schedule_data.financial_summary.paid_amount)}</td></tr>
-                        <tr><td>Outstanding</td><td>${format_currency(schedule_data.financial_summary.outstanding_amount)}</td></tr>
-                        <tr><td>Completion Rate</td><td>${schedule_data.financial_summary.payment_completion_rate.toFixed(1)}%</td></tr>
-                    </table>
-                </div>
-                <div class="col-md-6">
-                    <h4>Payment Status</h4>
-                    <table class="table table-bordered">
-                        <tr><td>Completed</td><td>${schedule_data.payment_history.length}</td></tr>
-                        <tr><td>Overdue</td><td>${schedule_data.overdue_payments.length}</td></tr>
-                        <tr><td>Upcoming</td><td>${schedule_data.upcoming_payments.length}</td></tr>
-                        <tr><td>Total Payments</td><td>${schedule_data.payment_details.length}</td></tr>
-                    </table>
-                </div>
-            </div>
-    `;
-    
-    if (schedule_data.overdue_payments.length > 0) {
-        html += `
-            <div class="row mt-4">
-                <div class="col-md-12">
-                    <h4>Overdue Payments</h4>
-                    <table class="table table-striped">
-                        <thead>
-                            <tr>
-                                <th>Due Date</th>
-                                <th>Amount</th>
-                                <th>Outstanding</th>
-                                <th>Days Overdue</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-        `;
-        
-        schedule_data.overdue_payments.forEach(payment => {
-            html += `
-                <tr>
-                    <td>${frappe.datetime.str_to_user(payment.due_date)}</td>
-                    <td>${format_currency(payment.payment_amount)}</td>
-                    <td>${format_currency(payment.outstanding)}</td>
-                    <td>${payment.days_overdue} days</td>
-                </tr>
-            `;
-        });
-        
-        html += `
-                        </tbody>
-                    </table>
-                </div>
-            </div>
-        `;
-    }
-    
-    html += '</div>';
-    return html;
-}
-
 function show_payment_linking_dialog(frm) {
     let dialog = new frappe.ui.Dialog({
         title: __('Link Payment Entry'),
@@ -356,7 +258,7 @@ function show_payment_linking_dialog(frm) {
         ],
         primary_action: function(values) {
             frappe.call({
-                method: 'property_manager.utils.payment_entry.manual_link_payment_entry',
+                method: 'property_manager.property_manager.utils.payment_entry.manual_link_payment_entry',
                 args: {
                     payment_entry: values.payment_entry,
                     rental_payment_schedule: frm.doc.name,
@@ -373,7 +275,7 @@ function show_payment_linking_dialog(frm) {
         primary_action_label: __('Link Payment')
     });
     
-    // Populate payment schedule options
+    // Populate payment schedule options; the row name is sent as the value
     let options = [];
     frm.doc.payment_schedules.forEach(row => {
         if (parseFloat(row.outstanding) > 0) {
@@ -384,187 +286,7 @@ function show_payment_linking_dialog(frm) {
         }
     });
     
-    dialog.fields_dict.payment_schedule_row.df.options = options.map(opt => opt.label).join('\n');
-    dialog.show();
-}
-
-function show_payment_summary_dialog(frm) {
-    frappe.call({
-        method: 'property_manager.utils.payment_entry.get_payment_schedule_status',
-        args: {
-            rental_payment_schedule: frm.doc.name
-        },
-        callback: function(r) {
-            if (r.message) {
-                let summary = r.message;
-                show_summary_dialog(summary);
-            }
-        }
-    });
-}
-
-function show_summary_dialog(summary) {
-    let dialog = new frappe.ui.Dialog({
-        title: __('Payment Summary'),
-        size: 'large',
-        fields: [
-            {
-                fieldtype: 'HTML',
-                fieldname: 'summary_html'
-            }
-        ]
-    });
-    
-    let html = `
-        <div class="payment-summary">
-            <div class="row">
-                <div class="col-md-6">
-                    <h4>Overview</h4>
-                    <table class="table table-bordered">
-                        <tr><td>Total Schedules</td><td>${summary.total_schedules}</td></tr>
-                        <tr><td>Paid Schedules</td><td>${summary.paid_schedules}</td></tr>
-                        <tr><td>Partially Paid</td><td>${summary.partially_paid_schedules}</td></tr>
-                        <tr><td>Pending</td><td>${summary.pending_schedules}</td></tr>
-                        <tr><td>Overdue</td><td>${summary.overdue_schedules}</td></tr>
-                    </table>
-                </div>
-                <div class="col-md-6">
-                    <h4>Financial</h4>
-                    <table class="table table-bordered">
-                        <tr><td>Total Amount</td><td>${format_currency(summary.total_amount)}</td></tr>
-                        <tr><td>Paid Amount</td><td>${format_currency(summary.paid_amount)}</td></tr>
-                        <tr><td>Outstanding</td><td>${format_currency(summary.outstanding_amount)}</td></tr>
-                    </table>
-                </div>
-            </div>
-        </div>
-    `;
-    
-    dialog.fields_dict.summary_html.$wrapper.html(html);
-    dialog.show();
-}
-
-function show_export_dialog(frm) {
-    let dialog = new frappe.ui.Dialog({
-        title: __('Export Payment Data'),
-        fields: [
-            {
-                fieldtype: 'Select',
-                fieldname: 'format',
-                label: __('Format'),
-                options: 'Excel\nCSV\nPDF',
-                default: 'Excel',
-                reqd: 1
-            },
-            {
-                fieldtype: 'Date',
-                fieldname: 'from_date',
-                label: __('From Date')
-            },
-            {
-                fieldtype: 'Date',
-                fieldname: 'to_date',
-                label: __('To Date')
-            }
-        ],
-        primary_action: function(values) {
-            frappe.call({
-                method: 'property_manager.utils.reporting.export_payment_data',
-                args: {
-                    format_type: values.format.toLowerCase(),
-                    filters: {
-                        rental_payment_schedule: frm.doc.name,
-                        from_date: values.from_date,
-                        to_date: values.to_date
-                    }
-                },
-                callback: function(r) {
-                    if (r.message && !r.message.error) {
-                        // Handle export download
-                        frappe.msgprint(__('Export completed successfully'));
-                        dialog.hide();
-                    } else {
-                        frappe.msgprint(__('Export failed: ') + (r.message.error || 'Unknown error'));
-                    }
-                }
-            });
-        },
-        primary_action_label: __('Export')
-    });
-    
-    dialog.show();
-}
-
-function show_overdue_analysis(frm) {
-    frappe.call({
-        method: 'property_manager.utils.reporting.generate_overdue_analysis',
-        args: {
-            schedules: [frm.doc.name]
-        },
-        callback: function(r) {
-            if (r.message) {
-                let analysis = r.message;
-                show_overdue_dialog(analysis);
-            }
-        }
-    });
-}
-
-function show_overdue_dialog(analysis) {
-    let dialog = new frappe.ui.Dialog({
-        title: __('Overdue Analysis'),
-        size: 'large',
-        fields: [
-            {
-                fieldtype: 'HTML',
-                fieldname: 'analysis_html'
-            }
-        ]
-    });
-    
-    let html = `
-        <div class="overdue-analysis">
-            <div class="row">
-                <div class="col-md-12">
-                    <h4>Overdue Summary</h4>
-                    <p><strong>Total Overdue Amount:</strong> ${format_currency(analysis.total_overdue_amount)}</p>
-                    <p><strong>Number of Overdue Payments:</strong> ${analysis.overdue_count}</p>
-                </div>
-            </div>
-            <div class="row">
-                <div class="col-md-12">
-                    <h4>Aging Analysis</h4>
-                    <table class="table table-bordered">
-                        <thead>
-                            <tr>
-                                <th>Age Bucket</th>
-                                <th>Count</th>
-                                <th>Amount</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-    `;
-    
-    Object.keys(analysis.aging_buckets).forEach(bucket => {
-        let data = analysis.aging_buckets[bucket];
-        html += `
-            <tr>
-                <td>${bucket.replace('_', '-')}</td>
-                <td>${data.count}</td>
-                <td>${format_currency(data.amount)}</td>
-            </tr>
-        `;
-    });
-    
-    html += `
-                        </tbody>
-                    </table>
-                </div>
-            </div>
-        </div>
-    `;
-    
-    dialog.fields_dict.analysis_html.$wrapper.html(html);
+    dialog.set_df_property('payment_schedule_row', 'options', options);
     dialog.show();
 }
 
@@ -50,7 +50,7 @@ function load_property_performance_dashboard(frm) {
     if (!frm.doc.name) return;
     
     frappe.call({
-        method: 'property_manager.utils.reporting.get_property_performance',
+        method: 'property_manager.property_manager.utils.reporting.get_property_performance',
         args: {
             property: frm.doc.name
         },
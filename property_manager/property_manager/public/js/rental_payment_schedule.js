@@ -64,7 +64,7 @@ function add_payment_management_buttons(frm) {
     
     // Link Payment Entry Button
     frm.add_custom_button(__('Link Payment Entry'), function() {
-        show_payment_linking_dialog(frm);
+        show_payment_linking_dialog_global(frm.doc.name);
     }, __('Actions'));
     
     // Payment Summary Button
@@ -86,7 +86,7 @@ function add_payment_management_buttons(frm) {
     
     // Payment Reminders Button
     frm.add_custom_button(__('Send Reminders'), function() {
-        send_payment_reminders(frm);
+        send_payment_reminders_global(frm.doc.name);
     }, __('Actions'));
 }
 
@@ -94,9 +94,10 @@ function load_financial_summary_dashboard(frm) {
     if (!frm.doc.name) return;
     
     frappe.call({
-        method: 'property_manager.utils.reporting.get_payment_schedule_dashboard',
+        method: 'property_manager.property_manager.utils.reporting.get_payment_schedule_dashboard_details',
         args: {
-            rental_payment_schedule: frm.doc.name
+            rental_payment_schedule: frm.doc.name,
+            page_length: 1
         },
         callback: function(r) {
             if (r.message && r.message.schedules && r.message.schedules.length > 0) {
@@ -431,14 +432,21 @@ function show_payment_linking_dialog_global(schedule_name) {
                         }
                     };
                 }
+            },
+            {
+                fieldtype: 'Select',
+                fieldname: 'payment_schedule_row',
+                label: __('Payment Schedule Row'),
+                reqd: 1
             }
         ],
         primary_action: function(values) {
             frappe.call({
-                method: 'property_manager.utils.payment_entry.manual_link_payment_entry',
+                method: 'property_manager.property_manager.utils.payment_entry.manual_link_payment_entry',
                 args: {
                     payment_entry: values.payment_entry,
-                    rental_payment_schedule: schedule_name
+                    rental_payment_schedule: schedule_name,
+                    payment_schedule_row: values.payment_schedule_row
                 },
                 callback: function(r) {
                     if (r.message) {
@@ -452,7 +460,16 @@ function show_payment_linking_dialog_global(schedule_name) {
         primary_action_label: __('Link Payment')
     });
     
-    dialog.show();
+    // Only rows with an outstanding amount can take a payment
+    frappe.db.get_doc('Rental Payment Schedule', schedule_name).then(doc => {
+        dialog.set_df_property('payment_schedule_row', 'options', (doc.payment_schedules || [])
+            .filter(row => parseFloat(row.outstanding) > 0)
+            .map(row => ({
+                label: `${frappe.datetime.str_to_user(row.due_date)} - ${format_currency(row.outstanding)}`,
+                value: row.name
+            })));
+        dialog.show();
+    });
 }
 
 function show_payment_history_dialog(schedule_name) {
@@ -573,7 +590,7 @@ function show_export_dialog_global(schedule_name) {
         ],
         primary_action: function(values) {
             frappe.call({
-                method: 'property_manager.utils.reporting.export_payment_data',
+                method: 'property_manager.property_manager.utils.reporting.export_payment_data',
                 args: {
                     format_type: values.format.toLowerCase(),
                     filters: {
@@ -582,8 +599,7 @@ function show_export_dialog_global(schedule_name) {
                 },
                 callback: function(r) {
                     if (r.message && !r.message.error) {
-                        frappe.msgprint(__('Export completed successfully'));
-                        dialog.hide();
+                        handle_payment_export(r.message, dialog);
                     } else {
                         frappe.msgprint(__('Export failed: ') + (r.message.error || 'Unknown error'));
                     }
@@ -596,6 +612,346 @@ function show_export_dialog_global(schedule_name) {
     dialog.show();
 }
 
+function handle_payment_export(data, dialog) {
+    dialog.hide();
+    
+    if (data.queued) {
+        // Large exports are built in the background; wait for the notification of this export
+        frappe.msgprint(__('The export is being prepared. You will be notified when it is ready.'));
+        frappe.realtime.on('payment_export_ready', function on_export_ready(message) {
+            if (message.export_id !== data.export_id) return;
+            frappe.realtime.off('payment_export_ready', on_export_ready);
+            
+            if (message.error) {
+                frappe.msgprint(__('Export failed: ') + message.error);
+            } else {
+                frappe.msgprint(__('Export ready: {0}', [
+                    `<a href="${message.file_url}" target="_blank">${frappe.utils.escape_html(message.filename)}</a>`
+                ]));
+            }
+        });
+        return;
+    }
+    
+    frappe.msgprint(__('Export completed successfully'));
+    if (data.file_url) {
+        window.open(data.file_url);
+    }
+}
+
+function show_payment_dashboard(frm) {
+    let dialog = new frappe.ui.Dialog({
+        title: __('Payment Dashboard'),
+        size: 'extra-large',
+        fields: [
+            {
+                fieldtype: 'HTML',
+                fieldname: 'dashboard_html'
+            }
+        ]
+    });
+    
+    let $wrapper = dialog.fields_dict.dashboard_html.$wrapper;
+    $wrapper.html(`
+        <div class="payment-dashboard">
+            <div class="dashboard-summary text-muted">${__('Loading summary...')}</div>
+            <div class="dashboard-details text-muted mt-4">${__('Loading payments...')}</div>
+        </div>
+    `);
+    dialog.show();
+    
+    // The summary is rendered as soon as it arrives; payment details follow in their own request
+    frappe.call({
+        method: 'property_manager.property_manager.utils.reporting.get_payment_schedule_dashboard_summary',
+        args: {
+            rental_payment_schedule: frm.doc.name
+        },
+        callback: function(r) {
+            if (r.message) {
+                $wrapper.find('.dashboard-summary').removeClass('text-muted').html(generate_dashboard_summary_html(r.message));
+            }
+        }
+    });
+    
+    frappe.call({
+        method: 'property_manager.property_manager.utils.reporting.get_payment_schedule_dashboard_details',
+        args: {
+            rental_payment_schedule: frm.doc.name,
+            page_length: 1
+        },
+        callback: function(r) {
+            if (r.message && r.message.schedules && r.message.schedules.length > 0) {
+                $wrapper.find('.dashboard-details').removeClass('text-muted').html(generate_dashboard_details_html(r.message.schedules[0]));
+            }
+        }
+    });
+}
+
+function generate_dashboard_summary_html(data) {
+    let summary = data.summary;
+    let completion_rate = summary.total_amount > 0 ? summary.paid_amount / summary.total_amount * 100 : 0;
+    
+    let html = `
+        <div class="row">
+            <div class="col-md-6">
+                <h4>Financial Summary</h4>
+                <table class="table table-bordered">
+                    <tr><td>Total Amount</td><td>${format_currency(summary.total_amount)}</td></tr>
+                    <tr><td>Paid Amount</td><td>${format_currency(summary.paid_amount)}</td></tr>
+                    <tr><td>Outstanding</td><td>${format_currency(summary.outstanding_amount)}</td></tr>
+                    <tr><td>Completion Rate</td><td>${completion_rate.toFixed(1)}%</td></tr>
+                </table>
+            </div>
+            <div class="col-md-6">
+                <h4>Aging Analysis</h4>
+                <table class="table table-bordered">
+    `;
+    
+    Object.keys(data.overdue_analysis.aging_buckets).forEach(bucket => {
+        let bucket_data = data.overdue_analysis.aging_buckets[bucket];
+        html += `<tr><td>${bucket.replace('_', ' ')}</td><td>${bucket_data.count}</td><td>${format_currency(bucket_data.amount)}</td></tr>`;
+    });
+    
+    html += `
+                </table>
+            </div>
+        </div>
+    `;
+    return html;
+}
+
+function generate_dashboard_details_html(schedule_data) {
+    let html = `
+        <div class="row">
+            <div class="col-md-6">
+                <h4>Payment Status</h4>
+                <table class="table table-bordered">
+                    <tr><td>Completed</td><td>${schedule_data.payment_history.length}</td></tr>
+                    <tr><td>Overdue</td><td>${schedule_data.overdue_payments.length}</td></tr>
+                    <tr><td>Upcoming</td><td>${schedule_data.upcoming_payments.length}</td></tr>
+                    <tr><td>Total Payments</td><td>${schedule_data.payment_details.length}</td></tr>
+                </table>
+            </div>
+        </div>
+    `;
+    
+    if (schedule_data.overdue_payments.length > 0) {
+        html += `
+            <div class="row mt-4">
+                <div class="col-md-12">
+                    <h4>Overdue Payments</h4>
+                    <table class="table table-striped">
+                        <thead>
+                            <tr>
+                                <th>Due Date</th>
+                                <th>Amount</th>
+                                <th>Outstanding</th>
+                                <th>Days Overdue</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+        `;
+        
+        schedule_data.overdue_payments.forEach(payment => {
+            html += `
+                <tr>
+                    <td>${frappe.datetime.str_to_user(payment.due_date)}</td>
+                    <td>${format_currency(payment.payment_amount)}</td>
+                    <td>${format_currency(payment.outstanding)}</td>
+                    <td>${payment.days_overdue} days</td>
+                </tr>
+            `;
+        });
+        
+        html += `
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+        `;
+    }
+    
+    return html;
+}
+
+function show_payment_summary_dialog(frm) {
+    frappe.call({
+        method: 'property_manager.property_manager.utils.payment_entry.get_payment_schedule_status',
+        args: {
+            rental_payment_schedule: frm.doc.name
+        },
+        callback: function(r) {
+            if (r.message) {
+                let summary = r.message;
+                show_summary_dialog(summary);
+            }
+        }
+    });
+}
+
+function show_summary_dialog(summary) {
+    let dialog = new frappe.ui.Dialog({
+        title: __('Payment Summary'),
+        size: 'large',
+        fields: [
+            {
+                fieldtype: 'HTML',
+                fieldname: 'summary_html'
+            }
+        ]
+    });
+    
+    let html = `
+        <div class="payment-summary">
+            <div class="row">
+                <div class="col-md-6">
+                    <h4>Overview</h4>
+                    <table class="table table-bordered">
+                        <tr><td>Total Schedules</td><td>${summary.total_schedules}</td></tr>
+                        <tr><td>Paid Schedules</td><td>${summary.paid_schedules}</td></tr>
+                        <tr><td>Partially Paid</td><td>${summary.partially_paid_schedules}</td></tr>
+                        <tr><td>Pending</td><td>${summary.pending_schedules}</td></tr>
+                        <tr><td>Overdue</td><td>${summary.overdue_schedules}</td></tr>
+                    </table>
+                </div>
+                <div class="col-md-6">
+                    <h4>Financial</h4>
+                    <table class="table table-bordered">
+                        <tr><td>Total Amount</td><td>${format_currency(summary.total_amount)}</td></tr>
+                        <tr><td>Paid Amount</td><td>${format_currency(summary.paid_amount)}</td></tr>
+                        <tr><td>Outstanding</td><td>${format_currency(summary.outstanding_amount)}</td></tr>
+                    </table>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    dialog.fields_dict.summary_html.$wrapper.html(html);
+    dialog.show();
+}
+
+function show_export_dialog(frm) {
+    let dialog = new frappe.ui.Dialog({
+        title: __('Export Payment Data'),
+        fields: [
+            {
+                fieldtype: 'Select',
+                fieldname: 'format',
+                label: __('Format'),
+                options: 'Excel\nCSV\nPDF',
+                default: 'Excel',
+                reqd: 1
+            },
+            {
+                fieldtype: 'Date',
+                fieldname: 'from_date',
+                label: __('From Date')
+            },
+            {
+                fieldtype: 'Date',
+                fieldname: 'to_date',
+                label: __('To Date')
+            }
+        ],
+        primary_action: function(values) {
+            frappe.call({
+                method: 'property_manager.property_manager.utils.reporting.export_payment_data',
+                args: {
+                    format_type: values.format.toLowerCase(),
+                    filters: {
+                        rental_payment_schedule: frm.doc.name,
+                        from_date: values.from_date,
+                        to_date: values.to_date
+                    }
+                },
+                callback: function(r) {
+                    if (r.message && !r.message.error) {
+                        handle_payment_export(r.message, dialog);
+                    } else {
+                        frappe.msgprint(__('Export failed: ') + (r.message.error || 'Unknown error'));
+                    }
+                }
+            });
+        },
+        primary_action_label: __('Export')
+    });
+    
+    dialog.show();
+}
+
+function show_overdue_analysis(frm) {
+    frappe.call({
+        method: 'property_manager.property_manager.utils.reporting.generate_overdue_analysis',
+        args: {
+            schedules: [frm.doc.name]
+        },
+        callback: function(r) {
+            if (r.message) {
+                let analysis = r.message;
+                show_overdue_dialog(analysis);
+            }
+        }
+    });
+}
+
+function show_overdue_dialog(analysis) {
+    let dialog = new frappe.ui.Dialog({
+        title: __('Overdue Analysis'),
+        size: 'large',
+        fields: [
+            {
+                fieldtype: 'HTML',
+                fieldname: 'analysis_html'
+            }
+        ]
+    });
+    
+    let html = `
+        <div class="overdue-analysis">
+            <div class="row">
+                <div class="col-md-12">
+                    <h4>Overdue Summary</h4>
+                    <p><strong>Total Overdue Amount:</strong> ${format_currency(analysis.total_overdue_amount)}</p>
+                    <p><strong>Number of Overdue Payments:</strong> ${analysis.overdue_count}</p>
+                </div>
+            </div>
+            <div class="row">
+                <div class="col-md-12">
+                    <h4>Aging Analysis</h4>
+                    <table class="table table-bordered">
+                        <thead>
+                            <tr>
+                                <th>Age Bucket</th>
+                                <th>Count</th>
+                                <th>Amount</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+    `;
+    
+    Object.keys(analysis.aging_buckets).forEach(bucket => {
+        let data = analysis.aging_buckets[bucket];
+        html += `
+            <tr>
+                <td>${bucket.replace('_', '-')}</td>
+                <td>${data.count}</td>
+                <td>${format_currency(data.amount)}</td>
+            </tr>
+        `;
+    });
+    
+    html += `
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    dialog.fields_dict.analysis_html.$wrapper.html(html);
+    dialog.show();
+}
+
 // Utility functions
 function format_currency(value) {
     return frappe.format(value, {fieldtype: 'Currency'});
@@ -0,0 +1,192 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import cint, flt, getdate
+import hashlib
+import json
+
+# Search results are cached for this long unless a contract or unit change invalidates them first
+AVAILABILITY_CACHE_TTL = 600
+
+# Default and maximum number of units returned per page
+DEFAULT_PAGE_LENGTH = 50
+MAX_PAGE_LENGTH = 500
+
+# Cache key holding the current generation of availability search results
+AVAILABILITY_CACHE_VERSION_KEY = "property_manager:availability_search_version"
+
+def get_availability_cache_version():
+    """
+    Current generation of cached search results; changing it invalidates all of them at once
+    """
+    version = frappe.cache().get_value(AVAILABILITY_CACHE_VERSION_KEY)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(AVAILABILITY_CACHE_VERSION_KEY, version)
+    return version
+
+def invalidate_availability_cache(doc=None, method=None):
+    """
+    Hook function called when Rental Contracts or Rental Units change
+    Starts a new cache generation once the change commits, so stale availability results are never served
+    """
+    if not hasattr(frappe.db, "after_commit"):
+        # Frappe versions without commit callbacks invalidate right away
+        bump_availability_cache_version()
+        return
+
+    # Bumping before commit would let a concurrent search re-cache the old data under the new generation
+    if not getattr(frappe.local, "availability_cache_invalidation_queued", False):
+        frappe.local.availability_cache_invalidation_queued = True
+        frappe.db.after_commit.add(bump_availability_cache_version)
+        frappe.db.after_rollback.add(clear_availability_cache_invalidation)
+
+def clear_availability_cache_invalidation():
+    """
+    Forget a queued invalidation, e.g. after a rollback
+    """
+    frappe.local.availability_cache_invalidation_queued = False
+
+def bump_availability_cache_version():
+    """
+    Start a new generation of cached search results
+    """
+    clear_availability_cache_invalidation()
+    frappe.cache().set_value(AVAILABILITY_CACHE_VERSION_KEY, frappe.generate_hash(length=10))
+
+def parse_list(value):
+    """
+    Accept a list, a JSON list or a single value from a request argument
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return [value]
+    if isinstance(value, (list, tuple)):
+        return [item for item in value if item]
+    return [value]
+
+def get_availability_filters(properties=None, unit_type=None, bedrooms=None, furnished_status=None,
+                             min_rent=None, max_rent=None):
+    """
+    Build the SQL conditions and parameters for the unit filters
+    """
+    conditions = []
+    params = {}
+
+    properties = parse_list(properties)
+    if properties:
+        conditions.append("ru.property IN %(properties)s")
+        params["properties"] = properties
+
+    unit_types = parse_list(unit_type)
+    if unit_types:
+        conditions.append("ru.unit_type IN %(unit_types)s")
+        params["unit_types"] = unit_types
+
+    if bedrooms not in (None, ""):
+        conditions.append("ru.bedrooms = %(bedrooms)s")
+        params["bedrooms"] = cint(bedrooms)
+
+    if furnished_status:
+        conditions.append("ru.furnished_status = %(furnished_status)s")
+        params["furnished_status"] = furnished_status
+
+    if min_rent not in (None, ""):
+        conditions.append("ru.monthly_rent >= %(min_rent)s")
+        params["min_rent"] = flt(min_rent)
+
+    if max_rent not in (None, ""):
+        conditions.append("ru.monthly_rent <= %(max_rent)s")
+        params["max_rent"] = flt(max_rent)
+
+    return conditions, params
+
+def get_available_units(from_date, to_date, after=None, page_length=DEFAULT_PAGE_LENGTH, **filters):
+    """
+    Rental units with no occupancy overlapping the period, ordered by name
+    The overlap is an anti-join on the Unit Occupancy (rental_unit, end_date, start_date) index
+    Returns one page of units and the cursor for the next page
+    """
+    page_length = min(max(cint(page_length) or DEFAULT_PAGE_LENGTH, 1), MAX_PAGE_LENGTH)
+    conditions, params = get_availability_filters(**filters)
+    params.update({
+        "from_date": getdate(from_date),
+        "to_date": getdate(to_date),
+        "limit": page_length + 1
+    })
+
+    if after:
+        conditions.append("ru.name > %(after)s")
+        params["after"] = after
+
+    units = frappe.db.sql(f"""
+        SELECT
+            ru.name,
+            ru.property,
+            ru.unit_number,
+            ru.unit_type,
+            ru.bedrooms,
+            ru.bathrooms,
+            ru.furnished_status,
+            ru.square_footage,
+            ru.monthly_rent,
+            ru.unit_status
+        FROM `tabRental Unit` ru
+        WHERE ru.unit_status IN ('Available', 'Occupied')
+        {"".join(f" AND {condition}" for condition in conditions)}
+        AND NOT EXISTS (
+            SELECT 1 FROM `tabUnit Occupancy` uo
+            WHERE uo.rental_unit = ru.name
+            AND uo.end_date >= %(from_date)s
+            AND uo.start_date <= %(to_date)s
+        )
+        ORDER BY ru.name
+        LIMIT %(limit)s
+    """, params, as_dict=True)
+
+    has_more = len(units) > page_length
+    units = units[:page_length]
+
+    return {
+        "units": units,
+        "has_more": has_more,
+        "next_cursor": units[-1].name if has_more else None
+    }
+
+@frappe.whitelist()
+def search_available_units(from_date, to_date, properties=None, unit_type=None, bedrooms=None,
+                           furnished_status=None, min_rent=None, max_rent=None, after=None,
+                           page_length=DEFAULT_PAGE_LENGTH):
+    """
+    API endpoint to find rental units available for a period across one or many properties
+    Pass the returned next_cursor as after to fetch the following page
+    """
+    frappe.has_permission("Rental Unit", "read", throw=True)
+
+    if getdate(from_date) > getdate(to_date):
+        frappe.throw("From date must be on or before to date")
+
+    filters = {
+        "properties": sorted(parse_list(properties)),
+        "unit_type": sorted(parse_list(unit_type)),
+        "bedrooms": bedrooms,
+        "furnished_status": furnished_status,
+        "min_rent": min_rent,
+        "max_rent": max_rent
+    }
+    request = dict(filters, from_date=str(getdate(from_date)), to_date=str(getdate(to_date)),
+                   after=after, page_length=page_length)
+    request_hash = hashlib.md5(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+    cache_key = f"property_manager:availability_search:{get_availability_cache_version()}:{request_hash}"
+
+    result = frappe.cache().get_value(cache_key)
+    if result is None:
+        result = get_available_units(from_date, to_date, after=after, page_length=page_length, **filters)
+        frappe.cache().set_value(cache_key, result, expires_in_sec=AVAILABILITY_CACHE_TTL)
+
+    return dict(result, success=True)
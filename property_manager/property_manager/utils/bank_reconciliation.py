@@ -0,0 +1,596 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import flt, getdate, add_days, now_datetime, cint
+from property_manager.property_manager.utils.payment_entry import (
+    MATCH_WINDOW_DAYS,
+    build_schedule_info,
+    find_customers_for_tenants,
+    allocate_payment,
+    apply_payment_allocations
+)
+import xml.etree.ElementTree as ElementTree
+import csv
+import json
+import re
+import time
+
+# Payment Entries are created and committed in batches of this many transactions
+BATCH_SIZE = 500
+
+# Review queue rows are written with bulk inserts of this size
+REVIEW_INSERT_BATCH_SIZE = 1000
+
+# Default column names for CSV statements, matched case-insensitively
+CSV_COLUMN_MAP = {
+    "transaction_id": ["transaction id", "id", "fitid"],
+    "date": ["date", "booking date", "value date", "posting date"],
+    "amount": ["amount", "credit"],
+    "reference": ["reference", "payment reference", "end to end id"],
+    "counterparty": ["name", "counterparty", "payer", "debtor"],
+    "description": ["description", "details", "memo", "remittance information"]
+}
+
+def normalize_reference(reference):
+    """
+    Normalize a payment reference for index lookups (upper case, alphanumerics only)
+    """
+    return re.sub(r"[^A-Z0-9]", "", (reference or "").upper())
+
+def to_cents(amount):
+    """
+    Convert an amount to integer cents so it can be used as a hash key
+    """
+    return int(round(flt(amount) * 100))
+
+def get_reference_tokens(transaction):
+    """
+    Get all normalized tokens a transaction could be matched on
+    """
+    tokens = set()
+    for text in (transaction.get("reference"), transaction.get("description")):
+        if not text:
+            continue
+        tokens.add(normalize_reference(text))
+        for word in re.split(r"[\s,;/|]+", text):
+            token = normalize_reference(word)
+            if len(token) >= 4:
+                tokens.add(token)
+    tokens.discard("")
+    return tokens
+
+# Statement parsers
+# -----------------
+# Every parser is a generator yielding one normalized credit transaction at a time,
+# so statements are never fully loaded into memory
+
+def detect_statement_format(file_path, statement_format=None):
+    """
+    Detect statement format from the explicit setting or the file extension
+    """
+    if statement_format and statement_format != "Auto":
+        return statement_format
+
+    lower_path = file_path.lower()
+    if lower_path.endswith(".csv"):
+        return "CSV"
+    if lower_path.endswith(".xml") or lower_path.endswith(".053"):
+        return "CAMT.053"
+    if lower_path.endswith(".ofx") or lower_path.endswith(".qfx"):
+        return "OFX"
+
+    frappe.throw(f"Cannot detect statement format for {file_path}")
+
+def iter_statement_transactions(file_path, statement_format=None):
+    """
+    Stream normalized transactions from a statement file
+    """
+    statement_format = detect_statement_format(file_path, statement_format)
+    parsers = {
+        "CSV": iter_csv_transactions,
+        "CAMT.053": iter_camt053_transactions,
+        "OFX": iter_ofx_transactions
+    }
+    return parsers[statement_format](file_path)
+
+def iter_csv_transactions(file_path):
+    """
+    Stream credit transactions from a CSV statement
+    """
+    with open(file_path, newline="", encoding="utf-8-sig") as statement:
+        reader = csv.DictReader(statement)
+        columns = map_csv_columns(reader.fieldnames or [])
+
+        for line_number, record in enumerate(reader, start=2):
+            amount = flt(record.get(columns.get("amount")))
+            if amount <= 0:
+                continue
+
+            yield {
+                "transaction_id": record.get(columns.get("transaction_id")) or f"LINE-{line_number}",
+                "date": getdate(record.get(columns.get("date"))),
+                "amount": amount,
+                "reference": (record.get(columns.get("reference")) or "").strip(),
+                "counterparty": (record.get(columns.get("counterparty")) or "").strip(),
+                "description": (record.get(columns.get("description")) or "").strip()
+            }
+
+def map_csv_columns(fieldnames):
+    """
+    Map CSV header names to transaction keys
+    """
+    headers = {fieldname.strip().lower(): fieldname for fieldname in fieldnames if fieldname}
+    columns = {}
+    for key, candidates in CSV_COLUMN_MAP.items():
+        for candidate in candidates:
+            if candidate in headers:
+                columns[key] = headers[candidate]
+                break
+
+    for required in ("date", "amount"):
+        if required not in columns:
+            frappe.throw(f"CSV statement has no column for {required}")
+
+    return columns
+
+def iter_camt053_transactions(file_path):
+    """
+    Stream credit entries from an ISO 20022 CAMT.053 statement
+    """
+    for event, element in ElementTree.iterparse(file_path, events=("end",)):
+        if local_name(element.tag) != "Ntry":
+            continue
+
+        if find_text(element, "CdtDbtInd") == "CRDT":
+            references = [
+                find_text(element, "EndToEndId"),
+                find_text(element, "InstrId"),
+                find_text(element, "Ref")
+            ]
+            yield {
+                "transaction_id": find_text(element, "AcctSvcrRef") or find_text(element, "NtryRef") or find_text(element, "TxId"),
+                "date": getdate(find_text(element, "BookgDt/Dt") or find_text(element, "BookgDt/DtTm")[:10]
+                                or find_text(element, "ValDt/Dt")),
+                "amount": flt(find_text(element, "Amt")),
+                "reference": next((ref for ref in references if ref and ref != "NOTPROVIDED"), ""),
+                "counterparty": find_text(element, "Dbtr/Nm") or find_text(element, "Dbtr/Pty/Nm"),
+                "description": find_text(element, "Ustrd") or find_text(element, "AddtlNtryInf")
+            }
+
+        # Release the parsed entry so memory stays flat
+        element.clear()
+
+def local_name(tag):
+    """
+    Strip the XML namespace from a tag
+    """
+    return tag.rsplit("}", 1)[-1]
+
+def find_text(element, path):
+    """
+    Find the text of the first descendant matching a namespace-agnostic path like "BookgDt/Dt"
+    """
+    parts = path.split("/")
+    for candidate in element.iter():
+        if local_name(candidate.tag) != parts[0]:
+            continue
+        node = candidate
+        for part in parts[1:]:
+            node = next((child for child in node if local_name(child.tag) == part), None)
+            if node is None:
+                break
+        if node is not None and node.text:
+            return node.text.strip()
+    return ""
+
+def iter_ofx_transactions(file_path):
+    """
+    Stream credit transactions from an OFX (SGML or XML) statement
+    """
+    tag_pattern = re.compile(r"<(\w+)>([^<\r\n]*)")
+    current = None
+
+    with open(file_path, encoding="utf-8", errors="replace") as statement:
+        for line in statement:
+            for tag, value in tag_pattern.findall(line):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    current = {}
+                elif current is not None and value.strip():
+                    current[tag] = value.strip()
+
+            if current is not None and "</STMTTRN>" in line.upper():
+                amount = flt(current.get("TRNAMT"))
+                if amount > 0:
+                    yield {
+                        "transaction_id": current.get("FITID"),
+                        "date": getdate(current.get("DTPOSTED", "")[:8]),
+                        "amount": amount,
+                        "reference": current.get("REFNUM") or current.get("CHECKNUM") or "",
+                        "counterparty": current.get("NAME", ""),
+                        "description": current.get("MEMO", "")
+                    }
+                current = None
+
+# Matching index
+# --------------
+
+class OpenScheduleIndex:
+    """
+    In-memory hash indexes over open Payment Schedule rows
+
+    by_reference maps (amount in cents, normalized reference) to rows, where the reference
+    is any of the schedule, contract, tenant or customer names. by_amount maps amount in
+    cents to rows and is only used to suggest matches for the review queue.
+    """
+    def __init__(self, rows):
+        self.by_reference = {}
+        self.by_amount = {}
+        self.reserved = set()
+
+        for row in rows:
+            amount_key = to_cents(row.outstanding)
+            self.by_amount.setdefault(amount_key, []).append(row)
+            for reference in (row.rental_payment_schedule, row.rental_contract, row.tenant, row.customer):
+                reference_key = normalize_reference(reference)
+                if reference_key:
+                    self.by_reference.setdefault((amount_key, reference_key), []).append(row)
+
+    def lookup(self, transaction, window_days=MATCH_WINDOW_DAYS):
+        """
+        Return (reference matches, amount-only matches) for a transaction within the due-date window
+        """
+        amount_key = to_cents(transaction["amount"])
+
+        reference_matches = {}
+        for token in get_reference_tokens(transaction):
+            for row in self.by_reference.get((amount_key, token), []):
+                reference_matches[row.name] = row
+
+        amount_matches = {row.name: row for row in self.by_amount.get(amount_key, [])}
+
+        return (
+            self.filter_open_rows(reference_matches.values(), transaction["date"], window_days),
+            self.filter_open_rows(amount_matches.values(), transaction["date"], window_days)
+        )
+
+    def filter_open_rows(self, rows, transaction_date, window_days):
+        """
+        Keep rows not yet reserved by this statement and due within the window, oldest first
+        """
+        return sorted(
+            [row for row in rows
+             if row.name not in self.reserved and abs((getdate(row.due_date) - transaction_date).days) <= window_days],
+            key=lambda row: (getdate(row.due_date), row.name)
+        )
+
+def set_row_customers(rows):
+    """
+    Set the customer of each row's tenant, resolved for all tenants at once
+    """
+    customer_by_tenant = find_customers_for_tenants([row.tenant for row in rows])
+    for row in rows:
+        row.customer = customer_by_tenant.get(row.tenant)
+    return rows
+
+def load_open_schedule_rows(from_date, to_date):
+    """
+    Load all open Payment Schedule rows due in a date range with their tenant and customer
+    """
+    return set_row_customers(frappe.db.sql("""
+        SELECT
+            ps.name,
+            ps.due_date,
+            ps.payment_amount,
+            ps.paid_amount,
+            ps.outstanding,
+            ps.payment_entry,
+            rps.name as rental_payment_schedule,
+            rps.rental_contract,
+            rps.tenant,
+            rps.property,
+            rps.rental_unit
+        FROM `tabPayment Schedule` ps
+        INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
+        WHERE ps.parenttype = 'Rental Payment Schedule'
+        AND rps.schedule_status IN ('Active', 'Overdue')
+        AND rps.docstatus = 1
+        AND ps.outstanding > 0
+        AND (ps.payment_entry IS NULL OR ps.payment_entry = '')
+        AND ps.due_date BETWEEN %s AND %s
+    """, (from_date, to_date), as_dict=True))
+
+def get_statement_date_range(file_path, statement_format=None):
+    """
+    Get the first and last transaction date of a statement in one streaming pass
+    """
+    from_date = to_date = None
+    for transaction in iter_statement_transactions(file_path, statement_format):
+        transaction_date = transaction["date"]
+        if not from_date or transaction_date < from_date:
+            from_date = transaction_date
+        if not to_date or transaction_date > to_date:
+            to_date = transaction_date
+    return from_date, to_date
+
+# Reconciliation
+# --------------
+
+class StatementReconciler:
+    """
+    Match statement transactions against open rows and link them in batches
+    """
+    def __init__(self, import_doc):
+        self.import_doc = import_doc
+        self.index = None
+        self.pending_matches = []
+        self.pending_reviews = []
+        self.counts = {
+            "total_transactions": 0,
+            "matched_transactions": 0,
+            "review_transactions": 0,
+            "payment_entries_created": 0
+        }
+
+    def run(self, file_path):
+        """
+        Reconcile a statement file and return the counters
+        """
+        statement_format = self.import_doc.statement_format
+        from_date, to_date = get_statement_date_range(file_path, statement_format)
+        if not from_date:
+            return self.counts
+
+        window_days = cint(self.import_doc.date_window_days) or MATCH_WINDOW_DAYS
+        self.index = OpenScheduleIndex(
+            load_open_schedule_rows(add_days(from_date, -window_days), add_days(to_date, window_days))
+        )
+
+        for transaction in iter_statement_transactions(file_path, statement_format):
+            self.counts["total_transactions"] += 1
+            self.match_transaction(transaction, window_days)
+
+            if len(self.pending_matches) >= BATCH_SIZE:
+                self.flush_matches()
+            if len(self.pending_reviews) >= REVIEW_INSERT_BATCH_SIZE:
+                self.flush_reviews()
+
+        self.flush_matches()
+        self.flush_reviews()
+        return self.counts
+
+    def match_transaction(self, transaction, window_days):
+        """
+        Classify a transaction as matched or queue it for review
+        """
+        reference_matches, amount_matches = self.index.lookup(transaction, window_days)
+
+        # Exactly one open row (or several rows of a single schedule) is an unambiguous match
+        if reference_matches and len({row.rental_payment_schedule for row in reference_matches}) == 1:
+            row = reference_matches[0]
+            if row.customer:
+                # Reserve the row so later transactions in this file can't match it again
+                self.index.reserved.add(row.name)
+                self.pending_matches.append((transaction, row))
+                self.counts["matched_transactions"] += 1
+                return
+
+        if reference_matches:
+            self.queue_review(transaction, "Ambiguous", reference_matches)
+        elif amount_matches:
+            self.queue_review(transaction, "Amount Only", amount_matches)
+        else:
+            self.queue_review(transaction, "No Match", [])
+
+    def queue_review(self, transaction, match_type, candidates):
+        """
+        Add a transaction to the review queue
+        """
+        self.counts["review_transactions"] += 1
+        self.pending_reviews.append((
+            frappe.generate_hash(length=12),
+            self.import_doc.name,
+            transaction.get("transaction_id"),
+            transaction["date"],
+            transaction["amount"],
+            transaction.get("reference"),
+            transaction.get("counterparty"),
+            transaction.get("description"),
+            match_type,
+            json.dumps([candidate.name for candidate in candidates[:20]]),
+            "Open"
+        ))
+
+    def flush_reviews(self):
+        """
+        Bulk insert queued review items
+        """
+        if not self.pending_reviews:
+            return
+
+        frappe.db.bulk_insert(
+            "Bank Statement Review Item",
+            fields=["name", "bank_statement_import", "transaction_id", "transaction_date", "amount",
+                    "reference", "counterparty", "description", "match_type", "candidate_rows", "status"],
+            values=self.pending_reviews
+        )
+        self.pending_reviews = []
+        frappe.db.commit()
+
+    def flush_matches(self):
+        """
+        Create, submit and link Payment Entries for a batch of matched transactions
+        """
+        for transaction, row in self.pending_matches:
+            # A failed transaction only rolls back its own work, not the batch created before it
+            savepoint = f"bank_transaction_{frappe.generate_hash(length=8)}"
+            frappe.db.savepoint(savepoint)
+            try:
+                create_linked_payment_entry(self.import_doc, transaction, [row])
+                self.counts["payment_entries_created"] += 1
+            except Exception as e:
+                frappe.db.rollback(save_point=savepoint)
+                frappe.log_error(
+                    f"Error creating Payment Entry for bank transaction {transaction.get('transaction_id')}: {str(e)}",
+                    "Bank Statement Reconciliation"
+                )
+                self.counts["matched_transactions"] -= 1
+                self.queue_review(transaction, "Ambiguous", [row])
+
+        self.pending_matches = []
+        frappe.db.commit()
+
+def create_linked_payment_entry(import_doc, transaction, rows):
+    """
+    Create and submit a Payment Entry for a bank transaction and link it to the given rows
+    """
+    row = rows[0]
+    payment_entry = frappe.get_doc({
+        "doctype": "Payment Entry",
+        "payment_type": "Receive",
+        "company": import_doc.company,
+        "posting_date": transaction["date"],
+        "mode_of_payment": import_doc.mode_of_payment,
+        "party_type": "Customer",
+        "party": row.customer,
+        "paid_to": import_doc.bank_account,
+        "paid_amount": transaction["amount"],
+        "received_amount": transaction["amount"],
+        "reference_no": transaction.get("reference") or transaction.get("transaction_id"),
+        "reference_date": transaction["date"],
+        "remarks": f"Rent received via bank statement {import_doc.name}: {transaction.get('description') or ''}"
+    })
+
+    # The rows are already known, so skip the matching done in the on_submit hook
+    payment_entry.flags.skip_rental_linking = True
+    payment_entry.insert(ignore_permissions=True)
+    payment_entry.submit()
+
+    allocations = allocate_payment(payment_entry, [build_schedule_info(row) for row in rows])
+    apply_payment_allocations(payment_entry, allocations)
+
+    return payment_entry
+
+def process_bank_statement_import(import_name):
+    """
+    Background job: reconcile a Bank Statement Import
+    """
+    import_doc = frappe.get_doc("Bank Statement Import", import_name)
+    started = time.monotonic()
+    import_doc.db_set("import_status", "Processing")
+    frappe.db.commit()
+
+    try:
+        file_path = frappe.get_doc("File", {"file_url": import_doc.statement_file}).get_full_path()
+        counts = StatementReconciler(import_doc).run(file_path)
+
+        import_doc.db_set({
+            **counts,
+            "import_status": "Completed",
+            "duration_seconds": time.monotonic() - started,
+            "completed_on": now_datetime()
+        })
+
+    except Exception as e:
+        frappe.db.rollback()
+        import_doc.db_set({
+            "import_status": "Failed",
+            "error_message": str(e),
+            "duration_seconds": time.monotonic() - started
+        })
+        frappe.log_error(f"Error processing bank statement import {import_name}: {str(e)}", "Bank Statement Reconciliation")
+
+    frappe.db.commit()
+    frappe.publish_realtime(
+        "bank_statement_import_progress",
+        {"bank_statement_import": import_name, "status": import_doc.import_status},
+        user=import_doc.owner
+    )
+
+@frappe.whitelist()
+def start_bank_statement_import(import_name):
+    """
+    Queue a Bank Statement Import for background reconciliation
+    """
+    import_doc = frappe.get_doc("Bank Statement Import", import_name)
+    frappe.has_permission("Bank Statement Import", "write", doc=import_doc, throw=True)
+    frappe.has_permission("Payment Entry", "create", throw=True)
+    if import_doc.import_status not in ("Draft", "Failed"):
+        frappe.throw(f"Bank Statement Import {import_name} is already {import_doc.import_status.lower()}")
+    if not import_doc.statement_file:
+        frappe.throw("Please attach a statement file")
+
+    import_doc.db_set("import_status", "Queued")
+    frappe.enqueue(
+        "property_manager.property_manager.utils.bank_reconciliation.process_bank_statement_import",
+        queue="long",
+        timeout=3600,
+        import_name=import_name
+    )
+    return {"success": True, "message": f"Bank Statement Import {import_name} queued"}
+
+@frappe.whitelist()
+def resolve_review_item(review_item, payment_schedule_row):
+    """
+    Resolve a review queue item by linking it to a chosen Payment Schedule row
+    """
+    item = frappe.get_doc("Bank Statement Review Item", review_item, for_update=True)
+    frappe.has_permission("Bank Statement Review Item", "write", doc=item, throw=True)
+    frappe.has_permission("Payment Entry", "submit", throw=True)
+    if item.status != "Open":
+        frappe.throw(f"Review item {review_item} is already {item.status.lower()}")
+
+    rows = frappe.db.sql("""
+        SELECT
+            ps.name,
+            ps.due_date,
+            ps.payment_amount,
+            ps.paid_amount,
+            ps.outstanding,
+            ps.payment_entry,
+            rps.name as rental_payment_schedule,
+            rps.rental_contract,
+            rps.tenant,
+            rps.property,
+            rps.rental_unit
+        FROM `tabPayment Schedule` ps
+        INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
+        WHERE ps.name = %s
+        AND ps.parenttype = 'Rental Payment Schedule'
+        FOR UPDATE
+    """, (payment_schedule_row,), as_dict=True)
+    set_row_customers(rows)
+
+    if not rows:
+        frappe.throw(f"Payment Schedule row {payment_schedule_row} not found")
+    if rows[0].payment_entry or flt(rows[0].outstanding) <= 0:
+        frappe.throw(f"Payment Schedule row {payment_schedule_row} is already paid or linked")
+    if not rows[0].customer:
+        frappe.throw(f"No customer found for tenant {rows[0].tenant}")
+
+    import_doc = frappe.get_doc("Bank Statement Import", item.bank_statement_import)
+    transaction = {
+        "transaction_id": item.transaction_id,
+        "date": getdate(item.transaction_date),
+        "amount": flt(item.amount),
+        "reference": item.reference,
+        "description": item.description
+    }
+    payment_entry = create_linked_payment_entry(import_doc, transaction, rows)
+
+    item.db_set({"status": "Resolved", "payment_entry": payment_entry.name})
+    return {"success": True, "payment_entry": payment_entry.name}
+
+@frappe.whitelist()
+def ignore_review_item(review_item):
+    """
+    Mark a review queue item as ignored
+    """
+    item = frappe.get_doc("Bank Statement Review Item", review_item, for_update=True)
+    frappe.has_permission("Bank Statement Review Item", "write", doc=item, throw=True)
+    if item.status != "Open":
+        frappe.throw(f"Review item {review_item} is already {item.status.lower()}")
+
+    item.db_set("status", "Ignored")
+    return {"success": True}
@@ -0,0 +1,255 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import flt, getdate, add_days, date_diff
+import hashlib
+import csv
+import json
+import math
+
+# Near-duplicates are looked for this many days either side of the payment date
+DUPLICATE_WINDOW_DAYS = 30
+
+# Payments whose amounts differ by at most this much are considered similar
+AMOUNT_TOLERANCE = 1
+
+def get_payment_fingerprint(party, reference_no):
+    """
+    Hash of (party, reference_no) used to find payments with the same reference through an index
+    Returns None for payments without a reference number
+    """
+    reference_no = (reference_no or "").strip(" ")
+    if not party or not reference_no:
+        return None
+    return hashlib.sha256(f"{party}\x1f{reference_no}".encode("utf-8")).hexdigest()
+
+def get_amount_bucket(amount):
+    """
+    Whole-unit bucket of an amount; similar amounts fall in the same or a neighbouring bucket
+    """
+    return int(math.floor(flt(amount)))
+
+def set_duplicate_fingerprint(doc, method):
+    """
+    Hook function called on Payment Entry validation
+    Keeps the duplicate detection fingerprint and amount bucket up to date
+    """
+    doc.rental_payment_fingerprint = get_payment_fingerprint(doc.party, doc.reference_no)
+    doc.rental_amount_bucket = get_amount_bucket(doc.paid_amount)
+
+def backfill_payment_fingerprints():
+    """
+    Set fingerprints and amount buckets on existing Payment Entries with one update
+    Mirrors get_payment_fingerprint and get_amount_bucket in SQL
+    """
+    frappe.db.sql("""
+        UPDATE `tabPayment Entry`
+        SET
+            rental_payment_fingerprint = IF(
+                IFNULL(party, '') = '' OR TRIM(IFNULL(reference_no, '')) = '',
+                NULL,
+                SHA2(CONCAT(party, CHAR(31), TRIM(reference_no)), 256)
+            ),
+            rental_amount_bucket = FLOOR(IFNULL(paid_amount, 0))
+    """)
+
+def add_duplicate_detection_index():
+    """
+    Composite index serving the near-duplicate lookup (party, amount bucket, posting date)
+    """
+    frappe.db.add_index("Payment Entry", ["party", "rental_amount_bucket", "posting_date"])
+
+def prepare_payment(payment, position=None):
+    """
+    Normalize a payment (Payment Entry or import row) for duplicate checks
+    """
+    payment_amount = flt(payment.get("paid_amount")) or flt(payment.get("base_paid_amount"))
+    return frappe._dict(
+        position=position,
+        name=payment.get("name") or "",
+        party=payment.get("party"),
+        reference_no=payment.get("reference_no"),
+        paid_amount=payment_amount,
+        posting_date=getdate(payment.get("posting_date")),
+        fingerprint=get_payment_fingerprint(payment.get("party"), payment.get("reference_no")),
+        bucket=get_amount_bucket(payment_amount)
+    )
+
+def get_neighbour_buckets(bucket):
+    """
+    Buckets that can hold amounts within AMOUNT_TOLERANCE of an amount in the given bucket
+    """
+    return range(bucket - AMOUNT_TOLERANCE, bucket + AMOUNT_TOLERANCE + 1)
+
+def is_similar_payment(payment, other):
+    """
+    Check if another payment of the same party has a similar amount within the duplicate window
+    """
+    return (
+        abs(flt(other.paid_amount) - payment.paid_amount) <= AMOUNT_TOLERANCE
+        and abs(date_diff(other.posting_date, payment.posting_date)) <= DUPLICATE_WINDOW_DAYS
+    )
+
+def get_existing_reference_matches(fingerprints):
+    """
+    Submitted Payment Entries with any of the given fingerprints, keyed by fingerprint
+    """
+    matches = {}
+    if not fingerprints:
+        return matches
+
+    for entry in frappe.db.sql("""
+        SELECT name, party, paid_amount, posting_date, reference_no, rental_payment_fingerprint
+        FROM `tabPayment Entry`
+        WHERE rental_payment_fingerprint IN %s
+        AND docstatus = 1
+    """, (list(fingerprints),), as_dict=True):
+        matches.setdefault(entry.rental_payment_fingerprint, []).append(entry)
+
+    return matches
+
+def get_existing_similar_payments(payments):
+    """
+    Submitted customer Payment Entries in the amount buckets and date range of the given payments,
+    keyed by (party, bucket)
+    """
+    similar = {}
+    parties = list({payment.party for payment in payments if payment.party})
+    if not parties:
+        return similar
+
+    buckets = list({neighbour for payment in payments for neighbour in get_neighbour_buckets(payment.bucket)})
+    from_date = add_days(min(payment.posting_date for payment in payments), -DUPLICATE_WINDOW_DAYS)
+    to_date = add_days(max(payment.posting_date for payment in payments), DUPLICATE_WINDOW_DAYS)
+
+    for entry in frappe.db.sql("""
+        SELECT name, party, paid_amount, posting_date, reference_no, rental_amount_bucket
+        FROM `tabPayment Entry`
+        WHERE party IN %s
+        AND rental_amount_bucket IN %s
+        AND posting_date BETWEEN %s AND %s
+        AND party_type = 'Customer'
+        AND docstatus = 1
+    """, (parties, buckets, from_date, to_date), as_dict=True):
+        similar.setdefault((entry.party, entry.rental_amount_bucket), []).append(entry)
+
+    return similar
+
+def find_duplicate_payments_batch(payments):
+    """
+    Check many payments for duplicates against submitted Payment Entries and against each other
+    Uses one indexed query for reference duplicates and one for similar amounts
+    Returns one result per payment, in input order
+    """
+    payments = [prepare_payment(payment, position) for position, payment in enumerate(payments)]
+    if not payments:
+        return []
+
+    reference_matches = get_existing_reference_matches({p.fingerprint for p in payments if p.fingerprint})
+    similar_matches = get_existing_similar_payments(payments)
+
+    # Earlier rows of the same batch, so a file is also checked against itself
+    seen_fingerprints = {}
+    seen_buckets = {}
+    results = []
+
+    for payment in payments:
+        result = {
+            "position": payment.position,
+            "name": payment.name or None,
+            "reference_duplicates": [],
+            "similar_payments": [],
+            "batch_reference_duplicates": [],
+            "batch_similar_payments": []
+        }
+
+        if payment.fingerprint:
+            result["reference_duplicates"] = [
+                entry.name for entry in reference_matches.get(payment.fingerprint, [])
+                if entry.name != payment.name
+            ]
+            result["batch_reference_duplicates"] = list(seen_fingerprints.get(payment.fingerprint, []))
+            seen_fingerprints.setdefault(payment.fingerprint, []).append(payment.position)
+
+        for bucket in get_neighbour_buckets(payment.bucket):
+            result["similar_payments"].extend(
+                entry.name for entry in similar_matches.get((payment.party, bucket), [])
+                if entry.name != payment.name and is_similar_payment(payment, entry)
+            )
+            result["batch_similar_payments"].extend(
+                other.position for other in seen_buckets.get((payment.party, bucket), [])
+                if is_similar_payment(payment, other)
+            )
+        seen_buckets.setdefault((payment.party, payment.bucket), []).append(payment)
+
+        result["is_duplicate"] = bool(result["reference_duplicates"] or result["batch_reference_duplicates"])
+        results.append(result)
+
+    return results
+
+def find_duplicate_payments(payment_entry):
+    """
+    Check a single Payment Entry for duplicates
+    """
+    return find_duplicate_payments_batch([payment_entry])[0]
+
+def iter_import_file_payments(file_path):
+    """
+    Stream payments from a CSV import file with party, reference_no, paid_amount and posting_date columns
+    """
+    with open(file_path, newline="", encoding="utf-8-sig") as handle:
+        for row in csv.DictReader(handle):
+            row = {(key or "").strip().lower().replace(" ", "_"): value for key, value in row.items()}
+            yield {
+                "party": (row.get("party") or "").strip(),
+                "reference_no": row.get("reference_no"),
+                "paid_amount": row.get("paid_amount"),
+                "posting_date": row.get("posting_date")
+            }
+
+@frappe.whitelist()
+def check_duplicate_payments(payments):
+    """
+    API endpoint to check a batch of payments for duplicates
+    payments is a list (or JSON list) of dicts with party, reference_no, paid_amount and posting_date
+    """
+    try:
+        if isinstance(payments, str):
+            payments = json.loads(payments)
+
+        results = find_duplicate_payments_batch(payments)
+        return {
+            "success": True,
+            "results": results,
+            "duplicate_count": sum(1 for result in results if result["is_duplicate"])
+        }
+
+    except Exception as e:
+        frappe.log_error(f"Error checking duplicate payments: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+@frappe.whitelist()
+def check_import_file_duplicates(file_url):
+    """
+    API endpoint to check an uploaded CSV payment import file for duplicates in one pass
+    """
+    file_doc = frappe.get_doc("File", {"file_url": file_url})
+    frappe.has_permission("File", "read", doc=file_doc, throw=True)
+
+    try:
+        results = find_duplicate_payments_batch(list(iter_import_file_payments(file_doc.get_full_path())))
+        flagged = [
+            result for result in results
+            if result["is_duplicate"] or result["similar_payments"] or result["batch_similar_payments"]
+        ]
+        return {
+            "success": True,
+            "total_rows": len(results),
+            "duplicate_count": sum(1 for result in results if result["is_duplicate"]),
+            "flagged_rows": flagged
+        }
+
+    except Exception as e:
+        frappe.log_error(f"Error checking import file duplicates: {str(e)}")
+        return {"success": False, "message": str(e)}
@@ -242,8 +242,8 @@ def recover_from_linking_error(payment_entry):
         recovery_result["actions_taken"].append("Cleared partial payment links")
         
         # Attempt re-linking
-        from property_manager.utils.payment_entry import link_to_payment_schedule
-        link_to_payment_schedule(payment_entry, "on_submit")
+        from property_manager.property_manager.utils.payment_entry import link_payment_entry
+        link_payment_entry(payment_entry)
         
         recovery_result["success"] = True
         recovery_result["message"] = "Successfully recovered from linking error"
@@ -290,10 +290,10 @@ def recover_from_data_inconsistency(payment_entry):
         
         for schedule in linked_schedules:
             if schedule.parenttype == "Rental Payment Schedule":
-                schedule_doc = frappe.get_doc("Rental Payment Schedule", schedule.parent)
-                from property_manager.utils.payment_entry import update_rental_payment_schedule_totals
-                update_rental_payment_schedule_totals(schedule_doc)
-                recovery_result["actions_taken"].append(f"Recalculated totals for {schedule.parent}")
+                from property_manager.property_manager.utils.payment_entry import verify_rental_payment_schedule_totals
+                corrections = verify_rental_payment_schedule_totals(schedule.parent)
+                if corrections:
+                    recovery_result["actions_taken"].append(f"Recalculated totals for {schedule.parent}")
                 
         recovery_result["success"] = True
         recovery_result["message"] = "Successfully recovered from data inconsistency"
@@ -356,17 +356,27 @@ def retry_payment_operation(payment_entry_name, operation):
         payment_entry = frappe.get_doc("Payment Entry", payment_entry_name)
         
         if operation == "link":
-            from property_manager.utils.payment_entry import link_to_payment_schedule
-            link_to_payment_schedule(payment_entry, "on_submit")
+            from property_manager.property_manager.utils.payment_entry import link_payment_entry
+            status = "Linked" if link_payment_entry(payment_entry) else "Not Matched"
         elif operation == "unlink":
-            from property_manager.utils.payment_entry import unlink_from_payment_schedule
-            unlink_from_payment_schedule(payment_entry, "on_cancel")
+            from property_manager.property_manager.utils.payment_entry import unlink_payment_entry
+            unlink_payment_entry(payment_entry)
+            status = "Unlinked"
         else:
             return {"success": False, "message": f"Unknown operation: {operation}"}
             
+        payment_entry.db_set({"rental_link_status": status, "rental_link_error": None}, update_modified=False)
+        
+        if status == "Not Matched":
+            return {"success": False, "message": "No matching payment schedules found"}
         return {"success": True, "message": f"Successfully retried {operation} operation"}
         
     except Exception as e:
+        frappe.db.rollback()
+        frappe.db.set_value("Payment Entry", payment_entry_name, {
+            "rental_link_status": "Failed",
+            "rental_link_error": str(e)
+        }, update_modified=False)
         frappe.log_error(f"Error retrying payment operation: {str(e)}")
         return {"success": False, "message": f"Retry failed: {str(e)}"}
 
@@ -0,0 +1,235 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import cint, flt, getdate, now_datetime
+from calendar import isleap, monthrange
+from datetime import date
+from functools import lru_cache
+from operator import add
+import base64
+
+# Calendar rows are written with bulk inserts of this size during a rebuild
+CALENDAR_INSERT_BATCH_SIZE = 1000
+
+def days_in_year(year):
+    """
+    Number of days, and so bits, in a calendar year
+    """
+    return 366 if isleap(year) else 365
+
+def encode_bitmap(bits, year):
+    """
+    Store an occupancy bitmap as base64 bytes, one bit per day with January 1 as the lowest bit
+    """
+    return base64.b64encode(bits.to_bytes((days_in_year(year) + 7) // 8, "little")).decode()
+
+def decode_bitmap(value):
+    """
+    Load a stored occupancy bitmap back into an integer
+    """
+    if not value:
+        return 0
+    return int.from_bytes(base64.b64decode(value), "little")
+
+def get_interval_mask(year, start_date, end_date):
+    """
+    Bitmap with the days of an interval (inclusive) that fall in the given year
+    """
+    start_date = max(getdate(start_date), date(year, 1, 1))
+    end_date = min(getdate(end_date), date(year, 12, 31))
+    if start_date > end_date:
+        return 0
+
+    first_day = start_date.timetuple().tm_yday - 1
+    length = (end_date - start_date).days + 1
+    return ((1 << length) - 1) << first_day
+
+@lru_cache(maxsize=16)
+def get_month_masks(year):
+    """
+    Bitmap and day count of every month of a year
+    """
+    return [
+        (get_interval_mask(year, date(year, month, 1), date(year, month, monthrange(year, month)[1])),
+         monthrange(year, month)[1])
+        for month in range(1, 13)
+    ]
+
+def update_unit_calendar(rental_unit, property, start_date, end_date, occupied=True):
+    """
+    Set or clear the days of an occupancy interval in a unit's calendars, one row per year touched
+    """
+    start_date, end_date = getdate(start_date), getdate(end_date)
+
+    for year in range(start_date.year, end_date.year + 1):
+        name = f"{rental_unit}-{year}"
+        mask = get_interval_mask(year, start_date, end_date)
+        stored = frappe.db.get_value("Unit Occupancy Calendar", name, "occupied_days", for_update=True)
+
+        if stored is None:
+            if not occupied:
+                continue
+            bits = mask
+            frappe.get_doc({
+                "doctype": "Unit Occupancy Calendar",
+                "rental_unit": rental_unit,
+                "property": property,
+                "year": year,
+                "occupied_days": encode_bitmap(bits, year),
+                "occupied_day_count": bits.bit_count()
+            }).insert(ignore_permissions=True)
+            continue
+
+        bits = decode_bitmap(stored)
+        bits = bits | mask if occupied else bits & ~mask
+        frappe.db.set_value("Unit Occupancy Calendar", name, {
+            "occupied_days": encode_bitmap(bits, year),
+            "occupied_day_count": bits.bit_count()
+        }, update_modified=False)
+
+def rebuild_occupancy_calendar():
+    """
+    Rebuild all unit calendars from the occupancy intervals
+    """
+    calendars = {}
+    intervals = frappe.db.sql("""
+        SELECT rental_unit, property, start_date, end_date
+        FROM `tabUnit Occupancy`
+    """, as_dict=True)
+
+    for interval in intervals:
+        start_date, end_date = getdate(interval.start_date), getdate(interval.end_date)
+        for year in range(start_date.year, end_date.year + 1):
+            key = (interval.rental_unit, year)
+            property, bits = calendars.get(key, (interval.property, 0))
+            calendars[key] = (property, bits | get_interval_mask(year, start_date, end_date))
+
+    frappe.db.delete("Unit Occupancy Calendar")
+
+    timestamp = now_datetime()
+    values = [
+        (f"{rental_unit}-{year}", rental_unit, property, year, encode_bitmap(bits, year), bits.bit_count(),
+         timestamp, timestamp, "Administrator", "Administrator")
+        for (rental_unit, year), (property, bits) in calendars.items()
+    ]
+    for start in range(0, len(values), CALENDAR_INSERT_BATCH_SIZE):
+        frappe.db.bulk_insert(
+            "Unit Occupancy Calendar",
+            fields=["name", "rental_unit", "property", "year", "occupied_days", "occupied_day_count",
+                    "creation", "modified", "owner", "modified_by"],
+            values=values[start:start + CALENDAR_INSERT_BATCH_SIZE]
+        )
+
+    return len(values)
+
+def load_unit_calendars(year, properties=None):
+    """
+    Load every unit with its calendar bitmap for a year in one query
+    Units without a calendar row were vacant all year
+    """
+    conditions = ""
+    params = {"year": year}
+    if properties:
+        conditions = "WHERE ru.property IN %(properties)s"
+        params["properties"] = properties
+
+    units = frappe.db.sql(f"""
+        SELECT
+            ru.name,
+            ru.property,
+            ru.monthly_rent,
+            uoc.occupied_days
+        FROM `tabRental Unit` ru
+        LEFT JOIN `tabUnit Occupancy Calendar` uoc ON uoc.rental_unit = ru.name
+            AND uoc.year = %(year)s
+        {conditions}
+    """, params, as_dict=True)
+
+    for unit in units:
+        unit.bits = decode_bitmap(unit.occupied_days)
+
+    return units
+
+def calculate_vacancy_analytics(units, year):
+    """
+    Vacancy days and economic vacancy loss per property per month, and average days to lease
+    Works on whole-year bitmaps: each month is one mask and popcount per unit, and vacancy gaps
+    come from run counts, so no unit is walked day by day
+    """
+    month_masks = [mask for mask, month_days in get_month_masks(year)]
+    month_days = [month_days for mask, month_days in get_month_masks(year)]
+    year_days = days_in_year(year)
+    totals = {}
+    gap_days = 0
+    gap_count = 0
+
+    for unit in units:
+        bits = unit.bits
+        daily_rent = flt(unit.monthly_rent) * 12 / year_days
+        total = totals.get(unit.property)
+        if not total:
+            total = totals[unit.property] = {
+                "units": 0,
+                "daily_rent": 0.0,
+                "occupied_by_month": [0] * 12,
+                "occupied_rent_by_month": [0.0] * 12
+            }
+
+        total["units"] += 1
+        total["daily_rent"] += daily_rent
+        if not bits:
+            continue
+
+        occupied = [(bits & mask).bit_count() for mask in month_masks]
+        total["occupied_by_month"] = list(map(add, total["occupied_by_month"], occupied))
+        total["occupied_rent_by_month"] = [
+            occupied_rent + days * daily_rent
+            for occupied_rent, days in zip(total["occupied_rent_by_month"], occupied)
+        ]
+
+        # Occupied runs start where a set bit has no set bit before it; runs - 1 gaps lie between them
+        runs = (bits & ~(bits << 1)).bit_count()
+        if runs > 1:
+            first_day = (bits & -bits).bit_length() - 1
+            last_day = bits.bit_length() - 1
+            gap_days += (last_day - first_day + 1) - bits.bit_count()
+            gap_count += runs - 1
+
+    properties = {}
+    for property, total in totals.items():
+        occupied_days = sum(total["occupied_by_month"])
+        properties[property] = {
+            "units": total["units"],
+            "vacancy_days": [
+                total["units"] * days - occupied
+                for days, occupied in zip(month_days, total["occupied_by_month"])
+            ],
+            "vacancy_loss": [
+                flt(total["daily_rent"] * days - occupied_rent, 2)
+                for days, occupied_rent in zip(month_days, total["occupied_rent_by_month"])
+            ],
+            "occupied_days": occupied_days,
+            "occupancy_rate": occupied_days / (total["units"] * year_days) * 100
+        }
+
+    return {
+        "year": year,
+        "unit_count": len(units),
+        "properties": properties,
+        "average_days_to_lease": flt(gap_days / gap_count, 1) if gap_count else None,
+        "releases_count": gap_count
+    }
+
+@frappe.whitelist()
+def get_vacancy_analytics(year=None, properties=None):
+    """
+    API endpoint for historical vacancy analytics from the occupancy calendar
+    """
+    frappe.has_permission("Property", "read", throw=True)
+
+    year = cint(year) or getdate().year
+    if isinstance(properties, str):
+        properties = frappe.parse_json(properties) if properties.startswith("[") else [properties]
+
+    return calculate_vacancy_analytics(load_unit_calendars(year, properties), year)
@@ -2,102 +2,236 @@
 # For license information, please see license.txt
 
 import frappe
-from frappe.utils import flt, getdate, nowdate, add_days
+from frappe.utils import cint, flt, getdate, nowdate, add_days, now_datetime
 from datetime import datetime, timedelta
 import json
+import time
+from property_manager.property_manager.utils.rent_ledger import mark_rent_ledger_dirty
+from property_manager.property_manager.doctype.rental_payment_schedule.rental_payment_schedule import get_schedule_status
+
+# Payment Schedule rows due further than this from the posting date are never matched
+MATCH_WINDOW_DAYS = 30
+
+# Order in which a payment is spread over open Payment Schedule rows.
+# The site can override the default with "rental_payment_allocation_strategy" in site_config.json
+DEFAULT_ALLOCATION_STRATEGY = "FIFO"
+ALLOCATION_STRATEGIES = {
+    "FIFO": lambda row, payment_date: (getdate(row.due_date), row.name),
+    "LIFO": lambda row, payment_date: (-getdate(row.due_date).toordinal(), row.name),
+    "Nearest Due Date": lambda row, payment_date: (abs((getdate(row.due_date) - payment_date).days), getdate(row.due_date), row.name)
+}
+
+# Seconds a queued linking job waits for another job of the same customer to finish
+LINK_QUEUE_LOCK_TIMEOUT = 120
+
+# Times a linking transaction is retried after losing a deadlock or lock wait
+LOCK_RETRY_ATTEMPTS = 3
 
 def link_to_payment_schedule(doc, method):
     """
-    Link Payment Entry to corresponding Payment Schedule rows
-    Called when Payment Entry is submitted
+    Queue linking of Payment Entry to corresponding Payment Schedule rows
+    Called when Payment Entry is submitted; linking runs after the submit transaction commits
+    """
+    if not doc.party_type == "Customer":
+        return
+        
+    # Callers that already know the target rows link them themselves
+    if doc.flags.skip_rental_linking:
+        return
+        
+    enqueue_payment_link(doc, "Queued")
+        
+def unlink_from_payment_schedule(doc, method):
+    """
+    Queue unlinking of Payment Entry from Payment Schedule rows
+    Called when Payment Entry is cancelled; unlinking runs after the cancel transaction commits
+    """
+    if not doc.party_type == "Customer":
+        return
+        
+    enqueue_payment_link(doc, "Unlink Queued")
+
+def enqueue_payment_link(doc, status):
+    """
+    Mark the Payment Entry as queued and process the customer's link queue after commit
+    """
+    doc.db_set("rental_link_status", status, update_modified=False)
+    frappe.enqueue(
+        "property_manager.property_manager.utils.payment_entry.process_payment_link_queue",
+        queue="short",
+        enqueue_after_commit=True,
+        customer=doc.party
+    )
+
+def process_payment_link_queue(customer):
     """
+    Background job: process all queued link/unlink operations of a customer in posting order
+    A per-customer database lock keeps jobs of the same tenant from running concurrently
+    """
+    lock_name = f"rental_payment_link::{customer}"
+    acquired = frappe.db.sql("SELECT GET_LOCK(%s, %s)", (lock_name, LINK_QUEUE_LOCK_TIMEOUT))[0][0]
+    if not acquired:
+        # Entries stay queued; the next job for this customer or the relink sweep picks them up
+        frappe.log_error(f"Timed out waiting for payment link queue of {customer}", "Payment Schedule Linking")
+        return
+        
     try:
-        if not doc.party_type == "Customer":
-            return
-            
-        # Find matching rental payment schedules
-        matching_schedules = find_matching_payment_schedules(doc)
+        queued_entries = frappe.get_all(
+            "Payment Entry",
+            filters={
+                "party_type": "Customer",
+                "party": customer,
+                "rental_link_status": ["in", ["Queued", "Unlink Queued"]]
+            },
+            fields=["name"],
+            order_by="posting_date asc, creation asc"
+        )
         
-        if not matching_schedules:
-            # Log for debugging but don't block the payment
-            frappe.log_error(
-                f"No matching payment schedules found for Payment Entry {doc.name}",
-                "Payment Schedule Linking"
-            )
-            return
-            
-        # Process each matching schedule
-        for schedule_info in matching_schedules:
-            process_payment_schedule_link(doc, schedule_info)
+        for entry in queued_entries:
+            process_queued_payment_entry(entry.name)
             
+    finally:
+        frappe.db.sql("SELECT RELEASE_LOCK(%s)", (lock_name,))
+
+def process_queued_payment_entry(payment_entry_name):
+    """
+    Run the queued link or unlink operation of a single Payment Entry in its own transaction
+    """
+    doc = frappe.get_doc("Payment Entry", payment_entry_name)
+    
+    try:
+        status = run_with_lock_retry(run_queued_payment_link, doc)
+        doc.db_set({"rental_link_status": status, "rental_link_error": None}, update_modified=False)
         frappe.db.commit()
         
     except Exception as e:
+        frappe.db.rollback()
+        doc.db_set({"rental_link_status": "Failed", "rental_link_error": str(e)}, update_modified=False)
+        frappe.db.commit()
         frappe.log_error(
-            f"Error linking Payment Entry {doc.name} to Payment Schedule: {str(e)}",
+            f"Error processing queued link for Payment Entry {doc.name}: {str(e)}",
             "Payment Schedule Linking Error"
         )
-        # Don't throw error to avoid blocking payment submission
+
+def run_queued_payment_link(doc):
+    """
+    Run the queued operation of a Payment Entry and return its resulting link status
+    """
+    if doc.rental_link_status == "Unlink Queued":
+        unlink_payment_entry(doc)
+        return "Unlinked"
+    if doc.docstatus == 1 and link_payment_entry(doc):
+        return "Linked"
+    return "Not Matched"
+
+def run_with_lock_retry(operation, *args, **kwargs):
+    """
+    Run a database operation in the current transaction, retrying it when it loses
+    a deadlock or times out waiting for a row lock
+    """
+    for attempt in range(1, LOCK_RETRY_ATTEMPTS + 1):
+        try:
+            return operation(*args, **kwargs)
+        except (frappe.QueryDeadlockError, frappe.QueryTimeoutError):
+            frappe.db.rollback()
+            if attempt == LOCK_RETRY_ATTEMPTS:
+                raise
+            time.sleep(0.1 * attempt)
+
+def link_payment_entry(doc):
+    """
+    Link Payment Entry to corresponding Payment Schedule rows
+    Returns True when at least one row was linked
+    """
+    # Find matching rental payment schedules
+    matching_schedules = find_matching_payment_schedules(doc)
+    
+    if not matching_schedules:
+        # Log for debugging but don't block the payment
+        frappe.log_error(
+            f"No matching payment schedules found for Payment Entry {doc.name}",
+            "Payment Schedule Linking"
+        )
+        return False
         
-def unlink_from_payment_schedule(doc, method):
+    # Spread the payment over the matching rows and write each parent once
+    allocations = allocate_payment(doc, matching_schedules)
+    apply_payment_allocations(doc, allocations)
+    clear_cached_rental_context(doc.party)
+    return bool(allocations)
+
+def unlink_payment_entry(doc):
     """
     Unlink Payment Entry from Payment Schedule rows
-    Called when Payment Entry is cancelled
+    The linked rows are reverted with one targeted update and parent totals are adjusted by delta
     """
-    try:
-        # Find all Payment Schedule rows linked to this Payment Entry
-        linked_schedules = frappe.db.sql("""
-            SELECT 
-                ps.name as schedule_name,
-                ps.parent as payment_schedule_parent,
-                ps.parenttype,
-                ps.payment_amount,
-                ps.paid_amount,
-                ps.outstanding
-            FROM `tabPayment Schedule` ps
-            WHERE ps.payment_entry = %s
-        """, (doc.name,), as_dict=True)
-        
-        for schedule in linked_schedules:
-            # Get the parent document
-            parent_doc = frappe.get_doc(schedule.parenttype, schedule.payment_schedule_parent)
-            
-            # Find the specific child row
-            for child_row in parent_doc.payment_schedules:
-                if child_row.name == schedule.schedule_name:
-                    # Revert payment information
-                    child_row.payment_entry = None
-                    child_row.payment_status = "Pending"
-                    child_row.payment_date = None
-                    child_row.payment_reference = None
-                    child_row.payment_mode = None
-                    
-                    # Recalculate amounts
-                    payment_amount = flt(doc.paid_amount) if hasattr(doc, 'paid_amount') else flt(doc.base_paid_amount)
-                    child_row.paid_amount = flt(child_row.paid_amount) - payment_amount
-                    child_row.outstanding = flt(child_row.payment_amount) - flt(child_row.paid_amount)
-                    
-                    # Ensure paid_amount doesn't go negative
-                    if child_row.paid_amount < 0:
-                        child_row.paid_amount = 0
-                        child_row.outstanding = child_row.payment_amount
-                    
-                    break
-            
-            # Save the parent document
-            parent_doc.save()
+    # Find and lock all Payment Schedule rows linked to this Payment Entry, latest due first
+    linked_schedules = frappe.db.sql("""
+        SELECT 
+            ps.name as schedule_name,
+            ps.parent as payment_schedule_parent,
+            ps.parenttype,
+            ps.payment_amount,
+            ps.paid_amount
+        FROM `tabPayment Schedule` ps
+        WHERE ps.payment_entry = %s
+        ORDER BY ps.due_date DESC, ps.idx DESC
+        FOR UPDATE
+    """, (doc.name,), as_dict=True)
+    
+    if not linked_schedules:
+        return
+        
+    # Reverse the payment in the opposite order it was allocated (FIFO fills oldest rows first)
+    remaining = flt(doc.paid_amount) or flt(doc.base_paid_amount)
+    reverted_paid_amounts = {}
+    paid_deltas = {}
+    
+    for schedule in linked_schedules:
+        reversed_amount = min(remaining, flt(schedule.paid_amount))
+        remaining -= reversed_amount
+        reverted_paid_amounts[schedule.schedule_name] = flt(schedule.paid_amount) - reversed_amount
+        
+        if schedule.parenttype == "Rental Payment Schedule":
+            paid_deltas[schedule.payment_schedule_parent] = (
+                paid_deltas.get(schedule.payment_schedule_parent, 0) - reversed_amount
+            )
             
-            # Update parent totals if it's a Rental Payment Schedule
-            if schedule.parenttype == "Rental Payment Schedule":
-                update_rental_payment_schedule_totals(parent_doc)
-                
-        frappe.db.commit()
+    revert_payment_schedule_rows(reverted_paid_amounts)
+    
+    for rental_payment_schedule, paid_delta in sorted(paid_deltas.items()):
+        apply_rental_payment_schedule_delta(rental_payment_schedule, paid_delta)
         
-    except Exception as e:
-        frappe.log_error(
-            f"Error unlinking Payment Entry {doc.name} from Payment Schedule: {str(e)}",
-            "Payment Schedule Unlinking Error"
-        )
+    clear_cached_rental_context(doc.party)
+
+def clear_cached_rental_context(customer):
+    """
+    Drop the request's cached rental context for a customer after its rows changed
+    """
+    from property_manager.property_manager.utils.validation import clear_rental_context_cache
+    clear_rental_context_cache(customer)
+
+def revert_payment_schedule_rows(paid_amounts):
+    """
+    Clear payment links of Payment Schedule rows and set their paid amounts in a single update
+    paid_amounts maps row name -> paid amount remaining after the reversal
+    """
+    case_sql = " ".join(["WHEN %s THEN %s"] * len(paid_amounts))
+    case_values = [value for row_paid in paid_amounts.items() for value in row_paid]
+    
+    frappe.db.sql(f"""
+        UPDATE `tabPayment Schedule`
+        SET
+            paid_amount = CASE name {case_sql} END,
+            outstanding = payment_amount - (CASE name {case_sql} END),
+            payment_status = IF((CASE name {case_sql} END) > 0, 'Partially Paid', 'Pending'),
+            payment_entry = NULL,
+            payment_date = NULL,
+            payment_reference = NULL,
+            payment_mode = NULL,
+            modified = %s
+        WHERE name IN %s
+    """, tuple(case_values * 3) + (now_datetime(), list(paid_amounts)))
 
 def find_matching_payment_schedules(payment_entry):
     """
@@ -109,47 +243,112 @@ def find_matching_payment_schedules(payment_entry):
     try:
         # Get customer information
         customer = payment_entry.party
-        payment_amount = flt(payment_entry.paid_amount) or flt(payment_entry.base_paid_amount)
         payment_date = getdate(payment_entry.posting_date)
         
-        # Find tenant associated with this customer
-        tenant = find_tenant_by_customer(customer)
-        if not tenant:
-            return matching_schedules
-            
-        # Find active rental payment schedules for this tenant
-        rental_schedules = frappe.get_all(
-            "Rental Payment Schedule",
-            filters={
-                "tenant": tenant,
-                "schedule_status": ["in", ["Active", "Overdue"]],
-                "docstatus": 1
-            },
-            fields=["name", "rental_contract", "tenant", "property", "rental_unit"]
-        )
+        # Reuse the rental context when validation already loaded it in this request
+        from property_manager.property_manager.utils.validation import get_cached_rental_context
+        rental_context = get_cached_rental_context(customer)
         
-        for rental_schedule in rental_schedules:
-            # Get the full document to access child table
-            schedule_doc = frappe.get_doc("Rental Payment Schedule", rental_schedule.name)
+        if rental_context:
+            candidate_rows = filter_candidate_payment_schedule_rows(
+                rental_context["open_rows"], payment_entry.name, payment_date
+            )
+        else:
+            # Find tenant associated with this customer
+            tenant = find_tenant_by_customer(customer)
+            if not tenant:
+                return matching_schedules
+                
+            # Select only the candidate rows; scoring below runs on this small set
+            candidate_rows = get_candidate_payment_schedule_rows(tenant, payment_entry.name, payment_date)
             
-            # Check each payment schedule row
-            for payment_schedule in schedule_doc.payment_schedules:
-                if is_payment_schedule_match(payment_schedule, payment_entry, payment_amount, payment_date):
-                    matching_schedules.append({
-                        "rental_payment_schedule": rental_schedule.name,
-                        "payment_schedule_row": payment_schedule.name,
-                        "payment_schedule_doc": payment_schedule,
-                        "rental_contract": rental_schedule.rental_contract,
-                        "tenant": rental_schedule.tenant,
-                        "property": rental_schedule.property,
-                        "rental_unit": rental_schedule.rental_unit
-                    })
+        matching_schedules = select_matching_schedules(payment_entry, candidate_rows)
                     
     except Exception as e:
+        # Let the caller record the failure instead of reporting the payment as not matched
         frappe.log_error(f"Error finding matching payment schedules: {str(e)}")
+        raise
         
     return matching_schedules
 
+def select_matching_schedules(payment_entry, candidate_rows):
+    """
+    Score candidate Payment Schedule rows against a Payment Entry
+    Returns list of matching schedule information
+    """
+    payment_amount = flt(payment_entry.paid_amount) or flt(payment_entry.base_paid_amount)
+    payment_date = getdate(payment_entry.posting_date)
+    matching_schedules = []
+    
+    for payment_schedule in candidate_rows:
+        if is_payment_schedule_match(payment_schedule, payment_entry, payment_amount, payment_date):
+            matching_schedules.append(build_schedule_info(payment_schedule))
+            
+    # A payment larger than any single open row covers several instalments
+    if not matching_schedules and candidate_rows:
+        largest_outstanding = max(flt(row.outstanding) for row in candidate_rows)
+        if payment_amount > largest_outstanding + 0.01:
+            matching_schedules = [build_schedule_info(row) for row in candidate_rows]
+            
+    return matching_schedules
+
+def build_schedule_info(payment_schedule):
+    """
+    Build the schedule info dict used by the linking path from a candidate row
+    """
+    return {
+        "rental_payment_schedule": payment_schedule.rental_payment_schedule,
+        "payment_schedule_row": payment_schedule.name,
+        "payment_schedule_doc": payment_schedule,
+        "rental_contract": payment_schedule.rental_contract,
+        "tenant": payment_schedule.tenant,
+        "property": payment_schedule.property,
+        "rental_unit": payment_schedule.rental_unit
+    }
+
+def get_candidate_payment_schedule_rows(tenant, payment_entry_name, payment_date, window_days=MATCH_WINDOW_DAYS):
+    """
+    Fetch open Payment Schedule rows for a tenant in a single query
+    Only rows with an outstanding balance, not linked to another Payment Entry
+    and due within the matching window of the payment date are returned
+    """
+    return frappe.db.sql("""
+        SELECT 
+            ps.name,
+            ps.due_date,
+            ps.payment_amount,
+            ps.paid_amount,
+            ps.outstanding,
+            ps.payment_entry,
+            rps.name as rental_payment_schedule,
+            rps.rental_contract,
+            rps.tenant,
+            rps.property,
+            rps.rental_unit
+        FROM `tabPayment Schedule` ps
+        INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
+        WHERE ps.parenttype = 'Rental Payment Schedule'
+        AND rps.tenant = %s
+        AND rps.schedule_status IN ('Active', 'Overdue')
+        AND rps.docstatus = 1
+        AND ps.outstanding > 0
+        AND (ps.payment_entry IS NULL OR ps.payment_entry = '' OR ps.payment_entry = %s)
+        AND ps.due_date BETWEEN %s AND %s
+        ORDER BY ps.due_date, ps.idx
+    """, (tenant, payment_entry_name or "", add_days(payment_date, -window_days),
+          add_days(payment_date, window_days)), as_dict=True)
+
+def filter_candidate_payment_schedule_rows(rows, payment_entry_name, payment_date, window_days=MATCH_WINDOW_DAYS):
+    """
+    Apply the candidate row conditions of get_candidate_payment_schedule_rows to already loaded rows
+    """
+    return [
+        row for row in rows
+        if flt(row.outstanding) > 0
+        and (not row.payment_entry or row.payment_entry == payment_entry_name)
+        and abs((getdate(row.due_date) - payment_date).days) <= window_days
+    ]
+
 def is_payment_schedule_match(payment_schedule, payment_entry, payment_amount, payment_date):
     """
     Determine if a payment schedule row matches the payment entry
@@ -168,10 +367,10 @@ def is_payment_schedule_match(payment_schedule, payment_entry, payment_amount, p
         if payment_amount > outstanding_amount + 0.01:  # Allow small rounding differences
             return False
             
-        # Check date proximity (within 30 days of due date)
+        # Check date proximity (within the matching window of the due date)
         due_date = getdate(payment_schedule.due_date)
         date_diff = abs((payment_date - due_date).days)
-        if date_diff > 30:
+        if date_diff > MATCH_WINDOW_DAYS:
             return False
             
         # Check for reference in payment entry remarks
@@ -194,129 +393,424 @@ def is_payment_schedule_match(payment_schedule, payment_entry, payment_amount, p
 def process_payment_schedule_link(payment_entry, schedule_info):
     """
     Process the linking of Payment Entry to a specific Payment Schedule row
+    Returns the allocations; errors are left to the caller
     """
-    try:
-        # Get the rental payment schedule document
-        rental_schedule_doc = frappe.get_doc("Rental Payment Schedule", schedule_info["rental_payment_schedule"])
-        
-        # Find the specific payment schedule row
-        payment_schedule_row = None
-        for row in rental_schedule_doc.payment_schedules:
-            if row.name == schedule_info["payment_schedule_row"]:
-                payment_schedule_row = row
-                break
-                
-        if not payment_schedule_row:
-            return
+    allocations = allocate_payment(payment_entry, [schedule_info])
+    apply_payment_allocations(payment_entry, allocations)
+    clear_cached_rental_context(payment_entry.party)
+    return allocations
+
+def get_allocation_strategy(strategy=None):
+    """
+    Resolve the allocation strategy, falling back to the site default
+    """
+    strategy = strategy or frappe.conf.get("rental_payment_allocation_strategy") or DEFAULT_ALLOCATION_STRATEGY
+    if strategy not in ALLOCATION_STRATEGIES:
+        frappe.throw(f"Unknown payment allocation strategy: {strategy}")
+    return strategy
+
+def allocate_payment(payment_entry, schedule_infos, strategy=None):
+    """
+    Spread a Payment Entry over Payment Schedule rows in a single pass
+    Rows are consumed in strategy order and each receives at most its outstanding amount,
+    so the same money is never allocated to more than one row
+    """
+    payment_amount = flt(payment_entry.paid_amount) or flt(payment_entry.base_paid_amount)
+    payment_date = getdate(payment_entry.posting_date)
+    sort_key = ALLOCATION_STRATEGIES[get_allocation_strategy(strategy)]
+    
+    allocations = []
+    remaining = payment_amount
+    
+    for schedule_info in sorted(schedule_infos, key=lambda info: sort_key(info["payment_schedule_doc"], payment_date)):
+        if remaining <= 0.01:
+            break
             
-        # Calculate payment allocation
-        payment_amount = flt(payment_entry.paid_amount) or flt(payment_entry.base_paid_amount)
-        outstanding_amount = flt(payment_schedule_row.outstanding)
-        allocated_amount = min(payment_amount, outstanding_amount)
-        
-        # Update payment schedule row
-        payment_schedule_row.payment_entry = payment_entry.name
-        payment_schedule_row.paid_amount = flt(payment_schedule_row.paid_amount) + allocated_amount
-        payment_schedule_row.outstanding = flt(payment_schedule_row.payment_amount) - flt(payment_schedule_row.paid_amount)
-        payment_schedule_row.payment_date = payment_entry.posting_date
-        payment_schedule_row.payment_reference = payment_entry.reference_no or payment_entry.name
-        payment_schedule_row.payment_mode = payment_entry.mode_of_payment
-        
-        # Update rental context information
-        payment_schedule_row.rental_contract_ref = schedule_info["rental_contract"]
-        payment_schedule_row.tenant_ref = schedule_info["tenant"]
-        payment_schedule_row.property_unit_ref = f"{schedule_info['property']} - {schedule_info['rental_unit']}"
-        
-        # Update payment status
-        if flt(payment_schedule_row.outstanding) <= 0.01:  # Fully paid (allow small rounding)
-            payment_schedule_row.payment_status = "Paid"
-            payment_schedule_row.outstanding = 0
-        elif flt(payment_schedule_row.paid_amount) > 0:
-            payment_schedule_row.payment_status = "Partially Paid"
-        else:
-            payment_schedule_row.payment_status = "Pending"
+        row = schedule_info["payment_schedule_doc"]
+        allocated_amount = min(remaining, flt(row.outstanding))
+        if allocated_amount <= 0:
+            continue
             
-        # Save the rental payment schedule
-        rental_schedule_doc.save()
+        allocations.append(dict(schedule_info, allocated_amount=allocated_amount))
+        remaining -= allocated_amount
         
-        # Update parent totals
-        update_rental_payment_schedule_totals(rental_schedule_doc)
+    return allocations
+
+def apply_payment_allocations(payment_entry, allocations):
+    """
+    Write allocations to the Payment Schedule rows and adjust each affected
+    Rental Payment Schedule once from the allocation deltas
+    Targeted rows and parents are locked first, so concurrent payments can't overwrite each other
+    """
+    allocations = lock_allocation_rows(payment_entry, allocations)
+    
+    allocations_by_parent = {}
+    for allocation in allocations:
+        allocations_by_parent.setdefault(allocation["rental_payment_schedule"], []).append(allocation)
         
-        # Log successful linking
-        frappe.logger().info(f"Successfully linked Payment Entry {payment_entry.name} to Payment Schedule {payment_schedule_row.name}")
+    for rental_payment_schedule, parent_allocations in sorted(allocations_by_parent.items()):
+        for allocation in parent_allocations:
+            update_payment_schedule_row(payment_entry, allocation)
+            
+        paid_delta = sum(flt(allocation["allocated_amount"]) for allocation in parent_allocations)
+        apply_rental_payment_schedule_delta(rental_payment_schedule, paid_delta)
         
-    except Exception as e:
-        frappe.log_error(f"Error processing payment schedule link: {str(e)}")
+        frappe.logger().info(
+            f"Successfully linked Payment Entry {payment_entry.name} to {len(parent_allocations)} "
+            f"Payment Schedule row(s) of {rental_payment_schedule}"
+        )
+
+def lock_allocation_rows(payment_entry, allocations):
+    """
+    Lock the targeted Payment Schedule rows (SELECT ... FOR UPDATE) and re-check allocations
+    against their committed values
+    Rows taken by another Payment Entry in the meantime are dropped and allocations are
+    capped at the current outstanding amount
+    """
+    if not allocations:
+        return []
+        
+    row_names = sorted({allocation["payment_schedule_row"] for allocation in allocations})
+    locked_rows = {
+        row.name: row for row in frappe.db.sql("""
+            SELECT name, payment_amount, paid_amount, outstanding, payment_entry
+            FROM `tabPayment Schedule`
+            WHERE name IN %s
+            ORDER BY name
+            FOR UPDATE
+        """, (row_names,), as_dict=True)
+    }
+    
+    checked_allocations = []
+    for allocation in allocations:
+        locked_row = locked_rows.get(allocation["payment_schedule_row"])
+        if not locked_row:
+            continue
+        if locked_row.payment_entry and locked_row.payment_entry != payment_entry.name:
+            continue
+            
+        allocated_amount = min(flt(allocation["allocated_amount"]), flt(locked_row.outstanding))
+        if allocated_amount <= 0:
+            continue
+            
+        row = allocation["payment_schedule_doc"]
+        row.payment_amount = locked_row.payment_amount
+        row.paid_amount = locked_row.paid_amount
+        row.outstanding = locked_row.outstanding
+        checked_allocations.append(dict(allocation, allocated_amount=allocated_amount))
+        
+    return checked_allocations
+
+def update_payment_schedule_row(payment_entry, allocation):
+    """
+    Apply an allocation to a single Payment Schedule row with a targeted update
+    """
+    row = allocation["payment_schedule_doc"]
+    paid_amount = flt(row.paid_amount) + flt(allocation["allocated_amount"])
+    outstanding = flt(row.payment_amount) - paid_amount
+    
+    if outstanding <= 0.01:  # Fully paid (allow small rounding)
+        payment_status = "Paid"
+        outstanding = 0
+    elif paid_amount > 0:
+        payment_status = "Partially Paid"
+    else:
+        payment_status = "Pending"
+        
+    frappe.db.set_value("Payment Schedule", allocation["payment_schedule_row"], {
+        "payment_entry": payment_entry.name,
+        "paid_amount": paid_amount,
+        "outstanding": outstanding,
+        "payment_status": payment_status,
+        "payment_date": payment_entry.posting_date,
+        "payment_reference": payment_entry.reference_no or payment_entry.name,
+        "payment_mode": payment_entry.mode_of_payment,
+        "rental_contract_ref": allocation["rental_contract"],
+        "tenant_ref": allocation["tenant"],
+        "property_unit_ref": f"{allocation['property']} - {allocation['rental_unit']}"
+    })
+    
+    # Keep the in-memory row consistent for callers that reuse it
+    row.paid_amount = paid_amount
+    row.outstanding = outstanding
+    row.payment_entry = payment_entry.name
+    row.payment_status = payment_status
+
+def apply_rental_payment_schedule_delta(rental_payment_schedule, paid_delta):
+    """
+    Adjust Rental Payment Schedule totals by a paid amount delta in one write
+    """
+    totals = frappe.db.get_value(
+        "Rental Payment Schedule",
+        rental_payment_schedule,
+        ["total_rent_amount", "paid_amount", "schedule_status"],
+        as_dict=True,
+        for_update=True
+    )
+    if not totals:
+        return
+        
+    paid_amount = max(flt(totals.paid_amount) + flt(paid_delta), 0)
+    outstanding_amount = flt(totals.total_rent_amount) - paid_amount
+    
+    frappe.db.set_value("Rental Payment Schedule", rental_payment_schedule, {
+        "paid_amount": paid_amount,
+        "outstanding_amount": outstanding_amount,
+        "schedule_status": get_rental_payment_schedule_status(
+            rental_payment_schedule, totals.schedule_status, paid_amount, outstanding_amount
+        ),
+        "last_updated": now_datetime()
+    })
+    mark_rent_ledger_dirty(rental_payment_schedule)
+
+def get_rental_payment_schedule_status(rental_payment_schedule, schedule_status, paid_amount, outstanding_amount):
+    """
+    Derive the schedule status from its totals with the controller's rule, checking overdue rows with one query
+    """
+    def has_overdue_rows():
+        return bool(frappe.db.sql("""
+            SELECT name
+            FROM `tabPayment Schedule`
+            WHERE parent = %s
+            AND parenttype = 'Rental Payment Schedule'
+            AND due_date < %s
+            AND outstanding > 0
+            LIMIT 1
+        """, (rental_payment_schedule, getdate(nowdate()))))
+        
+    return get_schedule_status(schedule_status, paid_amount, outstanding_amount, has_overdue_rows)
 
 def find_tenant_by_customer(customer):
     """
     Find tenant associated with a customer
+    Uses the same strategies as find_tenants_by_customers, so single and batch linking agree
     """
-    try:
-        # First try direct customer name match
-        tenant = frappe.db.get_value("Tenant", {"customer": customer}, "name")
-        if tenant:
-            return tenant
+    if not customer:
+        return None
+    return find_tenants_by_customers([customer]).get(customer)
+
+def find_tenants_by_customers(customers):
+    """
+    Resolve tenants for many customers at once
+    Uses one query per matching strategy (name pattern, company name, email, phone) instead of one per customer
+    Returns a dict of customer -> tenant
+    """
+    customers = list(set(customers or []))
+    if not customers:
+        return {}
+        
+    tenant_by_customer = {}
+    strategies = [
+        "t.name = SUBSTRING(c.name, 8) AND c.name LIKE 'TENANT-%%'",
+        "t.tenant_type = 'Corporate' AND t.company_name = c.name",
+        "t.email = c.email_id AND IFNULL(c.email_id, '') != ''",
+        "t.phone = c.mobile_no AND IFNULL(c.mobile_no, '') != ''"
+    ]
+    
+    for join_condition in strategies:
+        unresolved = [customer for customer in customers if customer not in tenant_by_customer]
+        if not unresolved:
+            break
             
-        # Try customer name pattern match
-        tenant_pattern = f"TENANT-{customer}"
-        tenant = frappe.db.get_value("Tenant", {"name": ["like", f"%{tenant_pattern}%"]}, "name")
-        if tenant:
-            return tenant
+        matches = frappe.db.sql(f"""
+            SELECT c.name as customer, MIN(t.name) as tenant
+            FROM `tabCustomer` c
+            INNER JOIN `tabTenant` t ON {join_condition}
+            WHERE c.name IN %s
+            GROUP BY c.name
+        """, (unresolved,), as_dict=True)
+        
+        for match in matches:
+            tenant_by_customer[match.customer] = match.tenant
             
-        # Try email match
-        customer_email = frappe.db.get_value("Customer", customer, "email_id")
-        if customer_email:
-            tenant = frappe.db.get_value("Tenant", {"email": customer_email}, "name")
-            if tenant:
-                return tenant
-                
-        # Try phone match
-        customer_phone = frappe.db.get_value("Customer", customer, "mobile_no")
-        if customer_phone:
-            tenant = frappe.db.get_value("Tenant", {"phone": customer_phone}, "name")
-            if tenant:
-                return tenant
-                
-        return None
+    return tenant_by_customer
+
+def find_customers_for_tenants(tenants):
+    """
+    Resolve the customers of many tenants at once, the reverse of find_tenants_by_customers
+    Follows get_or_create_customer: TENANT-<tenant>, or the company name for corporate tenants,
+    then email and phone
+    Returns a dict of tenant -> customer
+    """
+    tenants = list(set(filter(None, tenants or [])))
+    if not tenants:
+        return {}
         
-    except Exception as e:
-        frappe.log_error(f"Error finding tenant by customer {customer}: {str(e)}")
-        return None
+    customer_by_tenant = {}
+    strategies = [
+        "c.name = CONCAT('TENANT-', t.name)",
+        "t.tenant_type = 'Corporate' AND c.name = t.company_name",
+        "c.email_id = t.email AND IFNULL(t.email, '') != ''",
+        "c.mobile_no = t.phone AND IFNULL(t.phone, '') != ''"
+    ]
+    
+    for join_condition in strategies:
+        unresolved = [tenant for tenant in tenants if tenant not in customer_by_tenant]
+        if not unresolved:
+            break
+            
+        matches = frappe.db.sql(f"""
+            SELECT t.name as tenant, MIN(c.name) as customer
+            FROM `tabTenant` t
+            INNER JOIN `tabCustomer` c ON {join_condition}
+            WHERE t.name IN %s
+            GROUP BY t.name
+        """, (unresolved,), as_dict=True)
+        
+        for match in matches:
+            customer_by_tenant[match.tenant] = match.customer
+            
+    return customer_by_tenant
 
-def update_rental_payment_schedule_totals(rental_schedule_doc):
+def get_open_payment_schedule_rows_for_tenants(tenants, from_date, to_date):
     """
-    Update totals in Rental Payment Schedule based on child payment schedules
+    Fetch open, unlinked Payment Schedule rows of many tenants due in a date range with one query
+    Returns a dict of tenant -> rows ordered by due date
     """
-    try:
-        total_amount = 0
-        paid_amount = 0
+    rows_by_tenant = {}
+    if not tenants:
+        return rows_by_tenant
+        
+    rows = frappe.db.sql("""
+        SELECT 
+            ps.name,
+            ps.due_date,
+            ps.payment_amount,
+            ps.paid_amount,
+            ps.outstanding,
+            ps.payment_entry,
+            rps.name as rental_payment_schedule,
+            rps.rental_contract,
+            rps.tenant,
+            rps.property,
+            rps.rental_unit
+        FROM `tabPayment Schedule` ps
+        INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
+        WHERE ps.parenttype = 'Rental Payment Schedule'
+        AND rps.tenant IN %s
+        AND rps.schedule_status IN ('Active', 'Overdue')
+        AND rps.docstatus = 1
+        AND ps.outstanding > 0
+        AND (ps.payment_entry IS NULL OR ps.payment_entry = '')
+        AND ps.due_date BETWEEN %s AND %s
+        ORDER BY ps.due_date, ps.idx
+    """, (list(set(tenants)), from_date, to_date), as_dict=True)
+    
+    for row in rows:
+        rows_by_tenant.setdefault(row.tenant, []).append(row)
+        
+    return rows_by_tenant
+
+def get_recomputed_rental_payment_schedule_totals(rental_payment_schedule=None):
+    """
+    Recompute Rental Payment Schedule totals from their rows with one aggregate query
+    """
+    conditions = ""
+    params = {"today": getdate(nowdate())}
+    if rental_payment_schedule:
+        conditions = "AND rps.name = %(rental_payment_schedule)s"
+        params["rental_payment_schedule"] = rental_payment_schedule
+        
+    return frappe.db.sql(f"""
+        SELECT
+            rps.name,
+            rps.total_rent_amount,
+            rps.paid_amount,
+            rps.outstanding_amount,
+            rps.schedule_status,
+            rps.payments_count,
+            rps.overdue_payments_count,
+            rps.next_payment_due_date,
+            COUNT(ps.name) AS row_count,
+            SUM(ps.payment_amount) AS row_total_amount,
+            SUM(ps.paid_amount) AS row_paid_amount,
+            SUM(CASE WHEN ps.due_date < %(today)s AND ps.outstanding > 0 THEN 1 ELSE 0 END) AS row_overdue_count,
+            MIN(CASE WHEN ps.due_date >= %(today)s AND ps.outstanding > 0 THEN ps.due_date END) AS row_next_due_date
+        FROM `tabRental Payment Schedule` rps
+        JOIN `tabPayment Schedule` ps ON ps.parent = rps.name
+            AND ps.parenttype = 'Rental Payment Schedule'
+        WHERE rps.docstatus = 1
+        {conditions}
+        GROUP BY rps.name
+    """, params, as_dict=True)
+
+def get_rental_payment_schedule_drift(totals):
+    """
+    Compare stored totals with recomputed ones and return the fields that need correcting
+    """
+    total_rent_amount = flt(totals.row_total_amount)
+    paid_amount = flt(totals.row_paid_amount)
+    outstanding_amount = total_rent_amount - paid_amount
+    
+    schedule_status = get_schedule_status(
+        totals.schedule_status, paid_amount, outstanding_amount, lambda: bool(totals.row_overdue_count)
+    )
         
-        for schedule in rental_schedule_doc.payment_schedules:
-            total_amount += flt(schedule.payment_amount)
-            paid_amount += flt(schedule.paid_amount)
+    expected = {
+        "total_rent_amount": total_rent_amount,
+        "paid_amount": paid_amount,
+        "outstanding_amount": outstanding_amount,
+        "payments_count": totals.row_count,
+        "schedule_status": schedule_status,
+        "overdue_payments_count": totals.row_overdue_count,
+        "next_payment_due_date": totals.row_next_due_date
+    }
+    
+    drift = {}
+    for fieldname, value in expected.items():
+        stored = totals.get(fieldname)
+        if fieldname in ("total_rent_amount", "paid_amount", "outstanding_amount"):
+            changed = abs(flt(stored) - value) > 0.01
+        elif fieldname == "next_payment_due_date":
+            changed = (getdate(stored) if stored else None) != (getdate(value) if value else None)
+        elif fieldname == "schedule_status":
+            changed = stored != value
+        else:
+            changed = cint(stored) != cint(value)
             
-        rental_schedule_doc.total_rent_amount = total_amount
-        rental_schedule_doc.paid_amount = paid_amount
-        rental_schedule_doc.outstanding_amount = total_amount - paid_amount
-        
-        # Update overall status
-        if rental_schedule_doc.outstanding_amount <= 0:
-            rental_schedule_doc.schedule_status = "Completed"
-        elif rental_schedule_doc.paid_amount > 0:
-            # Check for overdue payments
-            today = getdate(nowdate())
-            overdue_payments = [s for s in rental_schedule_doc.payment_schedules 
-                              if getdate(s.due_date) < today and flt(s.outstanding) > 0]
-            if overdue_payments:
-                rental_schedule_doc.schedule_status = "Overdue"
-            else:
-                rental_schedule_doc.schedule_status = "Active"
-                
-        rental_schedule_doc.save()
+        if changed:
+            drift[fieldname] = value
+            
+    return drift
+
+def verify_rental_payment_schedule_totals(rental_payment_schedule=None):
+    """
+    Verify incrementally maintained totals against a full recompute and correct any drift
+    Checks one Rental Payment Schedule, or all submitted ones when no name is given
+    Returns the corrections made, keyed by Rental Payment Schedule
+    """
+    corrections = {}
+    
+    for totals in get_recomputed_rental_payment_schedule_totals(rental_payment_schedule):
+        drift = get_rental_payment_schedule_drift(totals)
+        if not drift:
+            continue
+            
+        frappe.db.set_value("Rental Payment Schedule", totals.name, drift, update_modified=False)
+        corrections[totals.name] = drift
         
+    return corrections
+
+def scheduled_rental_payment_schedule_verification():
+    """
+    Scheduled task: correct drifted totals and roll schedules into Overdue as due dates pass
+    """
+    try:
+        corrections = verify_rental_payment_schedule_totals()
+        frappe.db.commit()
+        
+        amount_drift = [
+            name for name, drift in corrections.items()
+            if "paid_amount" in drift or "total_rent_amount" in drift
+        ]
+        if amount_drift:
+            frappe.log_error(
+                f"Corrected drifted totals on {len(amount_drift)} Rental Payment Schedules: {', '.join(amount_drift[:50])}",
+                "Rental Payment Schedule Verification"
+            )
+            
     except Exception as e:
-        frappe.log_error(f"Error updating rental payment schedule totals: {str(e)}")
+        frappe.log_error(f"Error verifying rental payment schedule totals: {str(e)}")
 
 def validate_payment_amount(payment_entry, payment_schedule_row, allocated_amount):
     """
@@ -381,49 +875,54 @@ def get_payment_schedule_status(rental_payment_schedule):
 def manual_link_payment_entry(payment_entry, rental_payment_schedule, payment_schedule_row):
     """
     Manually link a Payment Entry to a specific Payment Schedule row
+    The link status is recorded like a queued link; a failure is returned to the caller
     """
-    try:
-        # Validate inputs
-        if not frappe.db.exists("Payment Entry", payment_entry):
-            frappe.throw(f"Payment Entry {payment_entry} does not exist")
-            
-        if not frappe.db.exists("Rental Payment Schedule", rental_payment_schedule):
-            frappe.throw(f"Rental Payment Schedule {rental_payment_schedule} does not exist")
-            
-        # Get documents
-        payment_doc = frappe.get_doc("Payment Entry", payment_entry)
-        schedule_doc = frappe.get_doc("Rental Payment Schedule", rental_payment_schedule)
-        
-        # Find the payment schedule row
-        target_row = None
-        for row in schedule_doc.payment_schedules:
-            if row.name == payment_schedule_row:
-                target_row = row
-                break
-                
-        if not target_row:
-            frappe.throw(f"Payment Schedule row {payment_schedule_row} not found")
+    # Validate inputs
+    if not frappe.db.exists("Payment Entry", payment_entry):
+        frappe.throw(f"Payment Entry {payment_entry} does not exist")
+        
+    if not frappe.db.exists("Rental Payment Schedule", rental_payment_schedule):
+        frappe.throw(f"Rental Payment Schedule {rental_payment_schedule} does not exist")
+        
+    # Get documents
+    payment_doc = frappe.get_doc("Payment Entry", payment_entry)
+    schedule_doc = frappe.get_doc("Rental Payment Schedule", rental_payment_schedule)
+    
+    # Find the payment schedule row
+    target_row = None
+    for row in schedule_doc.payment_schedules:
+        if row.name == payment_schedule_row:
+            target_row = row
+            break
             
-        # Create schedule info for processing
-        schedule_info = {
-            "rental_payment_schedule": rental_payment_schedule,
-            "payment_schedule_row": payment_schedule_row,
-            "payment_schedule_doc": target_row,
-            "rental_contract": schedule_doc.rental_contract,
-            "tenant": schedule_doc.tenant,
-            "property": schedule_doc.property,
-            "rental_unit": schedule_doc.rental_unit
-        }
+    if not target_row:
+        frappe.throw(f"Payment Schedule row {payment_schedule_row} not found")
         
+    # Create schedule info for processing
+    schedule_info = {
+        "rental_payment_schedule": rental_payment_schedule,
+        "payment_schedule_row": payment_schedule_row,
+        "payment_schedule_doc": target_row,
+        "rental_contract": schedule_doc.rental_contract,
+        "tenant": schedule_doc.tenant,
+        "property": schedule_doc.property,
+        "rental_unit": schedule_doc.rental_unit
+    }
+    
+    try:
         # Process the link
-        process_payment_schedule_link(payment_doc, schedule_info)
-        
+        if not process_payment_schedule_link(payment_doc, schedule_info):
+            frappe.throw(f"Payment Schedule row {payment_schedule_row} has no outstanding amount")
+            
+        payment_doc.db_set({"rental_link_status": "Linked", "rental_link_error": None}, update_modified=False)
         frappe.db.commit()
-        frappe.msgprint(f"Successfully linked Payment Entry {payment_entry} to Payment Schedule")
-        
-        return True
         
     except Exception as e:
+        frappe.db.rollback()
+        payment_doc.db_set({"rental_link_status": "Failed", "rental_link_error": str(e)}, update_modified=False)
+        frappe.db.commit()
         frappe.log_error(f"Error manually linking payment entry: {str(e)}")
         frappe.throw(f"Failed to link payment entry: {str(e)}")
-        return False
+        
+    frappe.msgprint(f"Successfully linked Payment Entry {payment_entry} to Payment Schedule")
+    return True
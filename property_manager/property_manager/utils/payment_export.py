@@ -0,0 +1,318 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import cint, getdate, nowdate, add_months
+import csv
+import hashlib
+import json
+import os
+
+# Payment Entries read per keyset page while exporting
+EXPORT_BATCH_SIZE = 1000
+
+# XLSX exports with more rows than this are built by a background job
+BACKGROUND_EXPORT_ROWS = 5000
+
+# Rows per worksheet, header included; larger exports continue on a new sheet
+XLSX_MAX_ROWS = 1048576
+
+PAYMENT_EXPORT_HEADERS = ["Payment Entry", "Customer", "Amount", "Date", "Reference", "Linked", "Tenant", "Property Unit"]
+
+def parse_export_filters(filters=None):
+    """
+    Accept export filters as a dict or a JSON string from a request argument
+    """
+    if not filters:
+        return {}
+    if isinstance(filters, str):
+        return json.loads(filters)
+    return dict(filters)
+
+def get_payment_export_conditions(from_date=None, to_date=None, tenant=None, rental_payment_schedule=None):
+    """
+    SQL conditions and parameters on Payment Entry for the export filters
+    Defaults to the last three months, like the linking report
+    """
+    to_date = getdate(to_date or nowdate())
+    from_date = getdate(from_date or add_months(to_date, -3))
+
+    conditions = [
+        "pe.docstatus = 1",
+        "pe.party_type = 'Customer'",
+        "pe.posting_date BETWEEN %(from_date)s AND %(to_date)s"
+    ]
+    params = {"from_date": from_date, "to_date": to_date}
+
+    if tenant:
+        from property_manager.property_manager.utils.reporting import find_customer_for_tenant
+        customer = find_customer_for_tenant(tenant)
+        if customer:
+            conditions.append("pe.party = %(party)s")
+            params["party"] = customer
+
+    if rental_payment_schedule:
+        conditions.append("""EXISTS (
+            SELECT 1 FROM `tabPayment Schedule` ps
+            WHERE ps.payment_entry = pe.name
+            AND ps.parent = %(rental_payment_schedule)s
+        )""")
+        params["rental_payment_schedule"] = rental_payment_schedule
+
+    return conditions, params
+
+def get_payment_links(payment_entries):
+    """
+    First linked schedule of each Payment Entry, from one query
+    """
+    links = {}
+    for link in frappe.db.sql("""
+        SELECT
+            ps.payment_entry,
+            rps.tenant,
+            rps.property,
+            rps.rental_unit
+        FROM `tabPayment Schedule` ps
+        INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
+        WHERE ps.payment_entry IN %(payment_entries)s
+        ORDER BY ps.due_date, ps.idx
+    """, {"payment_entries": payment_entries}, as_dict=True):
+        links.setdefault(link.payment_entry, link)
+
+    return links
+
+def iter_payment_export_rows(from_date=None, to_date=None, tenant=None, rental_payment_schedule=None,
+                             batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield one export row per Payment Entry, ordered by posting date
+    Payment Entries are read in keyset pages on (posting_date, name) with their links fetched per page,
+    so memory use does not grow with the number of rows
+    """
+    conditions, params = get_payment_export_conditions(from_date, to_date, tenant, rental_payment_schedule)
+    params["limit"] = cint(batch_size)
+    after = None
+
+    while True:
+        page_conditions = list(conditions)
+        if after:
+            page_conditions.append(
+                "(pe.posting_date > %(after_date)s OR (pe.posting_date = %(after_date)s AND pe.name > %(after_name)s))"
+            )
+            params.update({"after_date": after.posting_date, "after_name": after.name})
+
+        payments = frappe.db.sql(f"""
+            SELECT
+                pe.name,
+                pe.party,
+                pe.paid_amount,
+                pe.posting_date,
+                pe.reference_no
+            FROM `tabPayment Entry` pe
+            WHERE {" AND ".join(page_conditions)}
+            ORDER BY pe.posting_date, pe.name
+            LIMIT %(limit)s
+        """, params, as_dict=True)
+        if not payments:
+            return
+
+        links = get_payment_links([payment.name for payment in payments])
+        for payment in payments:
+            link = links.get(payment.name)
+            yield [
+                payment.name,
+                payment.party,
+                payment.paid_amount,
+                payment.posting_date,
+                payment.reference_no,
+                "Yes" if link else "No",
+                link.tenant if link else None,
+                f"{link.property} - {link.rental_unit}" if link else None
+            ]
+
+        if len(payments) < batch_size:
+            return
+        after = payments[-1]
+
+def count_payment_export_rows(from_date=None, to_date=None, tenant=None, rental_payment_schedule=None):
+    """
+    Number of Payment Entries an export with these filters would contain
+    """
+    conditions, params = get_payment_export_conditions(from_date, to_date, tenant, rental_payment_schedule)
+    return frappe.db.sql(f"""
+        SELECT COUNT(*) FROM `tabPayment Entry` pe
+        WHERE {" AND ".join(conditions)}
+    """, params)[0][0]
+
+def create_export_file(file_name, write_file, attached_to_doctype=None, attached_to_name=None):
+    """
+    Write an export straight to a new private file and register it as a File
+    write_file receives the file path and returns the number of rows written
+    The content hash is computed in chunks so the file is never loaded whole
+    """
+    file_name = f"{os.path.splitext(file_name)[0]}-{frappe.generate_hash(length=8)}{os.path.splitext(file_name)[1]}"
+    file_path = frappe.get_site_path("private", "files", file_name)
+    row_count = write_file(file_path)
+
+    content_hash = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            content_hash.update(chunk)
+
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "is_private": 1,
+        "attached_to_doctype": attached_to_doctype,
+        "attached_to_name": attached_to_name,
+        "file_size": os.path.getsize(file_path),
+        "content_hash": content_hash.hexdigest()
+    })
+    file_doc.insert(ignore_permissions=True)
+
+    return file_doc, row_count
+
+def get_export_attachment(rental_payment_schedule=None):
+    """
+    Document an export file is attached to: the schedule it was filtered on, if any
+    """
+    if rental_payment_schedule:
+        return "Rental Payment Schedule", rental_payment_schedule
+    return None, None
+
+def write_payment_export_csv(file_path, **filters):
+    """
+    Write the payment export as CSV row by row
+    """
+    row_count = 0
+    with open(file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(PAYMENT_EXPORT_HEADERS)
+        for row in iter_payment_export_rows(**filters):
+            writer.writerow(row)
+            row_count += 1
+
+    return row_count
+
+@frappe.whitelist()
+def export_payment_csv(from_date=None, to_date=None, tenant=None, rental_payment_schedule=None):
+    """
+    API endpoint to export Payment Entry linking data as a CSV File
+    Rows are streamed from the database to disk, so large ranges use constant memory
+    """
+    frappe.has_permission("Payment Entry", "export", throw=True)
+
+    filters = {
+        "from_date": from_date,
+        "to_date": to_date,
+        "tenant": tenant,
+        "rental_payment_schedule": rental_payment_schedule
+    }
+    file_doc, row_count = create_export_file(
+        f"payment_report_{nowdate()}.csv",
+        lambda file_path: write_payment_export_csv(file_path, **filters),
+        *get_export_attachment(rental_payment_schedule)
+    )
+
+    return {
+        "format": "csv",
+        "file_url": file_doc.file_url,
+        "filename": file_doc.file_name,
+        "row_count": row_count
+    }
+
+def write_payment_export_xlsx(file_path, **filters):
+    """
+    Write the payment export as XLSX with a write-only workbook, which streams rows to disk
+    instead of keeping them in memory
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = XLSX_MAX_ROWS
+    row_count = 0
+
+    for row in iter_payment_export_rows(**filters):
+        if sheet_rows >= XLSX_MAX_ROWS:
+            sheet = workbook.create_sheet(f"Payments {len(workbook.worksheets) + 1}" if sheet else "Payments")
+            sheet.append(PAYMENT_EXPORT_HEADERS)
+            sheet_rows = 1
+        sheet.append(row)
+        sheet_rows += 1
+        row_count += 1
+
+    if sheet is None:
+        workbook.create_sheet("Payments").append(PAYMENT_EXPORT_HEADERS)
+
+    workbook.save(file_path)
+    return row_count
+
+def create_payment_xlsx_file(filters):
+    """
+    Build the XLSX export File for the given filters
+    """
+    return create_export_file(
+        f"payment_report_{nowdate()}.xlsx",
+        lambda file_path: write_payment_export_xlsx(file_path, **filters),
+        *get_export_attachment(filters.get("rental_payment_schedule"))
+    )
+
+def build_payment_xlsx_export(export_id, filters, user=None):
+    """
+    Background job: build an XLSX export and notify the user who requested it
+    The ready event is published however the job ends, so the waiting dialog always gets an answer
+    """
+    message = {"export_id": export_id, "error": "Export failed"}
+    try:
+        file_doc, row_count = create_payment_xlsx_file(filters)
+        frappe.db.commit()
+        message = {
+            "export_id": export_id,
+            "file_url": file_doc.file_url,
+            "filename": file_doc.file_name,
+            "row_count": row_count
+        }
+
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Error building payment export {export_id}: {str(e)}", "Payment Export")
+        message = {"export_id": export_id, "error": str(e)}
+
+    finally:
+        frappe.publish_realtime("payment_export_ready", message, user=user or frappe.session.user)
+
+@frappe.whitelist()
+def export_payment_xlsx(from_date=None, to_date=None, tenant=None, rental_payment_schedule=None):
+    """
+    API endpoint to export Payment Entry linking data as an XLSX File
+    Large exports are queued; the user is notified through the payment_export_ready realtime event
+    """
+    frappe.has_permission("Payment Entry", "export", throw=True)
+
+    filters = {
+        "from_date": from_date,
+        "to_date": to_date,
+        "tenant": tenant,
+        "rental_payment_schedule": rental_payment_schedule
+    }
+
+    if count_payment_export_rows(**filters) > BACKGROUND_EXPORT_ROWS:
+        export_id = frappe.generate_hash(length=10)
+        frappe.enqueue(
+            "property_manager.property_manager.utils.payment_export.build_payment_xlsx_export",
+            queue="long",
+            timeout=3600,
+            export_id=export_id,
+            filters=filters,
+            user=frappe.session.user
+        )
+        return {"format": "excel", "queued": True, "export_id": export_id}
+
+    file_doc, row_count = create_payment_xlsx_file(filters)
+    return {
+        "format": "excel",
+        "file_url": file_doc.file_url,
+        "filename": file_doc.file_name,
+        "row_count": row_count
+    }
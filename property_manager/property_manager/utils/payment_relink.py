@@ -0,0 +1,263 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import flt, getdate, nowdate, add_days, add_months, now_datetime
+from property_manager.property_manager.utils.payment_entry import (
+    MATCH_WINDOW_DAYS,
+    LINK_QUEUE_LOCK_TIMEOUT,
+    find_tenants_by_customers,
+    get_open_payment_schedule_rows_for_tenants,
+    select_matching_schedules,
+    allocate_payment,
+    apply_payment_allocations
+)
+import time
+
+# Payment Entries are linked and committed in chunks of this size
+SWEEP_CHUNK_SIZE = 500
+
+# The scheduled sweep looks back this many months
+SCHEDULED_SWEEP_MONTHS = 3
+
+def get_unlinked_payment_entries(from_date, to_date, customer=None):
+    """
+    Get submitted customer Payment Entries in a date range that are not linked to any Payment Schedule row
+    Entries waiting in the link queue are left to the queue worker
+    """
+    customer_condition = "AND pe.party = %(customer)s" if customer else ""
+
+    return frappe.db.sql(f"""
+        SELECT
+            pe.name,
+            pe.party,
+            pe.paid_amount,
+            pe.base_paid_amount,
+            pe.posting_date,
+            pe.reference_no,
+            pe.mode_of_payment,
+            pe.remarks
+        FROM `tabPayment Entry` pe
+        LEFT JOIN `tabPayment Schedule` ps ON ps.payment_entry = pe.name
+        WHERE pe.party_type = 'Customer'
+        AND pe.docstatus = 1
+        AND pe.posting_date BETWEEN %(from_date)s AND %(to_date)s
+        AND IFNULL(pe.rental_link_status, '') NOT IN ('Queued', 'Unlink Queued')
+        AND ps.name IS NULL
+        {customer_condition}
+        ORDER BY pe.posting_date, pe.name
+    """, {"from_date": from_date, "to_date": to_date, "customer": customer}, as_dict=True)
+
+def get_window_rows(rows, payment_date, window_days=MATCH_WINDOW_DAYS):
+    """
+    Keep a tenant's rows that are still open and due within the matching window of a payment
+    """
+    return [
+        row for row in rows
+        if flt(row.outstanding) > 0 and not row.payment_entry
+        and abs((getdate(row.due_date) - payment_date).days) <= window_days
+    ]
+
+def relink_payment_entries(from_date, to_date, run=None):
+    """
+    Link all unlinked customer Payment Entries in a date range in one sweep
+    Returns the sweep statistics
+    """
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    stats = {
+        "total_payments": 0,
+        "tenants_resolved": 0,
+        "linked_payments": 0,
+        "linked_amount": 0,
+        "unmatched_payments": 0,
+        "failed_payments": 0
+    }
+
+    payment_entries = get_unlinked_payment_entries(from_date, to_date)
+    stats["total_payments"] = len(payment_entries)
+    if not payment_entries:
+        return stats
+
+    customers = list(dict.fromkeys(payment.party for payment in payment_entries))
+    tenant_by_customer = find_tenants_by_customers(customers)
+    stats["tenants_resolved"] = len(set(tenant_by_customer.values()))
+
+    processed = 0
+    for customer in customers:
+        # The queue worker takes the same lock, so a payment is never allocated by both at once
+        lock_name = f"rental_payment_link::{customer}"
+        acquired = frappe.db.sql("SELECT GET_LOCK(%s, %s)", (lock_name, LINK_QUEUE_LOCK_TIMEOUT))[0][0]
+        if not acquired:
+            # The customer's payments stay unlinked for the next sweep
+            frappe.log_error(f"Timed out waiting for payment link queue of {customer}", "Payment Relink Sweep")
+            continue
+
+        try:
+            # Payments and rows are reloaded under the lock, after any queued work of the customer
+            customer_payments = get_unlinked_payment_entries(from_date, to_date, customer)
+            processed += len(customer_payments)
+
+            tenant = tenant_by_customer.get(customer)
+            if tenant:
+                relink_customer_payments(customer_payments, tenant, from_date, to_date, stats)
+            else:
+                stats["unmatched_payments"] += len(customer_payments)
+                set_link_statuses({payment.name: "Not Matched" for payment in customer_payments})
+
+            frappe.db.commit()
+
+        finally:
+            frappe.db.sql("SELECT RELEASE_LOCK(%s)", (lock_name,))
+
+        if processed // SWEEP_CHUNK_SIZE > (processed - len(customer_payments)) // SWEEP_CHUNK_SIZE:
+            publish_sweep_progress(run, processed, stats)
+
+    return stats
+
+def relink_customer_payments(payment_entries, tenant, from_date, to_date, stats):
+    """
+    Link the unlinked Payment Entries of one customer to the open rows of its tenant
+    Each payment runs in its own savepoint; the caller commits
+    """
+    rows = get_open_payment_schedule_rows_for_tenants(
+        [tenant],
+        add_days(from_date, -MATCH_WINDOW_DAYS),
+        add_days(to_date, MATCH_WINDOW_DAYS)
+    ).get(tenant, [])
+
+    link_statuses = {}
+
+    for payment in payment_entries:
+        candidate_rows = get_window_rows(rows, getdate(payment.posting_date))
+
+        # A failing payment is rolled back on its own, so its partial allocations are never committed
+        savepoint = f"payment_relink_{frappe.generate_hash(length=8)}"
+        frappe.db.savepoint(savepoint)
+        row_values = [(row, dict(row)) for row in candidate_rows]
+
+        try:
+            allocations = allocate_payment(payment, select_matching_schedules(payment, candidate_rows))
+            if allocations:
+                # Rows are updated in memory too, so later payments see the reduced outstanding
+                apply_payment_allocations(payment, allocations)
+                stats["linked_payments"] += 1
+                stats["linked_amount"] += sum(flt(allocation["allocated_amount"]) for allocation in allocations)
+                link_statuses[payment.name] = "Linked"
+            else:
+                stats["unmatched_payments"] += 1
+                link_statuses[payment.name] = "Not Matched"
+
+        except Exception as e:
+            frappe.db.rollback(save_point=savepoint)
+            for row, values in row_values:
+                row.update(values)
+
+            stats["failed_payments"] += 1
+            frappe.db.set_value("Payment Entry", payment.name, {
+                "rental_link_status": "Failed",
+                "rental_link_error": str(e)
+            }, update_modified=False)
+            frappe.log_error(f"Error relinking Payment Entry {payment.name}: {str(e)}", "Payment Relink Sweep")
+
+    set_link_statuses(link_statuses)
+
+def set_link_statuses(link_statuses):
+    """
+    Record the rental link status of swept Payment Entries with one update per status
+    """
+    names_by_status = {}
+    for payment_entry, status in link_statuses.items():
+        names_by_status.setdefault(status, []).append(payment_entry)
+
+    for status, payment_entries in names_by_status.items():
+        frappe.db.sql("""
+            UPDATE `tabPayment Entry`
+            SET rental_link_status = %s, rental_link_error = NULL
+            WHERE name IN %s
+        """, (status, payment_entries))
+
+def publish_sweep_progress(run, processed, stats):
+    """
+    Record sweep progress on the run and notify listeners
+    """
+    if not run:
+        return
+
+    frappe.db.set_value("Payment Relink Run", run, {
+        "processed_payments": processed,
+        "linked_payments": stats["linked_payments"]
+    }, update_modified=False)
+    frappe.db.commit()
+
+    frappe.publish_realtime("payment_relink_progress", {
+        "run": run,
+        "processed": processed,
+        "total": stats["total_payments"]
+    })
+
+def run_payment_relink_sweep(from_date=None, to_date=None):
+    """
+    Run a relinking sweep and record it as a Payment Relink Run
+    """
+    to_date = getdate(to_date or nowdate())
+    from_date = getdate(from_date or add_months(to_date, -SCHEDULED_SWEEP_MONTHS))
+
+    run = frappe.get_doc({
+        "doctype": "Payment Relink Run",
+        "from_date": from_date,
+        "to_date": to_date,
+        "run_status": "Running",
+        "started_on": now_datetime()
+    })
+    run.insert(ignore_permissions=True)
+    frappe.db.commit()
+
+    started = time.monotonic()
+    try:
+        stats = relink_payment_entries(from_date, to_date, run.name)
+        match_rate = (stats["linked_payments"] / stats["total_payments"] * 100) if stats["total_payments"] else 0
+
+        run.db_set({
+            **stats,
+            "processed_payments": stats["total_payments"],
+            "match_rate": match_rate,
+            "run_status": "Completed",
+            "duration_seconds": time.monotonic() - started,
+            "completed_on": now_datetime()
+        })
+
+    except Exception as e:
+        frappe.db.rollback()
+        run.db_set({
+            "run_status": "Failed",
+            "error_message": str(e),
+            "duration_seconds": time.monotonic() - started,
+            "completed_on": now_datetime()
+        })
+        frappe.log_error(f"Payment relink sweep failed: {str(e)}", "Payment Relink Sweep")
+
+    frappe.db.commit()
+    return run.name
+
+def scheduled_payment_relink_sweep():
+    """
+    Scheduled task: relink unlinked Payment Entries of the last few months
+    """
+    run_payment_relink_sweep()
+
+@frappe.whitelist()
+def start_payment_relink_sweep(from_date=None, to_date=None):
+    """
+    Queue a relinking sweep for a date range
+    """
+    frappe.has_permission("Payment Relink Run", "create", throw=True)
+    frappe.has_permission("Payment Entry", "write", throw=True)
+
+    frappe.enqueue(
+        "property_manager.property_manager.utils.payment_relink.run_payment_relink_sweep",
+        queue="long",
+        timeout=3600,
+        from_date=from_date,
+        to_date=to_date
+    )
+    return {"success": True, "message": "Payment relinking sweep queued"}
@@ -0,0 +1,242 @@
+# Copyright (c) 2025, Farah and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import flt, getdate, nowdate, now_datetime
+import time
+
+# Paid rows up to this many days after the due date count as paid in the grace period
+PAYMENT_GRACE_DAYS = 5
+
+# Schedules refreshed per batch (and per commit) during the nightly reconcile
+LEDGER_RECONCILE_BATCH_SIZE = 500
+
+# Ledger rows are written with bulk inserts of this size
+LEDGER_INSERT_BATCH_SIZE = 1000
+
+LEDGER_AMOUNT_FIELDS = [
+    "scheduled_amount",
+    "collected_amount",
+    "outstanding_amount",
+    "overdue_amount",
+    "payments_due",
+    "payments_collected",
+    "payments_overdue",
+    "on_time_count",
+    "grace_period_count",
+    "late_count",
+    "on_time_delay_days",
+    "grace_period_delay_days",
+    "late_delay_days"
+]
+
+def get_payment_timing(delay_days):
+    """
+    On-time category of a payment completed delay_days after its due date
+    """
+    if delay_days <= 0:
+        return "on_time"
+    elif delay_days <= PAYMENT_GRACE_DAYS:
+        return "grace_period"
+    return "late"
+
+def build_rent_ledger_entries(rows, today=None):
+    """
+    Aggregate payment rows into daily ledger entries, one per schedule and date
+    Amounts due are booked on the due date and collections on the payment date
+    Overdue amounts are as of today
+    """
+    today = getdate(today or nowdate())
+    entries = {}
+
+    def get_entry(row, posting_date):
+        key = (row.rental_payment_schedule, posting_date)
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = frappe._dict(
+                posting_date=posting_date,
+                rental_payment_schedule=row.rental_payment_schedule,
+                rental_contract=row.rental_contract,
+                tenant=row.tenant,
+                property=row.property,
+                rental_unit=row.rental_unit,
+                **dict.fromkeys(LEDGER_AMOUNT_FIELDS, 0)
+            )
+        return entry
+
+    for row in rows:
+        due_date = getdate(row.due_date) if row.due_date else None
+        outstanding = flt(row.outstanding)
+
+        if due_date:
+            entry = get_entry(row, due_date)
+            entry.scheduled_amount += flt(row.payment_amount)
+            entry.outstanding_amount += outstanding
+            entry.payments_due += 1
+            if outstanding > 0 and due_date < today:
+                entry.overdue_amount += outstanding
+                entry.payments_overdue += 1
+
+        if flt(row.paid_amount) > 0 and row.payment_date:
+            payment_date = getdate(row.payment_date)
+            entry = get_entry(row, payment_date)
+            entry.collected_amount += flt(row.paid_amount)
+            entry.payments_collected += 1
+
+            # Timing is only meaningful once the row is fully paid
+            if row.payment_status == "Paid" and due_date:
+                delay_days = (payment_date - due_date).days
+                timing = get_payment_timing(delay_days)
+                entry[f"{timing}_count"] += 1
+                entry[f"{timing}_delay_days"] += delay_days
+
+    return list(entries.values())
+
+def get_rent_ledger_source_rows(schedules):
+    """
+    Payment rows of the given submitted schedules with the dimensions of their parent
+    """
+    if not schedules:
+        return []
+
+    return frappe.db.sql("""
+        SELECT
+            rps.name AS rental_payment_schedule,
+            rps.rental_contract,
+            rps.tenant,
+            rps.property,
+            rps.rental_unit,
+            ps.due_date,
+            ps.payment_amount,
+            ps.paid_amount,
+            ps.outstanding,
+            ps.payment_status,
+            ps.payment_date
+        FROM `tabRental Payment Schedule` rps
+        INNER JOIN `tabPayment Schedule` ps ON ps.parent = rps.name
+            AND ps.parenttype = 'Rental Payment Schedule'
+        WHERE rps.name IN %(schedules)s
+        AND rps.docstatus = 1
+    """, {"schedules": list(schedules)}, as_dict=True)
+
+def insert_rent_ledger_entries(entries):
+    """
+    Write ledger entries with bulk inserts; names are deterministic per schedule and date
+    """
+    fields = ["name", "posting_date", "rental_payment_schedule", "rental_contract", "tenant", "property",
+              "rental_unit"] + LEDGER_AMOUNT_FIELDS + ["creation", "modified", "owner", "modified_by"]
+    timestamp = now_datetime()
+    values = [
+        [f"{entry.rental_payment_schedule}-{entry.posting_date}"]
+        + [entry[field] for field in fields[1:-4]]
+        + [timestamp, timestamp, "Administrator", "Administrator"]
+        for entry in entries
+    ]
+
+    for start in range(0, len(values), LEDGER_INSERT_BATCH_SIZE):
+        frappe.db.bulk_insert(
+            "Rent Ledger Entry",
+            fields=fields,
+            values=values[start:start + LEDGER_INSERT_BATCH_SIZE]
+        )
+
+def refresh_rent_ledger(schedules):
+    """
+    Replace the ledger entries of the given schedules with ones built from their current payment rows
+    Cancelled or draft schedules simply lose their entries
+    """
+    schedules = sorted(set(filter(None, schedules)))
+    if not schedules:
+        return 0
+
+    entries = build_rent_ledger_entries(get_rent_ledger_source_rows(schedules))
+    frappe.db.delete("Rent Ledger Entry", {"rental_payment_schedule": ["in", schedules]})
+    insert_rent_ledger_entries(entries)
+
+    return len(entries)
+
+def mark_rent_ledger_dirty(rental_payment_schedule):
+    """
+    Queue a schedule for one ledger refresh when the current transaction commits
+    """
+    if not rental_payment_schedule:
+        return
+
+    if not hasattr(frappe.db, "before_commit"):
+        # Frappe versions without commit callbacks refresh right away
+        refresh_rent_ledger([rental_payment_schedule])
+        return
+
+    dirty_schedules = getattr(frappe.local, "dirty_rent_ledger_schedules", None)
+    if dirty_schedules is None:
+        dirty_schedules = frappe.local.dirty_rent_ledger_schedules = set()
+        frappe.db.before_commit.add(flush_dirty_rent_ledger)
+        frappe.db.after_rollback.add(clear_dirty_rent_ledger)
+
+    dirty_schedules.add(rental_payment_schedule)
+
+def clear_dirty_rent_ledger():
+    """
+    Forget queued ledger refreshes, e.g. after a rollback
+    """
+    frappe.local.dirty_rent_ledger_schedules = None
+
+def flush_dirty_rent_ledger():
+    """
+    Refresh the ledger once for every schedule marked dirty since the last commit
+    """
+    schedules = getattr(frappe.local, "dirty_rent_ledger_schedules", None)
+    clear_dirty_rent_ledger()
+
+    if schedules:
+        refresh_rent_ledger(schedules)
+
+def update_rent_ledger(doc, method=None):
+    """
+    Hook function called when a Rental Payment Schedule is submitted, updated after submit or cancelled
+    """
+    mark_rent_ledger_dirty(doc.name)
+
+def reconcile_rent_ledger():
+    """
+    Scheduled task: rebuild the ledger from the live payment rows in batches of schedules
+    Also rolls overdue amounts forward and drops entries of schedules that are no longer submitted
+    """
+    started = time.monotonic()
+    schedule_count = 0
+    entry_count = 0
+    after = ""
+
+    try:
+        frappe.db.sql("""
+            DELETE FROM `tabRent Ledger Entry`
+            WHERE rental_payment_schedule NOT IN (
+                SELECT name FROM `tabRental Payment Schedule` WHERE docstatus = 1
+            )
+        """)
+
+        while True:
+            schedules = frappe.db.sql_list("""
+                SELECT name FROM `tabRental Payment Schedule`
+                WHERE docstatus = 1
+                AND name > %s
+                ORDER BY name
+                LIMIT %s
+            """, (after, LEDGER_RECONCILE_BATCH_SIZE))
+            if not schedules:
+                break
+
+            entry_count += refresh_rent_ledger(schedules)
+            schedule_count += len(schedules)
+            after = schedules[-1]
+            frappe.db.commit()
+
+        duration = time.monotonic() - started
+        frappe.logger("property_manager").info(
+            f"Reconciled rent ledger for {schedule_count} schedules ({entry_count} entries) in {duration:.2f}s"
+        )
+        return {"schedules": schedule_count, "entries": entry_count, "duration_seconds": duration}
+
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Error reconciling rent ledger: {str(e)}", "Rent Ledger Reconcile")
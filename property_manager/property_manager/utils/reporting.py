@@ -2,95 +2,164 @@
 # For license information, please see license.txt
 
 import frappe
-from frappe.utils import flt, getdate, nowdate, add_days, add_months
+from frappe.utils import cint, flt, getdate, nowdate, add_days, add_months
 from datetime import datetime, timedelta
+from itertools import groupby
 import json
 
+# Default and maximum number of schedules returned per dashboard details page
+DEFAULT_DASHBOARD_PAGE_LENGTH = 20
+MAX_DASHBOARD_PAGE_LENGTH = 200
+
 @frappe.whitelist()
 def get_payment_schedule_dashboard(rental_payment_schedule=None, tenant=None, property_unit=None):
     """
-    Get comprehensive payment schedule dashboard data
+    Get payment schedule dashboard data: the summary and the first page of schedule details
+    Further detail pages are fetched with get_payment_schedule_dashboard_details
     """
-    try:
-        filters = {}
-        if rental_payment_schedule:
-            filters["name"] = rental_payment_schedule
-        if tenant:
-            filters["tenant"] = tenant
-        if property_unit:
-            filters["rental_unit"] = property_unit
-            
-        # Get rental payment schedules
-        schedules = frappe.get_all(
-            "Rental Payment Schedule",
-            filters=filters,
-            fields=["name", "tenant", "property", "rental_unit", "total_rent_amount", 
-                   "paid_amount", "outstanding_amount", "schedule_status", "rental_contract"]
-        )
+    dashboard_data = get_payment_schedule_dashboard_summary(rental_payment_schedule, tenant, property_unit)
+    details = get_payment_schedule_dashboard_details(rental_payment_schedule, tenant, property_unit)
+    if dashboard_data is None or details is None:
+        return None
         
-        dashboard_data = {
-            "summary": {
-                "total_schedules": len(schedules),
-                "total_amount": 0,
-                "paid_amount": 0,
-                "outstanding_amount": 0,
-                "active_schedules": 0,
-                "completed_schedules": 0,
-                "overdue_schedules": 0
-            },
-            "schedules": [],
-            "payment_trends": [],
-            "overdue_analysis": []
+    dashboard_data.update(details)
+    return dashboard_data
+
+@frappe.whitelist()
+def get_payment_schedule_dashboard_summary(rental_payment_schedule=None, tenant=None, property_unit=None):
+    """
+    Dashboard totals, payment trends and overdue analysis, without per-schedule details
+    Trends and overdue analysis are read from the Rent Ledger Entry fact table
+    """
+    frappe.has_permission("Rental Payment Schedule", "read", throw=True)
+    
+    try:
+        return {
+            "summary": get_dashboard_summary_totals(rental_payment_schedule, tenant, property_unit),
+            "payment_trends": generate_payment_trends(rental_payment_schedule, tenant, property_unit),
+            "overdue_analysis": get_ledger_overdue_analysis(
+                *get_dashboard_conditions(rental_payment_schedule, tenant, property_unit, "rental_payment_schedule")
+            )
         }
         
-        for schedule in schedules:
-            # Get detailed schedule information
-            schedule_doc = frappe.get_doc("Rental Payment Schedule", schedule.name)
-            schedule_details = analyze_payment_schedule(schedule_doc)
-            
-            dashboard_data["schedules"].append(schedule_details)
-            
-            # Update summary
-            dashboard_data["summary"]["total_amount"] += flt(schedule.total_rent_amount)
-            dashboard_data["summary"]["paid_amount"] += flt(schedule.paid_amount)
-            dashboard_data["summary"]["outstanding_amount"] += flt(schedule.outstanding_amount)
-            
-            if schedule.schedule_status == "Active":
-                dashboard_data["summary"]["active_schedules"] += 1
-            elif schedule.schedule_status == "Completed":
-                dashboard_data["summary"]["completed_schedules"] += 1
-            elif schedule.schedule_status == "Overdue":
-                dashboard_data["summary"]["overdue_schedules"] += 1
-                
-        # Generate payment trends
-        dashboard_data["payment_trends"] = generate_payment_trends(schedules)
+    except Exception as e:
+        frappe.log_error(f"Error generating payment schedule dashboard: {str(e)}")
+        return None
+
+@frappe.whitelist()
+def get_payment_schedule_dashboard_details(rental_payment_schedule=None, tenant=None, property_unit=None,
+                                           after=None, page_length=DEFAULT_DASHBOARD_PAGE_LENGTH):
+    """
+    One page of per-schedule dashboard details, ordered by schedule name
+    Pass the returned next_cursor as after to fetch the following page
+    """
+    frappe.has_permission("Rental Payment Schedule", "read", throw=True)
+    
+    try:
+        conditions, params = get_dashboard_conditions(rental_payment_schedule, tenant, property_unit)
+        page_length = min(max(cint(page_length) or DEFAULT_DASHBOARD_PAGE_LENGTH, 1), MAX_DASHBOARD_PAGE_LENGTH)
+        today = getdate(nowdate())
         
-        # Generate overdue analysis
-        dashboard_data["overdue_analysis"] = generate_overdue_analysis(schedules)
+        page = get_payment_schedule_rows_page(conditions, params, after, page_length + 1)
+        has_more = len(page) > page_length
+        page = page[:page_length]
         
-        return dashboard_data
+        return {
+            "schedules": [analyze_payment_schedule(schedule, payments, today) for schedule, payments in page],
+            "has_more": has_more,
+            "next_cursor": page[-1][0].name if has_more else None
+        }
         
     except Exception as e:
-        frappe.log_error(f"Error generating payment schedule dashboard: {str(e)}")
+        frappe.log_error(f"Error loading payment schedule dashboard details: {str(e)}")
         return None
 
-def analyze_payment_schedule(schedule_doc):
+def get_dashboard_conditions(rental_payment_schedule=None, tenant=None, property_unit=None, schedule_field="name"):
+    """
+    SQL conditions and parameters for the dashboard filters
+    schedule_field is the column holding the schedule name: name on Rental Payment Schedule,
+    rental_payment_schedule on Rent Ledger Entry
+    """
+    conditions = []
+    params = {}
+    
+    if rental_payment_schedule:
+        conditions.append(f"{schedule_field} = %(rental_payment_schedule)s")
+        params["rental_payment_schedule"] = rental_payment_schedule
+    if tenant:
+        conditions.append("tenant = %(tenant)s")
+        params["tenant"] = tenant
+    if property_unit:
+        conditions.append("rental_unit = %(property_unit)s")
+        params["property_unit"] = property_unit
+        
+    return conditions, params
+
+def get_payment_schedule_rows_page(conditions, params, after=None, limit=DEFAULT_DASHBOARD_PAGE_LENGTH):
+    """
+    Up to limit matching schedules after the cursor, each with its payment rows, from one joined query
+    """
+    page_conditions = list(conditions)
+    if after:
+        page_conditions.append("name > %(after)s")
+        
+    rows = frappe.db.sql(f"""
+        SELECT
+            rps.name,
+            rps.tenant,
+            rps.property,
+            rps.rental_unit,
+            rps.rental_contract,
+            rps.total_rent_amount,
+            rps.paid_amount AS schedule_paid_amount,
+            rps.outstanding_amount,
+            rps.schedule_status,
+            ps.idx,
+            ps.due_date,
+            ps.payment_amount,
+            ps.paid_amount,
+            ps.outstanding,
+            ps.payment_status,
+            ps.payment_entry,
+            ps.payment_date
+        FROM (
+            SELECT name, tenant, property, rental_unit, rental_contract, total_rent_amount,
+                paid_amount, outstanding_amount, schedule_status
+            FROM `tabRental Payment Schedule`
+            {"WHERE " + " AND ".join(page_conditions) if page_conditions else ""}
+            ORDER BY name
+            LIMIT %(limit)s
+        ) rps
+        LEFT JOIN `tabPayment Schedule` ps ON ps.parent = rps.name
+            AND ps.parenttype = 'Rental Payment Schedule'
+        ORDER BY rps.name, ps.idx
+    """, dict(params, after=after, limit=cint(limit)), as_dict=True)
+    
+    page = []
+    for name, schedule_rows in groupby(rows, key=lambda row: row.name):
+        schedule_rows = list(schedule_rows)
+        page.append((schedule_rows[0], [row for row in schedule_rows if row.idx is not None]))
+        
+    return page
+
+def analyze_payment_schedule(schedule, payments, today=None):
     """
     Analyze individual payment schedule for detailed insights
     """
+    today = today or getdate(nowdate())
     analysis = {
         "schedule_info": {
-            "name": schedule_doc.name,
-            "tenant": schedule_doc.tenant,
-            "property": schedule_doc.property,
-            "rental_unit": schedule_doc.rental_unit,
-            "rental_contract": schedule_doc.rental_contract,
-            "status": schedule_doc.schedule_status
+            "name": schedule.name,
+            "tenant": schedule.tenant,
+            "property": schedule.property,
+            "rental_unit": schedule.rental_unit,
+            "rental_contract": schedule.rental_contract,
+            "status": schedule.schedule_status
         },
         "financial_summary": {
-            "total_amount": schedule_doc.total_rent_amount,
-            "paid_amount": schedule_doc.paid_amount,
-            "outstanding_amount": schedule_doc.outstanding_amount,
+            "total_amount": schedule.total_rent_amount,
+            "paid_amount": schedule.schedule_paid_amount,
+            "outstanding_amount": schedule.outstanding_amount,
             "payment_completion_rate": 0
         },
         "payment_details": [],
@@ -99,30 +168,18 @@ def analyze_payment_schedule(schedule_doc):
         "payment_history": []
     }
     
-    if schedule_doc.total_rent_amount > 0:
+    if flt(schedule.total_rent_amount) > 0:
         analysis["financial_summary"]["payment_completion_rate"] = (
-            flt(schedule_doc.paid_amount) / flt(schedule_doc.total_rent_amount) * 100
+            flt(schedule.schedule_paid_amount) / flt(schedule.total_rent_amount) * 100
         )
     
-    today = getdate(nowdate())
-    
-    for payment_schedule in schedule_doc.payment_schedules:
-        payment_detail = {
-            "due_date": payment_schedule.due_date,
-            "payment_amount": payment_schedule.payment_amount,
-            "paid_amount": payment_schedule.paid_amount,
-            "outstanding": payment_schedule.outstanding,
-            "payment_status": payment_schedule.payment_status,
-            "payment_entry": payment_schedule.payment_entry,
-            "payment_date": payment_schedule.payment_date,
-            "days_overdue": 0 if not payment_schedule.due_date else max(0, (today - getdate(payment_schedule.due_date)).days)
-        }
-        
+    for payment in payments:
+        payment_detail = get_payment_detail(payment, today)
         analysis["payment_details"].append(payment_detail)
         
         # Categorize payments
-        if flt(payment_schedule.outstanding) > 0:
-            if getdate(payment_schedule.due_date) < today:
+        if flt(payment.outstanding) > 0:
+            if payment.due_date and getdate(payment.due_date) < today:
                 analysis["overdue_payments"].append(payment_detail)
             else:
                 analysis["upcoming_payments"].append(payment_detail)
@@ -131,9 +188,55 @@ def analyze_payment_schedule(schedule_doc):
     
     return analysis
 
-def generate_payment_trends(schedules):
+def get_payment_detail(payment, today):
     """
-    Generate payment trend analysis
+    Dashboard view of one payment row
+    """
+    return {
+        "due_date": payment.due_date,
+        "payment_amount": payment.payment_amount,
+        "paid_amount": payment.paid_amount,
+        "outstanding": payment.outstanding,
+        "payment_status": payment.payment_status,
+        "payment_entry": payment.payment_entry,
+        "payment_date": payment.payment_date,
+        "days_overdue": 0 if not payment.due_date else max(0, (today - getdate(payment.due_date)).days)
+    }
+
+def get_dashboard_summary_totals(rental_payment_schedule=None, tenant=None, property_unit=None):
+    """
+    Schedule totals and status counts from one aggregate over the schedule headers
+    Only submitted schedules are counted, like the ledger the trends and overdue sections read
+    """
+    conditions, params = get_dashboard_conditions(rental_payment_schedule, tenant, property_unit)
+    conditions.insert(0, "docstatus = 1")
+    
+    totals = frappe.db.sql(f"""
+        SELECT
+            COUNT(*) AS total_schedules,
+            IFNULL(SUM(total_rent_amount), 0) AS total_amount,
+            IFNULL(SUM(paid_amount), 0) AS paid_amount,
+            IFNULL(SUM(outstanding_amount), 0) AS outstanding_amount,
+            IFNULL(SUM(schedule_status = 'Active'), 0) AS active_schedules,
+            IFNULL(SUM(schedule_status = 'Completed'), 0) AS completed_schedules,
+            IFNULL(SUM(schedule_status = 'Overdue'), 0) AS overdue_schedules
+        FROM `tabRental Payment Schedule`
+        WHERE {" AND ".join(conditions)}
+    """, params, as_dict=True)[0]
+    
+    return {
+        "total_schedules": int(totals.total_schedules),
+        "total_amount": flt(totals.total_amount),
+        "paid_amount": flt(totals.paid_amount),
+        "outstanding_amount": flt(totals.outstanding_amount),
+        "active_schedules": int(totals.active_schedules),
+        "completed_schedules": int(totals.completed_schedules),
+        "overdue_schedules": int(totals.overdue_schedules)
+    }
+
+def generate_payment_trends(rental_payment_schedule=None, tenant=None, property_unit=None):
+    """
+    Generate payment trend analysis from the rent ledger
     """
     trends = {
         "monthly_collections": [],
@@ -142,146 +245,193 @@ def generate_payment_trends(schedules):
     }
     
     try:
+        conditions, params = get_dashboard_conditions(
+            rental_payment_schedule, tenant, property_unit, "rental_payment_schedule"
+        )
+        filters = "".join(f" AND {condition}" for condition in conditions)
+        
         # Get monthly collection data for the last 12 months
         end_date = getdate(nowdate())
-        start_date = add_months(end_date, -12)
+        params.update({"start_date": add_months(end_date, -12), "end_date": end_date})
         
-        monthly_data = frappe.db.sql("""
+        trends["monthly_collections"] = frappe.db.sql(f"""
             SELECT 
-                DATE_FORMAT(ps.payment_date, '%%Y-%%m') as month,
-                SUM(ps.paid_amount) as total_collected,
-                COUNT(ps.name) as payment_count
-            FROM `tabPayment Schedule` ps
-            INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
-            WHERE ps.payment_date >= %s
-            AND ps.payment_date <= %s
-            AND ps.payment_status = 'Paid'
-            GROUP BY DATE_FORMAT(ps.payment_date, '%%Y-%%m')
+                DATE_FORMAT(posting_date, '%%Y-%%m') as month,
+                SUM(collected_amount) as total_collected,
+                SUM(payments_collected) as payment_count
+            FROM `tabRent Ledger Entry`
+            WHERE posting_date >= %(start_date)s
+            AND posting_date <= %(end_date)s
+            AND payments_collected > 0
+            {filters}
+            GROUP BY DATE_FORMAT(posting_date, '%%Y-%%m')
             ORDER BY month
-        """, (start_date, end_date), as_dict=True)
-        
-        trends["monthly_collections"] = monthly_data
+        """, params, as_dict=True)
         
         # Analyze payment patterns (on-time vs late payments)
-        payment_patterns = frappe.db.sql("""
+        patterns = frappe.db.sql(f"""
             SELECT 
-                CASE 
-                    WHEN ps.payment_date <= ps.due_date THEN 'On Time'
-                    WHEN ps.payment_date <= DATE_ADD(ps.due_date, INTERVAL 5 DAY) THEN 'Grace Period'
-                    ELSE 'Late'
-                END as payment_timing,
-                COUNT(*) as count,
-                AVG(DATEDIFF(ps.payment_date, ps.due_date)) as avg_delay_days
-            FROM `tabPayment Schedule` ps
-            WHERE ps.payment_status = 'Paid'
-            AND ps.payment_date IS NOT NULL
-            GROUP BY payment_timing
-        """, as_dict=True)
-        
-        for pattern in payment_patterns:
-            trends["payment_patterns"][pattern.payment_timing] = {
-                "count": pattern.count,
-                "avg_delay_days": flt(pattern.avg_delay_days)
-            }
-            
+                IFNULL(SUM(on_time_count), 0) AS on_time_count,
+                IFNULL(SUM(on_time_delay_days), 0) AS on_time_delay_days,
+                IFNULL(SUM(grace_period_count), 0) AS grace_period_count,
+                IFNULL(SUM(grace_period_delay_days), 0) AS grace_period_delay_days,
+                IFNULL(SUM(late_count), 0) AS late_count,
+                IFNULL(SUM(late_delay_days), 0) AS late_delay_days
+            FROM `tabRent Ledger Entry`
+            WHERE payments_collected > 0
+            {filters}
+        """, params, as_dict=True)[0]
+        
+        for payment_timing, field in (("On Time", "on_time"), ("Grace Period", "grace_period"), ("Late", "late")):
+            count = int(patterns[f"{field}_count"])
+            if count:
+                trends["payment_patterns"][payment_timing] = {
+                    "count": count,
+                    "avg_delay_days": flt(patterns[f"{field}_delay_days"]) / count
+                }
+                
     except Exception as e:
         frappe.log_error(f"Error generating payment trends: {str(e)}")
         
     return trends
 
-def generate_overdue_analysis(schedules):
+# Most overdue tenants, units and properties returned by the overdue analysis
+OVERDUE_ANALYSIS_LIMIT = 100
+
+# Aging buckets by upper bound of days overdue; the last bucket takes everything older
+AGING_BUCKETS = [
+    ("1-30_days", 30),
+    ("31-60_days", 60),
+    ("61-90_days", 90),
+    ("90+_days", None)
+]
+
+def get_aging_bucket_sql(date_column="posting_date"):
     """
-    Generate overdue payment analysis
+    CASE expression assigning a row to its aging bucket by days overdue as of %(today)s
     """
-    analysis = {
+    whens = " ".join(
+        f"WHEN DATEDIFF(%(today)s, {date_column}) <= {upper_bound} THEN '{bucket}'"
+        for bucket, upper_bound in AGING_BUCKETS if upper_bound
+    )
+    return f"CASE {whens} ELSE '{AGING_BUCKETS[-1][0]}' END"
+
+def get_empty_overdue_analysis():
+    """
+    Overdue analysis with no overdue payments
+    """
+    return {
         "total_overdue_amount": 0,
         "overdue_count": 0,
-        "aging_buckets": {
-            "1-30_days": {"count": 0, "amount": 0},
-            "31-60_days": {"count": 0, "amount": 0},
-            "61-90_days": {"count": 0, "amount": 0},
-            "90+_days": {"count": 0, "amount": 0}
-        },
+        "aging_buckets": {bucket: {"count": 0, "amount": 0} for bucket, upper_bound in AGING_BUCKETS},
         "tenant_wise_overdue": [],
-        "property_wise_overdue": []
+        "property_wise_overdue": [],
+        "property_totals_overdue": []
     }
+
+def get_ledger_overdue_analysis(conditions, params, limit=OVERDUE_ANALYSIS_LIMIT):
+    """
+    Overdue analysis from the rent ledger entries matching the conditions
+    Bucketing, rollups, sorting and limits all run in the database, so only aggregated rows come back
+    """
+    analysis = get_empty_overdue_analysis()
+    filters = "".join(f" AND {condition}" for condition in conditions)
+    params = dict(params, today=getdate(nowdate()), limit=cint(limit))
     
-    try:
-        today = getdate(nowdate())
-        
-        # Get all overdue payments
-        overdue_payments = frappe.db.sql("""
-            SELECT 
-                ps.due_date,
-                ps.outstanding,
-                ps.payment_amount,
-                rps.tenant,
-                rps.property,
-                rps.rental_unit,
-                DATEDIFF(%s, ps.due_date) as days_overdue
-            FROM `tabPayment Schedule` ps
-            INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
-            WHERE ps.outstanding > 0
-            AND ps.due_date < %s
-            ORDER BY ps.due_date
-        """, (today, today), as_dict=True)
-        
-        tenant_overdue = {}
-        property_overdue = {}
-        
-        for payment in overdue_payments:
-            outstanding = flt(payment.outstanding)
-            days_overdue = payment.days_overdue
-            
-            analysis["total_overdue_amount"] += outstanding
-            analysis["overdue_count"] += 1
+    # Aging buckets, with the grand total as the rollup row
+    buckets = frappe.db.sql(f"""
+        SELECT
+            {get_aging_bucket_sql()} AS aging_bucket,
+            SUM(payments_overdue) AS count,
+            SUM(overdue_amount) AS amount
+        FROM `tabRent Ledger Entry`
+        WHERE payments_overdue > 0
+        {filters}
+        GROUP BY aging_bucket WITH ROLLUP
+    """, params, as_dict=True)
+    
+    for bucket in buckets:
+        if bucket.aging_bucket is None:
+            analysis["total_overdue_amount"] = flt(bucket.amount)
+            analysis["overdue_count"] = int(bucket.count or 0)
+        else:
+            analysis["aging_buckets"][bucket.aging_bucket] = {"count": int(bucket.count), "amount": flt(bucket.amount)}
             
-            # Aging bucket analysis
-            if days_overdue <= 30:
-                analysis["aging_buckets"]["1-30_days"]["count"] += 1
-                analysis["aging_buckets"]["1-30_days"]["amount"] += outstanding
-            elif days_overdue <= 60:
-                analysis["aging_buckets"]["31-60_days"]["count"] += 1
-                analysis["aging_buckets"]["31-60_days"]["amount"] += outstanding
-            elif days_overdue <= 90:
-                analysis["aging_buckets"]["61-90_days"]["count"] += 1
-                analysis["aging_buckets"]["61-90_days"]["amount"] += outstanding
-            else:
-                analysis["aging_buckets"]["90+_days"]["count"] += 1
-                analysis["aging_buckets"]["90+_days"]["amount"] += outstanding
-                
-            # Tenant-wise analysis
-            tenant = payment.tenant
-            if tenant not in tenant_overdue:
-                tenant_overdue[tenant] = {"count": 0, "amount": 0}
-            tenant_overdue[tenant]["count"] += 1
-            tenant_overdue[tenant]["amount"] += outstanding
+    if not analysis["overdue_count"]:
+        return analysis
+        
+    # Tenant-wise analysis
+    analysis["tenant_wise_overdue"] = [
+        {"tenant": row.tenant, "count": int(row.count), "amount": flt(row.amount)}
+        for row in frappe.db.sql(f"""
+            SELECT
+                tenant,
+                SUM(payments_overdue) AS count,
+                SUM(overdue_amount) AS amount
+            FROM `tabRent Ledger Entry`
+            WHERE payments_overdue > 0
+            {filters}
+            GROUP BY tenant
+            ORDER BY amount DESC
+            LIMIT %(limit)s
+        """, params, as_dict=True)
+    ]
+    
+    # Property-wise analysis: units rolled up into property subtotals, top rows of each level
+    property_rows = frappe.db.sql(f"""
+        SELECT property, rental_unit, count, amount
+        FROM (
+            SELECT
+                totals.*,
+                ROW_NUMBER() OVER (PARTITION BY totals.rental_unit IS NULL ORDER BY totals.amount DESC) AS position
+            FROM (
+                SELECT
+                    IFNULL(property, '') AS property,
+                    IFNULL(rental_unit, '') AS rental_unit,
+                    SUM(payments_overdue) AS count,
+                    SUM(overdue_amount) AS amount
+                FROM `tabRent Ledger Entry`
+                WHERE payments_overdue > 0
+                {filters}
+                GROUP BY IFNULL(property, ''), IFNULL(rental_unit, '') WITH ROLLUP
+            ) totals
+            WHERE totals.property IS NOT NULL
+        ) ranked
+        WHERE position <= %(limit)s
+        ORDER BY amount DESC
+    """, params, as_dict=True)
+    
+    for row in property_rows:
+        if row.rental_unit is None:
+            analysis["property_totals_overdue"].append(
+                {"property": row.property, "count": int(row.count), "amount": flt(row.amount)}
+            )
+        else:
+            analysis["property_wise_overdue"].append(
+                {"property_unit": f"{row.property} - {row.rental_unit}", "count": int(row.count), "amount": flt(row.amount)}
+            )
             
-            # Property-wise analysis
-            property_key = f"{payment.property} - {payment.rental_unit}"
-            if property_key not in property_overdue:
-                property_overdue[property_key] = {"count": 0, "amount": 0}
-            property_overdue[property_key]["count"] += 1
-            property_overdue[property_key]["amount"] += outstanding
+    return analysis
+
+@frappe.whitelist()
+def generate_overdue_analysis(schedules):
+    """
+    Generate overdue payment analysis for the given schedules (names or schedule rows)
+    """
+    frappe.has_permission("Rental Payment Schedule", "read", throw=True)
+    
+    try:
+        if isinstance(schedules, str):
+            schedules = json.loads(schedules)
+        names = [schedule if isinstance(schedule, str) else schedule.get("name") for schedule in schedules or []]
+        if not names:
+            return get_empty_overdue_analysis()
             
-        # Convert to lists for easier consumption
-        analysis["tenant_wise_overdue"] = [
-            {"tenant": k, "count": v["count"], "amount": v["amount"]}
-            for k, v in tenant_overdue.items()
-        ]
-        analysis["property_wise_overdue"] = [
-            {"property_unit": k, "count": v["count"], "amount": v["amount"]}
-            for k, v in property_overdue.items()
-        ]
-        
-        # Sort by amount descending
-        analysis["tenant_wise_overdue"].sort(key=lambda x: x["amount"], reverse=True)
-        analysis["property_wise_overdue"].sort(key=lambda x: x["amount"], reverse=True)
+        return get_ledger_overdue_analysis(["rental_payment_schedule IN %(names)s"], {"names": names})
         
     except Exception as e:
         frappe.log_error(f"Error generating overdue analysis: {str(e)}")
-        
-    return analysis
+        return get_empty_overdue_analysis()
 
 @frappe.whitelist()
 def get_payment_entry_linking_report(from_date=None, to_date=None, tenant=None, property_unit=None):
@@ -370,31 +520,13 @@ def get_payment_entry_linking_report(from_date=None, to_date=None, tenant=None,
 def find_customer_for_tenant(tenant):
     """
     Find customer associated with a tenant
+    Uses the same rules as find_tenants_by_customers in reverse
     """
-    try:
-        # Try direct customer field
-        customer = frappe.db.get_value("Tenant", tenant, "customer")
-        if customer:
-            return customer
-            
-        # Try pattern matching
-        customer_pattern = f"TENANT-{tenant}"
-        customer = frappe.db.get_value("Customer", {"name": ["like", f"%{customer_pattern}%"]}, "name")
-        if customer:
-            return customer
-            
-        # Try email matching
-        tenant_doc = frappe.get_doc("Tenant", tenant)
-        if tenant_doc.email:
-            customer = frappe.db.get_value("Customer", {"email_id": tenant_doc.email}, "name")
-            if customer:
-                return customer
-                
+    if not tenant:
         return None
         
-    except Exception as e:
-        frappe.log_error(f"Error finding customer for tenant: {str(e)}")
-        return None
+    from property_manager.property_manager.utils.payment_entry import find_customers_for_tenants
+    return find_customers_for_tenants([tenant]).get(tenant)
 
 @frappe.whitelist()
 def get_rental_payment_summary(tenant=None, property_unit=None, from_date=None, to_date=None):
@@ -515,9 +647,22 @@ def export_payment_data(format_type="excel", filters=None):
     """
     Export payment data in various formats
     """
+    from property_manager.property_manager.utils.payment_export import parse_export_filters, export_payment_csv, export_payment_xlsx
+    
     try:
-        if not filters:
-            filters = {}
+        filters = parse_export_filters(filters)
+        export_filters = (
+            filters.get("from_date"),
+            filters.get("to_date"),
+            filters.get("tenant"),
+            filters.get("rental_payment_schedule")
+        )
+        
+        # CSV and Excel are streamed from the database to a File without building the report in memory
+        if format_type == "csv":
+            return export_payment_csv(*export_filters)
+        elif format_type == "excel":
+            return export_payment_xlsx(*export_filters)
             
         # Get payment data
         payment_data = get_payment_entry_linking_report(
@@ -527,11 +672,7 @@ def export_payment_data(format_type="excel", filters=None):
             filters.get("property_unit")
         )
         
-        if format_type == "excel":
-            return export_to_excel(payment_data)
-        elif format_type == "csv":
-            return export_to_csv(payment_data)
-        elif format_type == "pdf":
+        if format_type == "pdf":
             return export_to_pdf(payment_data)
         else:
             return {"error": "Unsupported format type"}
@@ -540,168 +681,138 @@ def export_payment_data(format_type="excel", filters=None):
         frappe.log_error(f"Error exporting payment data: {str(e)}")
         return {"error": str(e)}
 
-def export_to_excel(payment_data):
+def export_to_pdf(payment_data):
     """
-    Export payment data to Excel format
+    Export payment data to PDF format
     """
-    # Implementation would use frappe.utils.xlsxwriter or similar
-    # For now, return data structure that can be processed by frontend
+    # Implementation would use frappe.utils.pdf or similar
+    # For now, return data structure
     return {
-        "format": "excel",
+        "format": "pdf",
         "data": payment_data,
-        "filename": f"payment_report_{nowdate()}.xlsx"
+        "filename": f"payment_report_{nowdate()}.pdf"
     }
 
-def export_to_csv(payment_data):
+# Cached property performance expires after this long even without an invalidating event
+PROPERTY_PERFORMANCE_CACHE_TTL = 3600
+
+def get_property_performance_cache_key(property):
     """
-    Export payment data to CSV format
+    Cache key of the performance data of one property
     """
-    import csv
-    import io
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write headers
-    headers = ["Payment Entry", "Customer", "Amount", "Date", "Reference", "Linked", "Tenant", "Property Unit"]
-    writer.writerow(headers)
-    
-    # Write data
-    for payment in payment_data.get("payment_details", []):
-        writer.writerow([
-            payment.get("payment_entry"),
-            payment.get("customer"),
-            payment.get("amount"),
-            payment.get("date"),
-            payment.get("reference"),
-            "Yes" if payment.get("is_linked") else "No",
-            payment.get("tenant"),
-            payment.get("property_unit")
-        ])
+    return f"property_manager:property_performance:{property}"
+
+def invalidate_property_performance(doc, method=None):
+    """
+    Hook function called when Rental Units or Rental Contracts change
+    Drops the cached performance data of the affected property once the change commits
+    """
+    properties = {doc.get("property")}
+    previous = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    if previous:
+        properties.add(previous.get("property"))
+    properties.discard(None)
+    properties.discard("")
     
-    return {
-        "format": "csv",
-        "content": output.getvalue(),
-        "filename": f"payment_report_{nowdate()}.csv"
-    }
+    if not hasattr(frappe.db, "after_commit"):
+        # Frappe versions without commit callbacks invalidate right away
+        delete_property_performance(properties)
+        return
+        
+    # Deleting before commit would let a concurrent dashboard view re-cache the old metrics
+    stale_properties = getattr(frappe.local, "stale_property_performance", None)
+    if stale_properties is None:
+        stale_properties = frappe.local.stale_property_performance = set()
+        frappe.db.after_commit.add(flush_stale_property_performance)
+        frappe.db.after_rollback.add(clear_stale_property_performance)
+        
+    stale_properties.update(properties)
 
-def export_to_pdf(payment_data):
+def clear_stale_property_performance():
     """
-    Export payment data to PDF format
+    Forget queued invalidations, e.g. after a rollback
     """
-    # Implementation would use frappe.utils.pdf or similar
-    # For now, return data structure
-    return {
-        "format": "pdf",
-        "data": payment_data,
-        "filename": f"payment_report_{nowdate()}.pdf"
-    }
+    frappe.local.stale_property_performance = None
 
-@frappe.whitelist()
-def get_property_performance(property):
+def flush_stale_property_performance():
     """
-    Get property performance data for dashboard
+    Drop the cached performance data of every property changed in the committed transaction
     """
-    try:
-        if not property:
-            return {}
-            
-        # Get property document
-        property_doc = frappe.get_doc("Property", property)
-        
-        # Get rental units for this property
-        units = frappe.get_all(
-            "Rental Unit",
-            filters={"property": property},
-            fields=["name", "unit_status", "monthly_rent", "current_tenant"]
-        )
-        
-        # Calculate unit statistics
-        total_units = len(units)
-        occupied_units = len([u for u in units if u.unit_status == "Occupied"])
-        available_units = len([u for u in units if u.unit_status == "Available"])
-        maintenance_units = len([u for u in units if u.unit_status in ["Maintenance", "Renovation"]])
-        
-        # Calculate occupancy rate
-        occupancy_rate = (occupied_units / total_units * 100) if total_units > 0 else 0
-        
-        # Calculate rental income
-        total_potential_rent = sum([flt(u.monthly_rent) for u in units if u.monthly_rent])
-        current_rent = sum([flt(u.monthly_rent) for u in units if u.unit_status == "Occupied" and u.monthly_rent])
-        
-        # Get active contracts count
-        active_contracts = frappe.db.count("Rental Contract", {
-            "property": property,
-            "contract_status": "Active"
-        })
-        
-        return {
-            "total_units": total_units,
-            "occupied_units": occupied_units,
-            "available_units": available_units,
-            "maintenance_units": maintenance_units,
-            "occupancy_rate": occupancy_rate,
-            "total_potential_rent": total_potential_rent,
-            "current_rent": current_rent,
-            "active_contracts": active_contracts,
-            "rental_efficiency": (current_rent / total_potential_rent * 100) if total_potential_rent > 0 else 0
-        }
-        
-    except Exception as e:
-        frappe.log_error(f"Error getting property performance for {property}: {str(e)}")
-        return {}
+    properties = getattr(frappe.local, "stale_property_performance", None)
+    clear_stale_property_performance()
+    
+    if properties:
+        delete_property_performance(properties)
+
+def delete_property_performance(properties):
+    """
+    Delete the cached performance data of the given properties
+    """
+    for property in properties:
+        frappe.cache().delete_value(get_property_performance_cache_key(property))
 
 @frappe.whitelist()
 def get_property_performance(property):
     """
     Get property performance data for dashboard
+    Served from cache; cold builds use one aggregate query
     """
     try:
         if not property:
             return {}
             
-        # Get property document
-        property_doc = frappe.get_doc("Property", property)
-        
-        # Get rental units for this property
-        units = frappe.get_all(
-            "Rental Unit",
-            filters={"property": property},
-            fields=["name", "unit_status", "monthly_rent", "current_tenant"]
-        )
-        
-        # Calculate unit statistics
-        total_units = len(units)
-        occupied_units = len([u for u in units if u.unit_status == "Occupied"])
-        available_units = len([u for u in units if u.unit_status == "Available"])
-        maintenance_units = len([u for u in units if u.unit_status in ["Maintenance", "Renovation"]])
-        
-        # Calculate occupancy rate
-        occupancy_rate = (occupied_units / total_units * 100) if total_units > 0 else 0
+        frappe.has_permission("Property", "read", doc=property, throw=True)
         
-        # Calculate rental income
-        total_potential_rent = sum([flt(u.monthly_rent) for u in units if u.monthly_rent])
-        current_rent = sum([flt(u.monthly_rent) for u in units if u.unit_status == "Occupied" and u.monthly_rent])
-        
-        # Get active contracts count
-        active_contracts = frappe.db.count("Rental Contract", {
-            "property": property,
-            "contract_status": "Active"
-        })
-        
-        return {
-            "total_units": total_units,
-            "occupied_units": occupied_units,
-            "available_units": available_units,
-            "maintenance_units": maintenance_units,
-            "occupancy_rate": occupancy_rate,
-            "total_potential_rent": total_potential_rent,
-            "current_rent": current_rent,
-            "active_contracts": active_contracts,
-            "rental_efficiency": (current_rent / total_potential_rent * 100) if total_potential_rent > 0 else 0
-        }
+        cache_key = get_property_performance_cache_key(property)
+        performance = frappe.cache().get_value(cache_key)
+        if performance is None:
+            performance = build_property_performance(property)
+            frappe.cache().set_value(cache_key, performance, expires_in_sec=PROPERTY_PERFORMANCE_CACHE_TTL)
+            
+        return performance
         
+    except frappe.PermissionError:
+        raise
     except Exception as e:
         frappe.log_error(f"Error getting property performance for {property}: {str(e)}")
         return {}
 
+def build_property_performance(property):
+    """
+    Aggregate unit statistics, rental income and active contracts of a property in one query
+    """
+    stats = frappe.db.sql("""
+        SELECT
+            COUNT(ru.name) AS total_units,
+            IFNULL(SUM(ru.unit_status = 'Occupied'), 0) AS occupied_units,
+            IFNULL(SUM(ru.unit_status = 'Available'), 0) AS available_units,
+            IFNULL(SUM(ru.unit_status IN ('Maintenance', 'Renovation')), 0) AS maintenance_units,
+            IFNULL(SUM(ru.monthly_rent), 0) AS total_potential_rent,
+            IFNULL(SUM(CASE WHEN ru.unit_status = 'Occupied' THEN ru.monthly_rent ELSE 0 END), 0) AS current_rent,
+            (
+                SELECT COUNT(*) FROM `tabRental Contract` rc
+                WHERE rc.property = %(property)s
+                AND rc.contract_status = 'Active'
+            ) AS active_contracts
+        FROM `tabRental Unit` ru
+        WHERE ru.property = %(property)s
+    """, {"property": property}, as_dict=True)[0]
+    
+    total_units = int(stats.total_units or 0)
+    occupied_units = int(stats.occupied_units)
+    total_potential_rent = flt(stats.total_potential_rent)
+    current_rent = flt(stats.current_rent)
+    
+    return {
+        "total_units": total_units,
+        "occupied_units": occupied_units,
+        "available_units": int(stats.available_units),
+        "maintenance_units": int(stats.maintenance_units),
+        "occupancy_rate": (occupied_units / total_units * 100) if total_units > 0 else 0,
+        "total_potential_rent": total_potential_rent,
+        "current_rent": current_rent,
+        "monthly_revenue": current_rent,
+        "annual_revenue": current_rent * 12,
+        "active_contracts": int(stats.active_contracts or 0),
+        "rental_efficiency": (current_rent / total_potential_rent * 100) if total_potential_rent > 0 else 0
+    }
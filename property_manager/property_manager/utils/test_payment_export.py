@@ -0,0 +1,71 @@
+# Copyright (c) 2025, Farah and Contributors
+# See license.txt
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import nowdate
+
+from property_manager.property_manager.utils import payment_export
+
+
+class TestPaymentExport(FrappeTestCase):
+	def test_xlsx_export_rolls_over_to_new_sheets(self):
+		from openpyxl import load_workbook
+
+		rows = [[f"PE-{idx}", "CUST", 100, nowdate(), None, "No", None, None] for idx in range(5)]
+		handle, path = tempfile.mkstemp(suffix=".xlsx")
+		os.close(handle)
+		self.addCleanup(os.remove, path)
+
+		# Three rows per sheet: the header and two payments
+		with patch.object(payment_export, "XLSX_MAX_ROWS", 3), \
+				patch.object(payment_export, "iter_payment_export_rows", return_value=iter(rows)):
+			row_count = payment_export.write_payment_export_xlsx(path)
+
+		workbook = load_workbook(path, read_only=True)
+		self.assertEqual(row_count, 5)
+		self.assertEqual(workbook.sheetnames, ["Payments", "Payments 2", "Payments 3"])
+		sheet_rows = [list(sheet.iter_rows(values_only=True)) for sheet in workbook.worksheets]
+		self.assertEqual([len(rows) for rows in sheet_rows], [3, 3, 2])
+		self.assertTrue(all(rows[0] == tuple(payment_export.PAYMENT_EXPORT_HEADERS) for rows in sheet_rows))
+		self.assertEqual([row[0] for rows in sheet_rows for row in rows[1:]], [f"PE-{idx}" for idx in range(5)])
+
+	def test_large_xlsx_export_is_queued(self):
+		with patch.object(payment_export, "count_payment_export_rows", return_value=payment_export.BACKGROUND_EXPORT_ROWS + 1), \
+				patch.object(payment_export, "create_payment_xlsx_file") as create_file, \
+				patch("frappe.enqueue") as enqueue:
+			result = payment_export.export_payment_xlsx()
+
+		self.assertTrue(result["queued"])
+		create_file.assert_not_called()
+		self.assertEqual(
+			enqueue.call_args.args[0],
+			"property_manager.property_manager.utils.payment_export.build_payment_xlsx_export"
+		)
+		self.assertEqual(enqueue.call_args.kwargs["export_id"], result["export_id"])
+
+	def test_small_xlsx_export_is_built_inline(self):
+		file_doc = frappe._dict(file_url="/private/files/payment_report.xlsx", file_name="payment_report.xlsx")
+		with patch.object(payment_export, "count_payment_export_rows", return_value=payment_export.BACKGROUND_EXPORT_ROWS), \
+				patch.object(payment_export, "create_payment_xlsx_file", return_value=(file_doc, 12)), \
+				patch("frappe.enqueue") as enqueue:
+			result = payment_export.export_payment_xlsx()
+
+		enqueue.assert_not_called()
+		self.assertNotIn("queued", result)
+		self.assertEqual(result["file_url"], file_doc.file_url)
+		self.assertEqual(result["row_count"], 12)
+
+	def test_failed_background_export_still_notifies(self):
+		with patch.object(payment_export, "create_payment_xlsx_file", side_effect=Exception("disk full")), \
+				patch("frappe.publish_realtime") as publish_realtime, \
+				patch("frappe.log_error"):
+			payment_export.build_payment_xlsx_export("EXPORT-1", {}, user="Administrator")
+
+		publish_realtime.assert_called_once_with(
+			"payment_export_ready", {"export_id": "EXPORT-1", "error": "disk full"}, user="Administrator"
+		)
@@ -4,14 +4,18 @@
 import frappe
 from frappe.utils import flt, getdate, nowdate, add_days
 from datetime import datetime, timedelta
+from property_manager.property_manager.utils.payment_entry import find_tenants_by_customers
+from property_manager.property_manager.utils.duplicate_detection import find_duplicate_payments, find_duplicate_payments_batch
+import json
 
 class PaymentValidationError(Exception):
     """Custom exception for payment validation errors"""
     pass
 
-def validate_payment_entry_for_rental(payment_entry):
+def validate_payment_entry_for_rental(payment_entry, duplicates=None):
     """
     Comprehensive validation for Payment Entry related to rental payments
+    duplicates can be passed in when they were already checked for a whole batch
     """
     validation_results = {
         "is_valid": True,
@@ -46,7 +50,8 @@ def validate_payment_entry_for_rental(payment_entry):
             validation_results["warnings"].extend(date_validation["warnings"])
             
         # Validate for duplicate payments
-        duplicate_validation = validate_duplicate_payments(payment_entry, rental_context)
+        duplicate_validation = validate_duplicate_payments(payment_entry, rental_context, duplicates)
+        validation_results["warnings"].extend(duplicate_validation["warnings"])
         if not duplicate_validation["is_valid"]:
             validation_results["errors"].extend(duplicate_validation["errors"])
             validation_results["is_valid"] = False
@@ -66,13 +71,49 @@ def validate_payment_entry_for_rental(payment_entry):
 
 def find_rental_context_for_payment(payment_entry):
     """
-    Find rental context (tenant, contracts, schedules) for a payment entry
+    Find rental context (tenant, contracts, schedules, open rows) for a payment entry
+    The context is loaded once per request and shared by the validators and the link step
     """
-    try:
-        customer = payment_entry.party
+    cache = get_rental_context_cache()
+    customer = payment_entry.party
+    
+    if customer not in cache:
+        cache[customer] = load_rental_context(customer)
         
+    return cache[customer]
+
+def get_rental_context_cache():
+    """
+    Request-local cache of rental contexts keyed by customer
+    """
+    if not hasattr(frappe.local, "rental_context_cache"):
+        frappe.local.rental_context_cache = {}
+    return frappe.local.rental_context_cache
+
+def get_cached_rental_context(customer):
+    """
+    Return the rental context already loaded for a customer in this request, if any
+    """
+    return get_rental_context_cache().get(customer)
+
+def clear_rental_context_cache(customer=None):
+    """
+    Drop cached rental contexts once their rows have been changed
+    """
+    cache = get_rental_context_cache()
+    if customer:
+        cache.pop(customer, None)
+    else:
+        cache.clear()
+
+def load_rental_context(customer):
+    """
+    Load the rental context for a customer with one query per level:
+    tenant, contracts, payment schedules and their open rows
+    """
+    try:
         # Find tenant by customer
-        tenant = find_tenant_by_customer(customer)
+        tenant = find_tenants_by_customers([customer]).get(customer) or find_tenant_by_customer(customer)
         if not tenant:
             return None
             
@@ -90,24 +131,22 @@ def find_rental_context_for_payment(payment_entry):
         if not contracts:
             return None
             
-        # Find payment schedules for these contracts
-        payment_schedules = []
-        for contract in contracts:
-            schedules = frappe.get_all(
-                "Rental Payment Schedule",
-                filters={
-                    "rental_contract": contract.name,
-                    "schedule_status": ["in", ["Active", "Overdue"]],
-                    "docstatus": 1
-                },
-                fields=["name", "rental_contract", "outstanding_amount", "total_rent_amount"]
-            )
-            payment_schedules.extend(schedules)
-            
+        # Find payment schedules for all these contracts at once
+        payment_schedules = frappe.get_all(
+            "Rental Payment Schedule",
+            filters={
+                "rental_contract": ["in", [contract.name for contract in contracts]],
+                "schedule_status": ["in", ["Active", "Overdue"]],
+                "docstatus": 1
+            },
+            fields=["name", "rental_contract", "outstanding_amount", "total_rent_amount"]
+        )
+        
         return {
             "tenant": tenant,
             "contracts": contracts,
             "payment_schedules": payment_schedules,
+            "open_rows": get_open_rows_for_schedules([schedule.name for schedule in payment_schedules]),
             "customer": customer
         }
         
@@ -115,6 +154,34 @@ def find_rental_context_for_payment(payment_entry):
         frappe.log_error(f"Error finding rental context: {str(e)}")
         return None
 
+def get_open_rows_for_schedules(rental_payment_schedules):
+    """
+    Fetch the outstanding Payment Schedule rows of several Rental Payment Schedules in one query
+    """
+    if not rental_payment_schedules:
+        return []
+        
+    return frappe.db.sql("""
+        SELECT 
+            ps.name,
+            ps.due_date,
+            ps.payment_amount,
+            ps.paid_amount,
+            ps.outstanding,
+            ps.payment_entry,
+            rps.name as rental_payment_schedule,
+            rps.rental_contract,
+            rps.tenant,
+            rps.property,
+            rps.rental_unit
+        FROM `tabPayment Schedule` ps
+        INNER JOIN `tabRental Payment Schedule` rps ON ps.parent = rps.name
+        WHERE ps.parenttype = 'Rental Payment Schedule'
+        AND ps.parent IN %s
+        AND ps.outstanding > 0
+        ORDER BY ps.due_date, ps.idx
+    """, (rental_payment_schedules,), as_dict=True)
+
 def find_tenant_by_customer(customer):
     """
     Find tenant associated with a customer with multiple matching strategies
@@ -194,17 +261,11 @@ def validate_payment_amount(payment_entry, rental_context):
             )
             
         # Check if payment amount matches any specific schedule amount
-        matching_schedule_found = False
-        for schedule in rental_context["payment_schedules"]:
-            schedule_doc = frappe.get_doc("Rental Payment Schedule", schedule["name"])
-            for payment_schedule in schedule_doc.payment_schedules:
-                outstanding = flt(payment_schedule.outstanding)
-                if abs(payment_amount - outstanding) <= 0.01:  # Exact match
-                    matching_schedule_found = True
-                    break
-            if matching_schedule_found:
-                break
-                
+        matching_schedule_found = any(
+            abs(payment_amount - flt(payment_schedule.outstanding)) <= 0.01  # Exact match
+            for payment_schedule in rental_context["open_rows"]
+        )
+        
         if not matching_schedule_found and len(rental_context["payment_schedules"]) > 1:
             validation_result["warnings"].append(
                 "Payment amount does not exactly match any single scheduled payment. "
@@ -258,15 +319,13 @@ def validate_payment_date(payment_entry, rental_context):
         closest_due_date = None
         min_date_diff = float('inf')
         
-        for schedule in rental_context["payment_schedules"]:
-            schedule_doc = frappe.get_doc("Rental Payment Schedule", schedule["name"])
-            for payment_schedule in schedule_doc.payment_schedules:
-                if flt(payment_schedule.outstanding) > 0:
-                    due_date = getdate(payment_schedule.due_date)
-                    date_diff = abs((payment_date - due_date).days)
-                    if date_diff < min_date_diff:
-                        min_date_diff = date_diff
-                        closest_due_date = due_date
+        for payment_schedule in rental_context["open_rows"]:
+            if flt(payment_schedule.outstanding) > 0:
+                due_date = getdate(payment_schedule.due_date)
+                date_diff = abs((payment_date - due_date).days)
+                if date_diff < min_date_diff:
+                    min_date_diff = date_diff
+                    closest_due_date = due_date
                         
         if closest_due_date and min_date_diff > 60:  # More than 60 days difference
             validation_result["warnings"].append(
@@ -279,7 +338,7 @@ def validate_payment_date(payment_entry, rental_context):
         
     return validation_result
 
-def validate_duplicate_payments(payment_entry, rental_context):
+def validate_duplicate_payments(payment_entry, rental_context, duplicates=None):
     """
     Check for potential duplicate payments
     """
@@ -290,47 +349,45 @@ def validate_duplicate_payments(payment_entry, rental_context):
     }
     
     try:
-        payment_amount = flt(payment_entry.paid_amount) or flt(payment_entry.base_paid_amount)
-        payment_date = getdate(payment_entry.posting_date)
-        customer = payment_entry.party
+        duplicates = duplicates or find_duplicate_payments(payment_entry)
         
         # Check for similar payments in the last 30 days
-        similar_payments = frappe.db.sql("""
-            SELECT name, paid_amount, posting_date, reference_no
-            FROM `tabPayment Entry`
-            WHERE party = %s
-            AND party_type = 'Customer'
-            AND docstatus = 1
-            AND name != %s
-            AND posting_date >= %s
-            AND ABS(paid_amount - %s) <= 1
-        """, (customer, payment_entry.name or "", add_days(payment_date, -30), payment_amount), as_dict=True)
-        
-        if similar_payments:
+        if duplicates["similar_payments"]:
             validation_result["warnings"].append(
-                f"Found {len(similar_payments)} similar payment(s) in the last 30 days. "
+                f"Found {len(duplicates['similar_payments'])} similar payment(s) in the last 30 days. "
                 "Please verify this is not a duplicate payment."
             )
             
         # Check for payments with same reference number
-        if payment_entry.reference_no:
-            duplicate_ref_payments = frappe.db.sql("""
-                SELECT name, paid_amount, posting_date
-                FROM `tabPayment Entry`
-                WHERE party = %s
-                AND party_type = 'Customer'
-                AND docstatus = 1
-                AND name != %s
-                AND reference_no = %s
-            """, (customer, payment_entry.name or "", payment_entry.reference_no), as_dict=True)
+        if duplicates["reference_duplicates"]:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(
+                f"Payment with reference number '{payment_entry.reference_no}' already exists. "
+                "Duplicate reference numbers are not allowed."
+            )
+            
+        # Check against earlier entries of the same batch, which may not be submitted yet
+        batch_reference_duplicates = [
+            name for name in duplicates.get("batch_reference_duplicates", [])
+            if name not in duplicates["reference_duplicates"]
+        ]
+        if batch_reference_duplicates:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(
+                f"Reference number '{payment_entry.reference_no}' is also used by "
+                f"{', '.join(batch_reference_duplicates)} in this batch."
+            )
+            
+        batch_similar_payments = [
+            name for name in duplicates.get("batch_similar_payments", [])
+            if name not in duplicates["similar_payments"]
+        ]
+        if batch_similar_payments:
+            validation_result["warnings"].append(
+                f"Similar to {', '.join(batch_similar_payments)} in this batch. "
+                "Please verify this is not a duplicate payment."
+            )
             
-            if duplicate_ref_payments:
-                validation_result["is_valid"] = False
-                validation_result["errors"].append(
-                    f"Payment with reference number '{payment_entry.reference_no}' already exists. "
-                    "Duplicate reference numbers are not allowed."
-                )
-                
     except Exception as e:
         validation_result["errors"].append(f"Duplicate validation error: {str(e)}")
         
@@ -350,13 +407,11 @@ def validate_payment_schedule_availability(payment_entry, rental_context):
         available_schedules = 0
         total_outstanding = 0
         
-        for schedule in rental_context["payment_schedules"]:
-            schedule_doc = frappe.get_doc("Rental Payment Schedule", schedule["name"])
-            for payment_schedule in schedule_doc.payment_schedules:
-                outstanding = flt(payment_schedule.outstanding)
-                if outstanding > 0:
-                    available_schedules += 1
-                    total_outstanding += outstanding
+        for payment_schedule in rental_context["open_rows"]:
+            outstanding = flt(payment_schedule.outstanding)
+            if outstanding > 0:
+                available_schedules += 1
+                total_outstanding += outstanding
                     
         if available_schedules == 0:
             validation_result["is_valid"] = False
@@ -379,69 +434,110 @@ def validate_payment_cancellation(payment_entry):
     """
     Validate that a payment entry can be safely cancelled
     """
-    validation_result = {
-        "can_cancel": True,
-        "errors": [],
-        "warnings": [],
-        "linked_schedules": []
+    return assess_payment_cancellations([payment_entry])[payment_entry.name]
+
+def assess_payment_cancellations(payment_entries):
+    """
+    Validate that many payment entries can be safely cancelled
+    Linked rows and subsequent payments for all affected schedules are loaded with one query each
+    Returns validation results keyed by Payment Entry name
+    """
+    results = {
+        payment_entry.name: {
+            "can_cancel": True,
+            "errors": [],
+            "warnings": [],
+            "linked_schedules": []
+        }
+        for payment_entry in payment_entries
     }
-    
+    if not results:
+        return results
+        
     try:
-        # Find linked payment schedules
-        linked_schedules = frappe.db.sql("""
-            SELECT 
-                ps.name as schedule_name,
-                ps.parent as payment_schedule_parent,
-                ps.parenttype,
-                ps.payment_amount,
-                ps.paid_amount,
-                ps.outstanding,
-                ps.payment_status
-            FROM `tabPayment Schedule` ps
-            WHERE ps.payment_entry = %s
-        """, (payment_entry.name,), as_dict=True)
-        
-        validation_result["linked_schedules"] = linked_schedules
-        
-        if not linked_schedules:
-            validation_result["warnings"].append(
-                "No linked payment schedules found. Cancellation will not affect rental payments."
-            )
-            return validation_result
-            
-        # Check if cancellation would create negative balances
-        for schedule in linked_schedules:
-            if flt(schedule.paid_amount) < flt(payment_entry.paid_amount):
-                validation_result["warnings"].append(
-                    f"Cancelling this payment may result in negative paid amount "
-                    f"for payment schedule {schedule.schedule_name}"
-                )
-                
-        # Check if there are subsequent payments that depend on this one
-        for schedule in linked_schedules:
-            subsequent_payments = frappe.db.sql("""
-                SELECT COUNT(*) as count
-                FROM `tabPayment Schedule` ps
-                INNER JOIN `tabPayment Entry` pe ON ps.payment_entry = pe.name
-                WHERE ps.parent = %s
-                AND ps.parenttype = %s
-                AND pe.posting_date > %s
-                AND pe.docstatus = 1
-                AND pe.name != %s
-            """, (schedule.payment_schedule_parent, schedule.parenttype, 
-                  payment_entry.posting_date, payment_entry.name), as_dict=True)
+        linked_schedules = get_linked_schedules_for_payments(list(results))
+        subsequent_payments = get_subsequent_payment_counts(list(results))
+        
+        for payment_entry in payment_entries:
+            validation_result = results[payment_entry.name]
+            entry_schedules = linked_schedules.get(payment_entry.name, [])
+            validation_result["linked_schedules"] = entry_schedules
             
-            if subsequent_payments and subsequent_payments[0].count > 0:
+            if not entry_schedules:
                 validation_result["warnings"].append(
-                    f"There are subsequent payments after this one for payment schedule "
-                    f"{schedule.payment_schedule_parent}. Consider the impact on payment sequence."
+                    "No linked payment schedules found. Cancellation will not affect rental payments."
                 )
+                continue
                 
+            # Check if cancellation would create negative balances
+            for schedule in entry_schedules:
+                if flt(schedule.paid_amount) < flt(payment_entry.paid_amount):
+                    validation_result["warnings"].append(
+                        f"Cancelling this payment may result in negative paid amount "
+                        f"for payment schedule {schedule.schedule_name}"
+                    )
+                    
+            # Check if there are subsequent payments that depend on this one
+            for parent in sorted({schedule.payment_schedule_parent for schedule in entry_schedules}):
+                if subsequent_payments.get((payment_entry.name, parent)):
+                    validation_result["warnings"].append(
+                        f"There are subsequent payments after this one for payment schedule "
+                        f"{parent}. Consider the impact on payment sequence."
+                    )
+                    
     except Exception as e:
-        validation_result["can_cancel"] = False
-        validation_result["errors"].append(f"Cancellation validation error: {str(e)}")
+        for validation_result in results.values():
+            validation_result["can_cancel"] = False
+            validation_result["errors"].append(f"Cancellation validation error: {str(e)}")
+            
+    return results
+
+def get_linked_schedules_for_payments(payment_entry_names):
+    """
+    Payment Schedule rows linked to any of the given Payment Entries, keyed by Payment Entry
+    """
+    linked_schedules = {}
+    for schedule in frappe.db.sql("""
+        SELECT 
+            ps.payment_entry,
+            ps.name as schedule_name,
+            ps.parent as payment_schedule_parent,
+            ps.parenttype,
+            ps.payment_amount,
+            ps.paid_amount,
+            ps.outstanding,
+            ps.payment_status
+        FROM `tabPayment Schedule` ps
+        WHERE ps.payment_entry IN %s
+        ORDER BY ps.parent, ps.idx
+    """, (payment_entry_names,), as_dict=True):
+        linked_schedules.setdefault(schedule.payment_entry, []).append(schedule)
         
-    return validation_result
+    return linked_schedules
+
+def get_subsequent_payment_counts(payment_entry_names):
+    """
+    Count later submitted payments on every schedule the given Payment Entries are linked to
+    Returns a dict of (payment entry, schedule parent) -> number of later payments
+    """
+    counts = frappe.db.sql("""
+        SELECT 
+            linked.payment_entry,
+            linked.parent,
+            COUNT(DISTINCT later_pe.name) as count
+        FROM `tabPayment Schedule` linked
+        INNER JOIN `tabPayment Entry` linked_pe ON linked_pe.name = linked.payment_entry
+        INNER JOIN `tabPayment Schedule` later ON later.parent = linked.parent
+            AND later.parenttype = linked.parenttype
+        INNER JOIN `tabPayment Entry` later_pe ON later_pe.name = later.payment_entry
+        WHERE linked.payment_entry IN %s
+        AND later_pe.posting_date > linked_pe.posting_date
+        AND later_pe.docstatus = 1
+        AND later_pe.name != linked.payment_entry
+        GROUP BY linked.payment_entry, linked.parent
+    """, (payment_entry_names,), as_dict=True)
+    
+    return {(row.payment_entry, row.parent): row.count for row in counts}
 
 @frappe.whitelist()
 def validate_payment_entry_rental_context(payment_entry_name):
@@ -461,6 +557,160 @@ def validate_payment_entry_rental_context(payment_entry_name):
             "rental_context": None
         }
 
+def load_rental_contexts(customers):
+    """
+    Load rental contexts for many customers with one query per level and add them to the request cache
+    Customers are matched to tenants by name pattern, email and phone, then by find_tenant_by_customer
+    """
+    cache = get_rental_context_cache()
+    customers = [customer for customer in set(customers) if customer and customer not in cache]
+    if not customers:
+        return cache
+        
+    for customer in customers:
+        cache[customer] = None
+        
+    tenant_by_customer = find_tenants_by_customers(customers)
+    
+    # Same fallback as load_rental_context, so an entry validates alike in a batch and alone
+    for customer in customers:
+        if customer not in tenant_by_customer:
+            tenant = find_tenant_by_customer(customer)
+            if tenant:
+                tenant_by_customer[customer] = tenant
+                
+    if not tenant_by_customer:
+        return cache
+        
+    contracts = frappe.get_all(
+        "Rental Contract",
+        filters={
+            "tenant": ["in", list(set(tenant_by_customer.values()))],
+            "contract_status": ["in", ["Active", "Draft"]],
+            "docstatus": ["in", [0, 1]]
+        },
+        fields=["name", "tenant", "rental_unit", "property", "monthly_rent", "start_date", "end_date"]
+    )
+    
+    payment_schedules = frappe.get_all(
+        "Rental Payment Schedule",
+        filters={
+            "rental_contract": ["in", [contract.name for contract in contracts]],
+            "schedule_status": ["in", ["Active", "Overdue"]],
+            "docstatus": 1
+        },
+        fields=["name", "rental_contract", "outstanding_amount", "total_rent_amount"]
+    ) if contracts else []
+    
+    open_rows = get_open_rows_for_schedules([schedule.name for schedule in payment_schedules])
+    
+    contracts_by_tenant = {}
+    for contract in contracts:
+        contracts_by_tenant.setdefault(contract.tenant, []).append(contract)
+        
+    schedules_by_contract = {}
+    for schedule in payment_schedules:
+        schedules_by_contract.setdefault(schedule.rental_contract, []).append(schedule)
+        
+    rows_by_schedule = {}
+    for row in open_rows:
+        rows_by_schedule.setdefault(row.rental_payment_schedule, []).append(row)
+        
+    for customer, tenant in tenant_by_customer.items():
+        tenant_contracts = contracts_by_tenant.get(tenant)
+        if not tenant_contracts:
+            continue
+            
+        tenant_schedules = [
+            schedule for contract in tenant_contracts
+            for schedule in schedules_by_contract.get(contract.name, [])
+        ]
+        cache[customer] = {
+            "tenant": tenant,
+            "contracts": tenant_contracts,
+            "payment_schedules": tenant_schedules,
+            "open_rows": [row for schedule in tenant_schedules for row in rows_by_schedule.get(schedule.name, [])],
+            "customer": customer
+        }
+        
+    return cache
+
+def validate_payment_entries_for_rental(payment_entries):
+    """
+    Validate many Payment Entries with bulk-loaded rental contexts and one duplicate check for the batch
+    Returns validation results keyed by Payment Entry name
+    """
+    customer_entries = [entry for entry in payment_entries if entry.party_type == "Customer"]
+    load_rental_contexts([entry.party for entry in customer_entries])
+    
+    # Batch duplicates come back as positions in the batch; report them by Payment Entry name
+    names = [entry.name for entry in customer_entries]
+    duplicates = {}
+    for name, result in zip(names, find_duplicate_payments_batch(customer_entries)):
+        result["batch_reference_duplicates"] = [names[position] for position in result["batch_reference_duplicates"]]
+        result["batch_similar_payments"] = [names[position] for position in result["batch_similar_payments"]]
+        duplicates[name] = result
+        
+    return {
+        entry.name: validate_payment_entry_for_rental(entry, duplicates.get(entry.name))
+        for entry in payment_entries
+    }
+
+def summarize_rental_context(rental_context):
+    """
+    Names of the tenant, contracts and schedules a payment was validated against, without the loaded rows
+    """
+    if not rental_context:
+        return None
+        
+    return {
+        "tenant": rental_context["tenant"],
+        "contracts": [contract.name for contract in rental_context["contracts"]],
+        "payment_schedules": [schedule.name for schedule in rental_context["payment_schedules"]],
+        "open_rows": len(rental_context["open_rows"])
+    }
+
+@frappe.whitelist()
+def validate_payment_entries_rental_context(payment_entry_names):
+    """
+    API endpoint to validate the rental context of many Payment Entries in one call
+    """
+    try:
+        if isinstance(payment_entry_names, str):
+            payment_entry_names = json.loads(payment_entry_names)
+            
+        # get_list applies the user's permissions, so unreadable entries come back as not found
+        payment_entries = frappe.get_list(
+            "Payment Entry",
+            filters={"name": ["in", payment_entry_names]},
+            fields=["name", "party_type", "party", "paid_amount", "base_paid_amount",
+                    "posting_date", "reference_no", "docstatus"],
+            limit_page_length=0
+        )
+        
+        results = validate_payment_entries_for_rental(payment_entries)
+        for result in results.values():
+            result["rental_context"] = summarize_rental_context(result["rental_context"])
+            
+        missing = set(payment_entry_names) - set(results)
+        for name in missing:
+            results[name] = {
+                "is_valid": False,
+                "errors": [f"Payment Entry {name} not found"],
+                "warnings": [],
+                "rental_context": None
+            }
+            
+        return {
+            "success": True,
+            "results": results,
+            "invalid_count": sum(1 for result in results.values() if not result["is_valid"])
+        }
+        
+    except Exception as e:
+        frappe.log_error(f"Error validating payment entries: {str(e)}")
+        return {"success": False, "message": str(e), "results": {}}
+
 @frappe.whitelist()
 def check_payment_cancellation_impact(payment_entry_name):
     """
@@ -479,3 +729,30 @@ def check_payment_cancellation_impact(payment_entry_name):
             "linked_schedules": []
         }
 
+@frappe.whitelist()
+def check_payment_cancellations_impact(payment_entry_names):
+    """
+    API endpoint to check the impact of cancelling many payment entries, e.g. for bulk reversals
+    """
+    try:
+        if isinstance(payment_entry_names, str):
+            payment_entry_names = json.loads(payment_entry_names)
+            
+        payment_entries = frappe.get_list(
+            "Payment Entry",
+            filters={"name": ["in", payment_entry_names]},
+            fields=["name", "paid_amount", "posting_date"],
+            limit_page_length=0
+        )
+        results = assess_payment_cancellations(payment_entries)
+        
+        return {
+            "success": True,
+            "results": results,
+            "blocked_count": sum(1 for result in results.values() if not result["can_cancel"]),
+            "not_found": sorted(set(payment_entry_names) - set(results))
+        }
+        
+    except Exception as e:
+        frappe.log_error(f"Error checking cancellation impact: {str(e)}")
+        return {"success": False, "message": str(e), "results": {}}